@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Milliseconds a completion takes with a large index, the way the shell
+script runs it, next to an interpreter doing nothing.
+
+Run from the top of the source tree, optionally giving the number of
+nouns::
+
+   $ PYTHONPATH=src python benchmarks/bench_completion.py 5000
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from director import completion
+
+
+NOUNS = 5000
+RUNS = 20
+
+
+class FakeManifest(object):
+    """
+    Manifest data of many nouns with ten verbs of six options each.
+    """
+
+    def __init__(self, number):
+        """
+        Creates the FakeManifest object.
+
+        :Parameters:
+            - `number`: how many nouns to describe.
+        """
+        spec = {'options': [('option%d' % x, 'store') for x in range(6)]}
+        verbs = dict([('verb%d' % x, {'spec': spec}) for x in range(10)])
+        self.data = {'nouns': dict([('noun%05d' % x, {'verbs': verbs})
+                                    for x in range(number)])}
+
+
+def best_of(command):
+    """
+    Returns the quickest of RUNS runs of a command in milliseconds.
+
+    :Parameters:
+        - `command`: the command to run.
+    """
+    best = None
+    for run in range(RUNS):
+        start = time.time()
+        subprocess.call(command, stdout=open(os.devnull, 'w'))
+        elapsed = (time.time() - start) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(args=sys.argv):
+    """
+    Builds an index and times completing nouns and options from it.
+    """
+    if len(args) > 1:
+        number = int(args[1])
+    else:
+        number = NOUNS
+    index_path = tempfile.mkstemp()[1]
+    try:
+        completion.build_index(FakeManifest(number), index_path)
+        directory = os.path.dirname(os.path.abspath(completion.__file__))
+        code = completion.SCRIPT_CODE % directory
+        python = [sys.executable, '-S']
+        print("%-8s %8.2f ms" % ('python', best_of(python + ['-c', 'pass'])))
+        print("%-8s %8.2f ms" % ('nouns', best_of(
+            python + ['-c', code, index_path, '1', 'myapp', 'noun00'])))
+        print("%-8s %8.2f ms" % ('options', best_of(
+            python + ['-c', code, index_path, '3', 'myapp', 'noun00042',
+                      'verb3', '--'])))
+    finally:
+        os.unlink(index_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Records per second written by each formatter.
+
+Run from the top of the source tree, optionally giving the number of
+records::
+
+   $ PYTHONPATH=src python benchmarks/bench_formatters.py 1000000
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import sys
+import time
+
+from director import output
+from director.formatters import FORMATTERS
+
+
+NUMBER = 1000000
+
+
+def rows(number):
+    """
+    Yields the records of a typical listing.
+
+    :Parameters:
+        - `number`: how many records to yield.
+    """
+    for index in xrange(number):
+        yield {'id': index, 'name': 'host%d' % index, 'up': True,
+               'load': 0.25}
+
+
+def main(args=sys.argv):
+    """
+    Times each formatter writing to /dev/null and prints its rate.
+    """
+    if len(args) > 1:
+        number = int(args[1])
+    else:
+        number = NUMBER
+    names = FORMATTERS.keys()
+    names.sort()
+    for name in names:
+        sink = output.FileSink(os.devnull, 'w')
+        channel = output.Channel(sink)
+        formatter = FORMATTERS[name]()
+        start = time.time()
+        formatter.write(rows(number), channel)
+        channel.flush()
+        elapsed = time.time() - start
+        sink.close()
+        print("%-8s %10.0f records per second" % (name, number / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Per invocation cost of the option parser backends.
+
+Run from the top of the source tree::
+
+   $ PYTHONPATH=src:. python benchmarks/bench_options.py
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import timeit
+
+from director.options import CompiledParser
+from director.options import FastParser
+from director.options import OptionSpec
+
+from tests.actions.simpleaction import Simpleaction
+
+
+ARGS = ['--opt=value', '--another', '--last', 'first']
+NUMBER = 20000
+
+
+def uncached():
+    """
+    What parse_options used to do on every invocation.
+    """
+    CompiledParser(OptionSpec.from_verb(Simpleaction.verb)).parse(ARGS)
+
+
+def main():
+    """
+    Times each backend and prints the cost of one invocation.
+    """
+    spec = OptionSpec.from_verb(Simpleaction.verb)
+    optparse_parser = CompiledParser(spec)
+    fast_parser = FastParser(spec)
+    cases = [('uncached optparse', uncached),
+             ('cached optparse', lambda: optparse_parser.parse(ARGS)),
+             ('cached fast', lambda: fast_parser.parse(ARGS))]
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print("%-20s %8.2f usec per invocation" % (
+            name, best / NUMBER * 1000000))
+
+
+if __name__ == '__main__':
+    main()
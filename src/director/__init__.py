@@ -17,52 +17,246 @@ __license__ = 'GPLv3+'
 __author__ = "Steve 'Ashcrow' Milner"
 
 
-import inspect
+# First, so the time importing director takes can be measured
+from director import timing
+
+import atexit
 import os
-import sys
+import threading
 import types
 import warnings
 
 import director.error
 
-from optparse import OptionParser
-
 from director import codes
+from director import output
 from director.decorators import general_help
+from director.formatters import FORMATTERS
+from director.manifest import list_plugin_nouns
+from director.options import OptionSpec
+from director.options import PARSER_BACKENDS
+from director.options import PARSER_CACHE
+from director.options import resolve_files
+from director.plugins import package_path
+from director.plugins import plugin_index
 
 
 def err(text, newline=True):
     """
-    Shortcut for printing to stderr.
+    Shortcut for printing to stderr. Output is buffered, see
+    director.output.
 
     :Parameters:
        - `text`: what to print
        - `newline`: if a newline be appended to the string
     """
-    text = str(text)
+    channel = output.get_output().stderr
+    if type(text) != types.StringType:
+        text = str(text)
+    channel.write(text)
     if newline:
-        text = text + "\n"
-    sys.stderr.write(text)
+        channel.write("\n")
+
+
+def out(text, newline=True):
+    """
+    Shortcut for printing to stdout which actions should use instead of
+    print. Output is buffered, see director.output.
+
+    :Parameters:
+       - `text`: what to print
+       - `newline`: if a newline be appended to the string
+    """
+    channel = output.get_output().stdout
+    if type(text) != types.StringType:
+        text = str(text)
+    channel.write(text)
+    if newline:
+        channel.write("\n")
+
+
+def is_stream(result):
+    """
+    Tells if a verb's result is an iterator, such as the generator of a verb
+    which yields, to be written out record by record.
+
+    :Parameters:
+       - `result`: what the verb returned.
+    """
+    if result is None or not hasattr(result, 'next'):
+        return False
+    try:
+        return iter(result) is result
+    except TypeError:
+        return False
+
+
+class Verb(object):
+    """
+    Record of one verb of an Action class.
+    """
+
+    __slots__ = ('name', 'method')
+
+    def __init__(self, name, method):
+        """
+        Creates the Verb object.
+
+        :Parameters:
+            - `name`: the name of the verb.
+            - `method`: the unbound method implementing the verb.
+        """
+        self.name = name
+        self.method = method
+
+    def __repr__(self):
+        """
+        String representation of the object.
+        """
+        return "<Verb %s>" % self.name
+
+    def _get_help(self):
+        """
+        Returns the help text attached to the verb by a help decorator.
+        """
+        return self.method.help
+
+    help = property(_get_help)
+
+
+class ActionType(type):
+    """
+    Metaclass of Action which builds the verb table of each Action class
+    once when the class is created.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        """
+        Creates the Action class and its verb table.
+
+        :Parameters:
+            - `name`: the name of the class.
+            - `bases`: the base classes.
+            - `namespace`: the class body.
+        """
+        type.__init__(cls, name, bases, namespace)
+        cls._register_verbs()
+
+    def __setattr__(cls, name, value):
+        """
+        Keeps the verb table current when public attributes are set.
+
+        :Parameters:
+            - `name`: the attribute name.
+            - `value`: the attribute value.
+        """
+        type.__setattr__(cls, name, value)
+        if name[0] != '_':
+            cls._register_verbs()
+
+    def __delattr__(cls, name):
+        """
+        Keeps the verb table current when public attributes are deleted.
+
+        :Parameters:
+            - `name`: the attribute name.
+        """
+        type.__delattr__(cls, name)
+        if name[0] != '_':
+            cls._register_verbs()
+
+    def _register_verbs(cls):
+        """
+        Builds the verb table from every public method of the class.
+        """
+        verbs = {}
+        for item in dir(cls):
+            if item[0] != '_':
+                method = getattr(cls, item)
+                if type(method) == types.MethodType:
+                    verbs[item] = Verb(item, method)
+        verb_names = verbs.keys()
+        verb_names.sort()
+        type.__setattr__(cls, '_verbs', verbs)
+        type.__setattr__(cls, '_verb_names', tuple(verb_names))
+
+
+# How long ActionRunner keeps an action, see Action.instance_scope
+INVOCATION_SCOPE = 'invocation'
+BATCH_SCOPE = 'batch'
+PROCESS_SCOPE = 'process'
 
 
 class Action(object):
     """
     Base class for command line actions.
+
+    An action is open between _startup_hook and _shutdown_hook. Both run
+    exactly once per open and close, which ActionRunner does at the bounds
+    of the action's instance_scope:
+
+    - *INVOCATION_SCOPE*: a fresh action for every invocation.
+    - *BATCH_SCOPE*: one action for all the invocations a runner makes, such
+      as a whole batch, closed when the runner is done.
+    - *PROCESS_SCOPE*: one action for the whole process, closed at exit.
+
+    Used directly, an action is a context manager::
+
+       with Bucket() as bucket:
+           bucket.add('x')
     """
 
+    __metaclass__ = ActionType
+
     description_txt = "Base action class"
 
+    instance_scope = BATCH_SCOPE
+
+    # Set for subclasses which override __init__ despite the advice
+    _opened = False
+
     def __init__(self):
         """
-        Create the Action object. Do not override.
+        Create the Action object and open it. Do not override.
         """
-        self._startup_hook()
+        self._opened = False
+        self._open()
 
-    def __del__(self):
+    def __enter__(self):
         """
-        Work to do when the object is deleted. Do not override.
+        Opens the action if it isn't open. Returns the action.
         """
-        self._shutdown_hook()
+        return self._open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Closes the action.
+
+        :Parameters:
+            - `exc_type`: the type of exception raised in the block, if any.
+            - `exc_value`: the exception raised in the block, if any.
+            - `traceback`: the traceback of the exception, if any.
+        """
+        self._close()
+        return False
+
+    def _open(self):
+        """
+        Runs _startup_hook unless the action is already open. Returns the
+        action. Do not override.
+        """
+        if not self._opened:
+            self._startup_hook()
+            self._opened = True
+        return self
+
+    def _close(self):
+        """
+        Runs _shutdown_hook if the action is open. Do not override.
+        """
+        if self._opened:
+            self._opened = False
+            self._shutdown_hook()
 
     def __repr__(self):
         """
@@ -72,15 +266,14 @@ class Action(object):
 
     def _startup_hook(self):
         """
-        Hook for doing work on creation of the object. It's not in
-        __init__ just so that we keep __init__ clean.
+        Hook for doing work when the object is opened, which is on creation
+        and when it is used again after being closed.
         """
         pass
 
     def _shutdown_hook(self):
         """
-        Hook for doing work on deletion of the object. It's not in
-        __del__ just so that we keep __del__ clean.
+        Hook for doing work when the object is closed.
         """
         pass
 
@@ -88,12 +281,18 @@ class Action(object):
         """
         Lists all available verbs.
         """
-        verbs = []
-        for item in dir(self):
-            if item[0] != '_':
-                if type(self.__getattribute__(item)) == types.MethodType:
-                    verbs.append(item)
-        return verbs
+        return list(self._verb_names)
+
+    def _get_verb(self, verb):
+        """
+        Returns the bound method for a verb.
+
+        :Parameters:
+            - `verb`: the name of the verb.
+        """
+        if verb not in self._verbs:
+            raise AttributeError("%r has no verb '%s'" % (self, verb))
+        return getattr(self, verb)
 
     def _action_help(self):
         """
@@ -123,7 +322,7 @@ class Action(object):
             err(self.description())
             return None
         try:
-            err(self.__getattribute__(verb).help)
+            err(self._verbs[verb].help)
         except:
             raise director.error.UnsuportedHelpStyleError(
                 'Unsupported help style being used.')
@@ -142,50 +341,372 @@ class Action(object):
         err("For more detailed usage use myapp noun help add --verb=verb.")
 
 
+# Actions with PROCESS_SCOPE, keyed by class
+_PROCESS_ACTIONS = {}
+_PROCESS_ACTIONS_LOCK = threading.Lock()
+
+
+def process_action(action_cls):
+    """
+    Returns the action of a class shared by the whole process, creating it
+    the first time.
+
+    :Parameters:
+       - `action_cls`: the Action class.
+    """
+    try:
+        return _PROCESS_ACTIONS[action_cls]
+    except KeyError:
+        _PROCESS_ACTIONS_LOCK.acquire()
+        try:
+            if action_cls not in _PROCESS_ACTIONS:
+                _PROCESS_ACTIONS[action_cls] = action_cls()
+            return _PROCESS_ACTIONS[action_cls]
+        finally:
+            _PROCESS_ACTIONS_LOCK.release()
+
+
+def close_process_actions():
+    """
+    Closes the actions shared by the whole process. Runs at exit, and
+    where atexit doesn't run, as batch workers and daemon children finish.
+    """
+    _PROCESS_ACTIONS_LOCK.acquire()
+    try:
+        actions = _PROCESS_ACTIONS.values()
+        _PROCESS_ACTIONS.clear()
+    finally:
+        _PROCESS_ACTIONS_LOCK.release()
+    for action in actions:
+        action._close()
+
+
+atexit.register(close_process_actions)
+
+
+# Separates the stages of a pipeline on the command line
+PIPE_SEPARATOR = '--then'
+
+# Keyword argument carrying the records of the previous pipeline stage
+PIPE_ARGUMENT = 'records'
+
+
+def split_pipeline(args):
+    """
+    Splits the words after the program name into one list per pipeline
+    stage.
+
+    :Parameters:
+       - `args`: the command line without the program name.
+    """
+    stages = [[]]
+    for arg in args:
+        if arg == PIPE_SEPARATOR:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    return stages
+
+
 class ActionRunner(object):
     """
     In charge of running plugins based on information passed in via arguments.
+
+    Stages separated by --then make a pipeline run in one process: the
+    records returned by each verb are handed, without any formatting, to
+    the next verb as its records keyword argument. Records left at the end
+    are written by the formatter picked with --format, given before the
+    noun. A list, tuple or dictionary returned instead of a stream is only
+    written when --format is given.
+
+    Actions are opened when they are first used and closed when their
+    instance_scope ends. A runner which isn't running a batch is done after
+    each run, so its actions are closed then too.
     """
 
-    def __init__(self, args, plugin_package):
+    # Runners for many invocations finish their filters themselves
+    batch = False
+
+    # Set by load_args when the run is profiled, see director.timing
+    profile = None
+    timings = None
+
+    def __init__(self, args, plugin_package, manifest=None,
+                 parser_backend='optparse', output_format='text'):
         """
         Creates the ActionRunner object.
 
         :Parameters:
             - `args`: all args passed from command line.
-            - `plugin_package`: the name of the package where plugins live.
+            - `plugin_package`: the name of the package where plugins live,
+              or a search path of them, see director.plugins.
+            - `manifest`: optional loaded director.manifest.Manifest to
+              consult before importing plugin code.
+            - `parser_backend`: which option parser to use, 'optparse' or
+              the quicker 'fast' one.
+            - `output_format`: the format for records when the command line
+              doesn't give --format, see director.formatters.
+        """
+        self._init_state(plugin_package, manifest,
+                         PARSER_BACKENDS[parser_backend], output_format)
+        self.load_args(args)
+
+    def _init_state(self, plugin_package, manifest, parser_class,
+                    output_format, actions=None, formatters=None):
+        """
+        Sets up what the runner keeps between command lines. Runners which
+        don't take a command line when they are created call this instead
+        of ActionRunner.__init__.
+
+        :Parameters:
+            - `plugin_package`: the name of the package where plugins live,
+              or a search path of them, see director.plugins.
+            - `manifest`: optional loaded director.manifest.Manifest.
+            - `parser_class`: the option parser class to use.
+            - `output_format`: the format for records when the command line
+              doesn't give --format.
+            - `actions`: the dictionary of created actions to share, None
+              for one of the runner's own.
+            - `formatters`: the dictionary of created formatters to share,
+              None for one of the runner's own.
         """
         self.plugin_package = plugin_package
+        self.manifest = manifest
+        self.parser_class = parser_class
+        self.default_format = output_format
+        # Formatters created so far, keyed by format
+        if formatters is None:
+            formatters = {}
+        self._formatters = formatters
+        # Files mapped for the options of the current command line
+        self._mapped = []
+        # Actions created so far, keyed by noun
+        if actions is None:
+            actions = {}
+        self._actions = actions
+        self._invocation_actions = {}
+
+    def load_args(self, args):
+        """
+        Points the runner at a command line. Actions already created by
+        this runner are reused unless they are for a single invocation.
+
+        :Parameters:
+            - `args`: all args passed from command line.
+        """
+        self.end_invocation()
         self.args = args
+        output_format, self.profile, words = self._global_options(args[1:])
+        # Results other than streams are only formatted when asked for
+        self.format_given = output_format is not None
+        self.output_format = output_format or self.default_format
+        self.timings = None
+        if self.profile:
+            self.timings = timing.Timings()
+        self.stages = split_pipeline(words)
+        for stage in self.stages:
+            if not len(stage) >= 2:
+                self.__list_nouns()
+                err("Please give at least a noun and a verb.")
+                output.flush()
+                raise SystemExit(codes.system.NOT_ENOUGH_PARAMETERS)
+        # Get all the options passed in
+        self.noun, self.verb = self.stages[0][:2]
+        self.options = self._timed('parse_options', self.parse_options)
+        # The stages after the first as (noun, verb, options)
+        self.pipeline = []
+        for stage in self.stages[1:]:
+            noun, verb = stage[:2]
+            self._check_piped(noun, verb, stage[2:])
+            self.pipeline.append((noun, verb, self._timed(
+                'parse_options', self._parse_stage, noun, verb, stage[2:])))
+
+    def _check_piped(self, noun, verb, words):
+        """
+        Makes sure a verb after --then takes the records piped into it and
+        isn't given them on the command line as well, before anything runs.
 
-        if not len(self.args[1:]) >= 2:
-            self.__list_nouns()
-            err("Please give at least a noun and a verb.")
+        :Parameters:
+            - `noun`: the noun the verb belongs to.
+            - `verb`: the verb records are piped into.
+            - `words`: the command line words after the verb.
+        """
+        spec = self._compiled_parser(noun, verb).spec
+        option = '--' + PIPE_ARGUMENT
+        if PIPE_ARGUMENT not in [name for name, action in spec.options]:
+            err("%s %s doesn't take %s so it can't come after %s." % (
+                noun, verb, PIPE_ARGUMENT, PIPE_SEPARATOR))
+        elif [x for x in words if x == option or x.startswith(option + '=')]:
+            err("%s can't be given to %s %s, it gets the %s of the verb "
+                "before it." % (option, noun, verb, PIPE_ARGUMENT))
+        else:
+            return
+        self.close_files()
+        output.flush()
+        raise SystemExit(codes.system.NOT_ENOUGH_PARAMETERS)
+
+    def _global_options(self, words):
+        """
+        Takes the options for director itself off the front of the command
+        line. Returns the output format, None if none was given, the
+        profile setting and the remaining words.
+
+        :Parameters:
+            - `words`: the command line without the program name.
+        """
+        output_format = None
+        profile = timing.profile_setting(os.environ.get(timing.PROFILE_ENV))
+        while words:
+            if words[0].startswith('--format='):
+                output_format = words[0][len('--format='):]
+                words = words[1:]
+            elif words[0] == '--format' and len(words) > 1:
+                output_format = words[1]
+                words = words[2:]
+            elif words[0] == timing.PROFILE_OPTION:
+                profile = True
+                words = words[1:]
+            elif words[0].startswith(timing.PROFILE_OPTION + '='):
+                profile = timing.profile_setting(
+                    words[0][len(timing.PROFILE_OPTION) + 1:])
+                words = words[1:]
+            else:
+                break
+        if (output_format or self.default_format) not in FORMATTERS:
+            formats = FORMATTERS.keys()
+            formats.sort()
+            err("Unknown format %s, use one of: %s" % (
+                output_format or self.default_format, ", ".join(formats)))
+            output.flush()
             raise SystemExit(codes.system.NOT_ENOUGH_PARAMETERS)
-        # Get all the options passed in
-        self.noun, self.verb = args[1:3]
+        return output_format, profile, words
+
+    def _timed(self, phase, func, *args, **kwargs):
+        """
+        Calls a function, timing it as a phase when the run is profiled.
+        Returns what the function returns.
 
+        :Parameters:
+            - `phase`: the phase the call belongs to, see director.timing.
+            - `func`: the function to call.
+            - `*args`: any non keyword arguments.
+            - `**kwargs`: all keyword arguments.
+        """
+        if self.timings is None:
+            return func(*args, **kwargs)
+        return self.timings.call(phase, func, *args, **kwargs)
+
+    def _get_action(self, noun):
+        """
+        Returns the open action for a noun, importing the noun and creating
+        the action when its scope calls for a new one.
+
+        :Parameters:
+            - `noun`: the noun to get the action for.
+        """
+        action_to_run = (self._invocation_actions.get(noun) or
+                         self._actions.get(noun))
+        if action_to_run is None:
+            action_to_run = self._create_action(noun)
+        return self._timed('_startup_hook', action_to_run._open)
+
+    def _create_action(self, noun):
+        """
+        Imports a noun and creates its action, keeping it for its scope.
+
+        :Parameters:
+            - `noun`: the noun to create the action for.
+        """
         # Generate the code based from the input
-        action = __import__("%s.%s" % (self.plugin_package, self.noun),
-                            globals(),
-                            locals(),
-                            [self.noun])
-        self.action_to_run = action.__getattribute__(self.noun.capitalize())()
-        self.options = self.parse_options()
+        action = self._timed('plugin import', __import__,
+                             self._module_name(noun),
+                             globals(),
+                             locals(),
+                             [noun])
+        action_cls = action.__getattribute__(noun.capitalize())
+        # Creating an action opens it
+        if action_cls.instance_scope == PROCESS_SCOPE:
+            action_to_run = self._timed('_startup_hook', process_action,
+                                        action_cls)
+        else:
+            action_to_run = self._timed('_startup_hook', action_cls)
+        if action_cls.instance_scope == INVOCATION_SCOPE:
+            self._invocation_actions[noun] = action_to_run
+        else:
+            self._actions[noun] = action_to_run
+        return action_to_run
+
+    def end_invocation(self):
+        """
+        Closes what belongs to the current invocation only: its actions and
+        the files mapped for its options.
+        """
+        self.close_files()
+        while self._invocation_actions:
+            self._invocation_actions.popitem()[1]._close()
+
+    def close(self):
+        """
+        Ends the current invocation and closes the actions this runner
+        kept. Actions shared by the process stay open.
+        """
+        self.end_invocation()
+        for action_to_run in self._actions.values():
+            if action_to_run.instance_scope != PROCESS_SCOPE:
+                action_to_run._close()
+
+    def _module_name(self, noun):
+        """
+        Returns the name of the module a noun lives in.
+
+        :Parameters:
+            - `noun`: the noun to look up.
+        """
+        if self.manifest:
+            entry = self.manifest.noun(noun)
+            if entry is not None:
+                return entry['module']
+        packages = package_path(self.plugin_package)
+        # A single package needs no index, the import itself looks
+        if len(packages) == 1:
+            return "%s.%s" % (packages[0], noun)
+        module = plugin_index(packages).module(noun)
+        if module is None:
+            raise ImportError("No plugin package provides %s" % noun)
+        return module
+
+    def _get_action_to_run(self):
+        """
+        Returns the action created for the current noun, None if there is
+        none yet. Reading it never creates or opens an action, running does.
+        """
+        return (self._invocation_actions.get(self.noun) or
+                self._actions.get(self.noun))
+
+    def _set_action_to_run(self, action_to_run):
+        """
+        Sets the action to run for the current noun.
+
+        :Parameters:
+            - `action_to_run`: the Action instance to use.
+        """
+        self._actions[self.noun] = action_to_run
+
+    action_to_run = property(_get_action_to_run, _set_action_to_run)
 
     def __list_nouns(self):
         """
         Lists all available nouns.
         """
-        action_mod = __import__(self.plugin_package)
+        nouns = None
+        if self.manifest:
+            nouns = self.manifest.nouns()
+        if nouns is None:
+            nouns = list_plugin_nouns(self.plugin_package)[0]
         err("Available nouns:", False)
-        # Get the module path from __path__ of action_mod and plugin_package
-        mod_path = os.path.join(action_mod.__path__[0],
-                                self.plugin_package.split('.')[-1])
         # Go over each and print out the ones that are actions
-        for noun in os.listdir(mod_path):
-            if "__" not in noun and '.pyc' not in noun:
-                err("%s " % noun.replace('.py', ''), False)
+        for noun in nouns:
+            err("%s " % noun, False)
         err('')
 
     def parse_options(self):
@@ -194,77 +715,175 @@ class ActionRunner(object):
 
         Returns a usable dictionary to pass to a method.
         """
-        parser = OptionParser()
-        a_verb = self.action_to_run.__getattribute__(self.verb)
-        # Since decorators change what inspect sees we try to use the original
-        # method directly which gets attached as a_verb.meth. If it doesn't
-        # exist then we try the method directly as it is either old style,
-        # using direct method variables or has no help at all.
+        return self._parse_stage(self.noun, self.verb, self.stages[0][2:])
+
+    def _parse_stage(self, noun, verb, words):
+        """
+        Parses the options of one verb, mapping the files given as @path to
+        the options taking files.
+
+        :Parameters:
+            - `noun`: the noun the verb belongs to.
+            - `verb`: the verb to parse options for.
+            - `words`: the command line words after the verb.
+        """
+        parser = self._compiled_parser(noun, verb)
         try:
-            inspection_data = [x for x in inspect.getargspec(a_verb.meth)]
-        except:
-            inspection_data = [x for x in inspect.getargspec(a_verb)]
-
-        if inspection_data[0] == None:
-            inspection_data[0] = []
-        iargs = [x for x in reversed(inspection_data[0][1:])]
-        if inspection_data[3] == None:
-            inspection_data[3] = []
-        iargs_defaults = [x for x in reversed(inspection_data[3])]
-
-        defaults = {}
-        for iarg_x in range(len(iargs)):
-            # Default action is to store
-            action = 'store'
-            try:
-                # Make sure we set up defaults
-                def_item = iargs_defaults[iarg_x]
-                if type(def_item) == types.TupleType:
-                    def_item = def_item[0]
-                defaults[iargs[iarg_x]] = def_item
-
-                # Setup the action if it is a bool
-                if defaults[iargs[iarg_x]] == True:
-                    action = 'store_true'
-                elif defaults[iargs[iarg_x]] == False:
-                    action = 'store_false'
-            except IndexError, ie:
-                # Not everything has a default
-                pass
-
-            # Add it to optparse
-            parser.add_option("--%s" % iargs[iarg_x],
-                              dest=iargs[iarg_x],
-                              action=action)
-
-        # Bind the defaults
-        parser.set_defaults(**defaults)
-        options, largs = parser.parse_args(self.args[3:])
-        return options.__dict__
+            return resolve_files(parser.parse(words), parser.spec.defaults,
+                                 self._mapped, parser.spec.files)
+        except EnvironmentError, ex:
+            self.close_files()
+            err("Can not map %s: %s" % (ex.filename, ex.strerror))
+            output.flush()
+            raise SystemExit(codes.system.NOT_ENOUGH_PARAMETERS)
+
+    def close_files(self):
+        """
+        Closes the files mapped for the options of the current command line.
+        """
+        while self._mapped:
+            self._mapped.pop().close()
+
+    def _compiled_parser(self, noun, verb):
+        """
+        Returns the CompiledParser for a verb, preferring the manifest over
+        inspecting the verb itself.
+
+        :Parameters:
+            - `noun`: the noun the verb belongs to.
+            - `verb`: the verb to parse options for.
+        """
+        if self.manifest:
+            entry = self.manifest.noun(noun)
+            if entry is not None:
+                verb_entry = entry['verbs'].get(verb)
+                if verb_entry and verb_entry['spec'] is not None:
+                    key = (self.manifest.path, noun, verb, entry['stamp'])
+                    return PARSER_CACHE.compile(
+                        self.parser_class, key, OptionSpec.from_dict,
+                        verb_entry['spec'])
+        return PARSER_CACHE.get(self._get_action(noun)._get_verb(verb),
+                                self.parser_class)
+
+    def _manifest_help(self):
+        """
+        Renders the help and description verbs straight from the manifest.
+        Returns True if the manifest could answer, False otherwise.
+        """
+        if not self.manifest or self.verb not in ('help', 'description'):
+            return False
+        entry = self.manifest.noun(self.noun)
+        if entry is None:
+            return False
+        verbs = entry['verbs'].keys()
+        verbs.sort()
+        verb = self.options.get('verb')
+        if self.verb == 'description' or not verb:
+            err("%s.\nAvailable verbs: %s" % (
+                entry['description'], ", ".join(verbs)))
+            err("For more detailed usage use myapp noun help add "
+                "--verb=verb.")
+            return True
+        if verb not in entry['verbs']:
+            return False
+        if entry['verbs'][verb]['help'] is None:
+            raise director.error.UnsuportedHelpStyleError(
+                'Unsupported help style being used.')
+        err(entry['verbs'][verb]['help'])
+        return True
 
     def run_code(self):
         """
-        Takes care of running the code created.
+        Takes care of running the code created. Returns what the verb
+        returned unless it was written out as records.
 
         code is the code to execute.
         """
-        self.action_to_run.__getattribute__(
-            self.verb).__call__(**self.options)
+        if self._manifest_help():
+            return None
+        result = self._timed(
+            'verb', self._get_action(self.noun)._get_verb(self.verb),
+            **self.options)
+        for noun, verb, options in self.pipeline:
+            if result is None:
+                result = ()
+            options = dict(options)
+            options[PIPE_ARGUMENT] = iter(result)
+            result = self._timed('verb', self._get_action(noun)._get_verb(
+                verb), **options)
+        if is_stream(result):
+            self._timed('output', self.write_stream, result)
+            return None
+        if self.format_given and isinstance(result, (list, tuple, dict)):
+            # A single dictionary is a single record
+            if isinstance(result, dict):
+                result = [result]
+            self._timed('output', self.write_stream, iter(result))
+            return None
+        return result
+
+    def write_stream(self, records):
+        """
+        Writes the records a streaming verb produces as they are produced.
+
+        :Parameters:
+            - `records`: the iterator returned by the verb.
+        """
+        try:
+            formatter = self._formatters[self.output_format]
+        except KeyError:
+            formatter = FORMATTERS[self.output_format]()
+            self._formatters[self.output_format] = formatter
+        formatter.write(records)
 
     def run(self, filter_obj=None):
         """
-        Runs the generated code.
+        Runs the generated code. Returns what the verb returned unless it
+        was written out as a stream.
 
         :Parameters:
             - `filter_obj`: the filter object.
         """
+        profiler = None
+        if isinstance(self.profile, basestring):
+            import cProfile
+            profiler = cProfile.Profile()
         try:
-            self.run_code()
-        except Exception, ex:
-            # If we have a filters then use them ...
-            if filter_obj:
-                filter_obj.execute_filters(ex)
+            try:
+                if profiler is not None:
+                    return profiler.runcall(self.run_code)
+                return self.run_code()
+            except Exception, ex:
+                # If we have a filters then use them ...
+                if filter_obj:
+                    self._timed('filters', self._filter, filter_obj, ex)
+                else:
+                    # If we have no filters then raise the exception
+                    raise ex
+                raise SystemExit(codes.system.EXCEPTION_RAISED)
+        finally:
+            if profiler is not None:
+                profiler.dump_stats(self.profile)
+            if self.timings is not None:
+                err(self.timings.report())
+            # Everything buffered by this run goes out now
+            output.flush()
+            if self.batch:
+                self.end_invocation()
             else:
-                # If we have no filters then raise the exception
-                raise ex
-            raise SystemExit(codes.system.EXCEPTION_RAISED)
+                self.close()
+
+    def _filter(self, filter_obj, ex):
+        """
+        Hands an exception raised by the run to the filters.
+
+        :Parameters:
+            - `filter_obj`: the filter object.
+            - `ex`: the exception raised.
+        """
+        filter_obj.execute_filters(ex, self.args[1:])
+        if not self.batch:
+            filter_obj.finish()
+
+
+timing.imported()
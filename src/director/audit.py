@@ -0,0 +1,177 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Auditing what importing each plugin costs.
+
+Every noun is imported on its own in a fresh interpreter which has already
+imported director and the plugin package, so the numbers are what the noun
+adds to startup: the wall time of the import, how much the peak resident
+memory grew and which modules it pulled in along the way::
+
+   $ python -m director.audit myapp.actions --json=audit.json
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import json
+import os
+import subprocess
+import sys
+
+from optparse import OptionParser
+
+from director.plugins import plugin_index
+
+
+# Run in a child interpreter with the module to import as its argument.
+# Only what the measurement itself needs is imported up front.
+PROBE = """
+import resource
+import sys
+import time
+
+import director
+
+# The packages a noun lives in are paid for once, not by every noun
+error = None
+package = sys.argv[1].rpartition('.')[0]
+if package:
+    try:
+        __import__(package)
+    except Exception, ex:
+        error = '%s: %s' % (ex.__class__.__name__, ex)
+
+before = set([x for x in sys.modules if sys.modules[x] is not None])
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.time()
+try:
+    __import__(sys.argv[1])
+except Exception, ex:
+    error = '%s: %s' % (ex.__class__.__name__, ex)
+seconds = time.time() - start
+maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+modules = [x for x in sys.modules
+           if sys.modules[x] is not None and x not in before]
+modules.sort()
+
+import json
+sys.stdout.write(json.dumps({'seconds': seconds, 'maxrss_kb': maxrss,
+                             'modules': modules, 'error': error}))
+"""
+
+
+def audit_module(module, repeat=1):
+    """
+    Imports a module in fresh interpreters and returns what it cost, the
+    quickest of repeat runs.
+
+    :Parameters:
+        - `module`: the name of the module to import.
+        - `repeat`: how many interpreters to measure in.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.abspath(x) for x in sys.path])
+    best = None
+    for run in range(repeat):
+        proc = subprocess.Popen([sys.executable, '-c', PROBE, module],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, env=env)
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            return {'seconds': None, 'maxrss_kb': None, 'modules': [],
+                    'error': stderr.strip().split('\n')[-1]}
+        result = json.loads(stdout)
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def audit_plugins(plugin_package, repeat=1):
+    """
+    Audits every noun of a plugin package. Returns a list of results, the
+    slowest first, each a dictionary with the noun, module, seconds,
+    maxrss_kb, modules and error.
+
+    :Parameters:
+        - `plugin_package`: the name of the package where plugins live, or a
+          search path of them.
+        - `repeat`: how many interpreters to measure each noun in.
+    """
+    index = plugin_index(plugin_package)
+    results = []
+    for noun in index.nouns():
+        result = audit_module(index.module(noun), repeat)
+        result['noun'] = noun
+        result['module'] = index.module(noun)
+        results.append(result)
+    # Failed imports have no time and go last
+    results.sort(key=lambda x: x['seconds'] is None and -1 or x['seconds'],
+                 reverse=True)
+    return results
+
+
+def format_report(results):
+    """
+    Returns a ranked text report of audit results.
+
+    :Parameters:
+        - `results`: what audit_plugins returned.
+    """
+    lines = ["%4s %-24s %10s %10s %8s" % (
+        'rank', 'noun', 'ms', 'rss kb', 'modules')]
+    for rank, result in enumerate(results):
+        if result['error'] and result['seconds'] is None:
+            lines.append("%4d %-24s %s" % (
+                rank + 1, result['noun'], result['error']))
+            continue
+        lines.append("%4d %-24s %10.2f %10d %8d" % (
+            rank + 1, result['noun'], result['seconds'] * 1000,
+            result['maxrss_kb'], len(result['modules'])))
+        if result['error']:
+            lines.append("     failed: %s" % result['error'])
+    return "\n".join(lines) + "\n"
+
+
+def main(args=sys.argv):
+    """
+    Audits a plugin package from the command line.
+
+    :Parameters:
+        - `args`: all args passed from command line.
+    """
+    parser = OptionParser(
+        usage='%prog [--repeat=N] [--json=path] plugin_package'
+              '[,plugin_package...]')
+    parser.add_option('--repeat', dest='repeat', type='int', default=1,
+                      help='interpreters to measure each noun in')
+    parser.add_option('--json', dest='json_path', default=None,
+                      help='also write the results as JSON, - for stdout')
+    options, largs = parser.parse_args(args[1:])
+    if len(largs) != 1:
+        parser.print_usage(sys.stderr)
+        return 1
+    results = audit_plugins(largs[0].split(','), options.repeat)
+    if options.json_path == '-':
+        sys.stdout.write(json.dumps(results, indent=2) + "\n")
+        return 0
+    sys.stdout.write(format_report(results))
+    if options.json_path:
+        json_file = open(options.json_path, 'w')
+        try:
+            json.dump(results, json_file, indent=2)
+        finally:
+            json_file.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,546 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Running many invocations in one process.
+
+Each line of a batch is one invocation written the same way as on the
+command line without the program name, for example::
+
+   bucket add --name=x
+   bucket delete --name=y
+
+Blank lines and lines starting with # are skipped. A line which can't be
+split into words, such as one with an unclosed quote, fails on its own with
+NOT_ENOUGH_PARAMETERS and the rest of the batch still runs.
+
+With more than one job the invocations are fanned out to a pool of worker
+processes which each import the plugin package up front. Their stdout and
+stderr are captured per invocation and written back by the parent, either
+in input order or as each invocation completes.
+
+I/O bound verbs can instead be run concurrently on a bounded number of
+threads in the same process. Each thread has its own runner and actions,
+and output goes straight to the real streams.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import cPickle
+import multiprocessing
+import Queue
+import shlex
+import StringIO
+import sys
+import threading
+import traceback
+
+from optparse import OptionParser
+
+from director import ActionRunner
+from director import close_process_actions
+from director import codes
+from director import err
+from director import out
+from director import output
+from director.options import PARSER_BACKENDS
+from director.manifest import warm_plugins
+from director.resources import close_pools
+
+
+# The BatchRunner and filter of a worker process
+_WORKER = None
+_WORKER_FILTER = None
+
+# Classes standing in for exceptions which couldn't be sent from a worker,
+# keyed by (filtered class, name of the exception class)
+_STAND_IN_CLASSES = {}
+
+
+def exit_code(system_exit):
+    """
+    Returns the exit code the interpreter would use for a SystemExit,
+    writing its message to stderr the way the interpreter would.
+
+    :Parameters:
+        - `system_exit`: the SystemExit raised.
+    """
+    if system_exit.code is None:
+        return codes.system.SYSTEM_OK
+    if isinstance(system_exit.code, int):
+        return system_exit.code
+    err(system_exit.code)
+    return 1
+
+
+def call_for_exit_code(func, *args, **kwargs):
+    """
+    Calls a function and returns the exit code the interpreter would have
+    exited with had the call been the whole program.
+
+    :Parameters:
+        - `func`: the callable to run.
+        - `*args`: any non keyword arguments.
+        - `**kwargs`: all keyword arguments.
+    """
+    try:
+        try:
+            func(*args, **kwargs)
+        except SystemExit, se:
+            return exit_code(se)
+        except:
+            # Mirror what the interpreter does with an uncaught exception
+            output.flush()
+            traceback.print_exc()
+            return 1
+        return codes.system.SYSTEM_OK
+    finally:
+        output.flush()
+
+
+def read_invocations(lines):
+    """
+    Yields (line number, args) for every invocation in an iterable of lines.
+    For a line which can't be split args is the ValueError raised instead.
+
+    :Parameters:
+        - `lines`: the batch lines, usually a file object.
+    """
+    line_no = 0
+    for line in lines:
+        line_no += 1
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        try:
+            yield line_no, shlex.split(line)
+        except ValueError, ve:
+            yield line_no, ve
+
+
+class BatchRunner(ActionRunner):
+    """
+    Runs many invocations with one ActionRunner so imported modules and
+    created actions are shared by the whole batch.
+    """
+
+    batch = True
+
+    def __init__(self, plugin_package, prog='myapp', manifest=None,
+                 parser_backend='optparse', output_format='text'):
+        """
+        Creates the BatchRunner object.
+
+        :Parameters:
+            - `plugin_package`: the name of the package where plugins live,
+              or a search path of them.
+            - `prog`: the program name to use as the first argument.
+            - `manifest`: optional loaded director.manifest.Manifest to
+              consult before importing plugin code.
+            - `parser_backend`: which option parser to use, 'optparse' or
+              the quicker 'fast' one.
+            - `output_format`: the format for records when an invocation
+              doesn't give --format, see director.formatters.
+        """
+        self._init_state(plugin_package, manifest,
+                         PARSER_BACKENDS[parser_backend], output_format)
+        self.prog = prog
+        self.parser_backend = parser_backend
+
+    def run_args(self, args, filter_obj=None):
+        """
+        Runs one invocation. Returns its exit code.
+
+        :Parameters:
+            - `args`: the invocation without the program name.
+            - `filter_obj`: the filter object.
+        """
+        return call_for_exit_code(self._run_args, args, filter_obj)
+
+    def run_invocation(self, line_no, args, filter_obj=None):
+        """
+        Runs one invocation read by read_invocations. Returns its exit code.
+
+        :Parameters:
+            - `line_no`: the line number of the invocation.
+            - `args`: the invocation without the program name, or the
+              ValueError raised splitting its line.
+            - `filter_obj`: the filter object.
+        """
+        if isinstance(args, ValueError):
+            err("line %s: %s" % (line_no, args))
+            output.flush()
+            return codes.system.NOT_ENOUGH_PARAMETERS
+        return self.run_args(args, filter_obj)
+
+    def _run_args(self, args, filter_obj):
+        """
+        Loads and runs one invocation.
+
+        :Parameters:
+            - `args`: the invocation without the program name.
+            - `filter_obj`: the filter object.
+        """
+        self.load_args([self.prog] + args)
+        self.run(filter_obj)
+
+    def run_batch(self, lines, filter_obj=None):
+        """
+        Runs every invocation in lines. Returns a list of
+        (line number, exit code) pairs.
+
+        :Parameters:
+            - `lines`: the batch lines, usually a file object.
+            - `filter_obj`: the filter object.
+        """
+        results = []
+        for line_no, args in read_invocations(lines):
+            results.append(
+                (line_no, self.run_invocation(line_no, args, filter_obj)))
+        self.close()
+        _finish(filter_obj)
+        return results
+
+    def run_parallel(self, lines, filter_obj=None, jobs=None, ordered=True,
+                     chunksize=16):
+        """
+        Runs every invocation in lines over a pool of worker processes.
+        Returns a list of (line number, exit code) pairs in input order.
+
+        :Parameters:
+            - `lines`: the batch lines, usually a file object.
+            - `filter_obj`: the filter object.
+            - `jobs`: how many worker processes to use, defaults to the
+              number of cpus.
+            - `ordered`: write output in input order instead of as each
+              invocation completes.
+            - `chunksize`: how many invocations to hand a worker at once.
+        """
+        # Split the lines here: errors in the pool's task feeder thread are
+        # swallowed and would silently end the batch
+        invocations = list(read_invocations(lines))
+        # Import everything before forking so workers start warm
+        warm_plugins(self.plugin_package, self.parser_class)
+        pool = multiprocessing.Pool(jobs, _init_worker,
+                                    (self.plugin_package, self.prog,
+                                     self.manifest, self.parser_backend,
+                                     self.default_format, filter_obj))
+        try:
+            if ordered:
+                pool_map = pool.imap
+            else:
+                pool_map = pool.imap_unordered
+            results = []
+            for line_no, code, stdout_data, stderr_data, filtered in pool_map(
+                _run_in_worker, invocations, chunksize):
+                out(stdout_data, False)
+                err(stderr_data, False)
+                # Filters run here so they see the whole batch
+                for exception, invocation in filtered:
+                    if isinstance(exception, _Unpicklable):
+                        exception = exception.stand_in(filter_obj)
+                    filter_obj.execute_filters(exception, invocation)
+                results.append((line_no, code))
+            output.flush()
+            # Let the workers exit by themselves so they close their actions
+            pool.close()
+            pool.join()
+        finally:
+            pool.terminate()
+            pool.join()
+        _finish(filter_obj)
+        results.sort()
+        return results
+
+    def run_threaded(self, lines, filter_obj=None, threads=8):
+        """
+        Runs every invocation in lines with at most threads of them in
+        flight at once. Returns a list of (line number, exit code) pairs in
+        input order.
+
+        :Parameters:
+            - `lines`: the batch lines, usually a file object.
+            - `filter_obj`: the filter object.
+            - `threads`: how many invocations may run at the same time.
+        """
+        # Import up front so threads don't fight over the import lock
+        warm_plugins(self.plugin_package, self.parser_class)
+        # Bounding the queue keeps us from reading far ahead of the threads
+        invocations = Queue.Queue(threads * 2)
+        results = []
+        workers = []
+        for x in range(threads):
+            worker = threading.Thread(target=self._thread_worker,
+                                      args=(invocations, results, filter_obj))
+            worker.setDaemon(True)
+            worker.start()
+            workers.append(worker)
+        for invocation in read_invocations(lines):
+            invocations.put(invocation)
+        for worker in workers:
+            invocations.put(None)
+        for worker in workers:
+            worker.join()
+        self.close()
+        _finish(filter_obj)
+        results.sort()
+        return results
+
+    def _thread_worker(self, invocations, results, filter_obj):
+        """
+        Runs invocations from a queue until it hands out None.
+
+        :Parameters:
+            - `invocations`: the queue of (line number, args) pairs.
+            - `results`: the list to append (line number, exit code) to.
+            - `filter_obj`: the filter object.
+        """
+        runner = BatchRunner(self.plugin_package, self.prog, self.manifest,
+                             self.parser_backend, self.default_format)
+        while True:
+            invocation = invocations.get()
+            if invocation is None:
+                break
+            line_no, args = invocation
+            results.append(
+                (line_no, runner.run_invocation(line_no, args, filter_obj)))
+        runner.close()
+
+
+def _init_worker(plugin_package, prog, manifest, parser_backend,
+                 output_format, filter_obj):
+    """
+    Sets up the BatchRunner of a worker process.
+
+    :Parameters:
+        - `plugin_package`: the name of the package where plugins live,
+          or a search path of them.
+        - `prog`: the program name to use as the first argument.
+        - `manifest`: optional loaded director.manifest.Manifest.
+        - `parser_backend`: which option parser to use.
+        - `output_format`: the default format for records.
+        - `filter_obj`: the filter object.
+    """
+    global _WORKER, _WORKER_FILTER
+    _WORKER = BatchRunner(plugin_package, prog, manifest, parser_backend,
+                          output_format)
+    # Workers leave through os._exit so atexit never runs in them
+    multiprocessing.util.Finalize(_WORKER, _close_worker, exitpriority=10)
+    warm_plugins(plugin_package, _WORKER.parser_class)
+    if filter_obj is not None:
+        _WORKER_FILTER = _RecordingFilter(filter_obj)
+
+
+def _close_worker():
+    """
+    Closes the actions and pools of a worker process as the pool shuts it
+    down.
+    """
+    _WORKER.close()
+    close_process_actions()
+    close_pools()
+
+
+def _run_in_worker(invocation):
+    """
+    Runs one invocation in a worker process capturing its output. Returns
+    (line number, exit code, stdout, stderr, filtered exceptions).
+
+    :Parameters:
+        - `invocation`: the (line number, args) pair to run.
+    """
+    line_no, args = invocation
+    old_stdout, old_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO.StringIO(), StringIO.StringIO()
+    filtered = []
+    if _WORKER_FILTER is not None:
+        _WORKER_FILTER.records = filtered
+    try:
+        code = _WORKER.run_invocation(line_no, args, _WORKER_FILTER)
+        return (line_no, code, sys.stdout.getvalue(), sys.stderr.getvalue(),
+                filtered)
+    finally:
+        sys.stdout, sys.stderr = old_stdout, old_stderr
+
+
+class _RecordingFilter(object):
+    """
+    Stands in for the real filter in worker processes. Exceptions the real
+    filter would handle are recorded so the parent can filter them. Those
+    which can't be sent to the parent are recorded as _Unpicklable.
+    """
+
+    def __init__(self, filter_obj):
+        """
+        Creates the _RecordingFilter object.
+
+        :Parameters:
+            - `filter_obj`: the real filter object.
+        """
+        self.filter_obj = filter_obj
+        self.records = []
+
+    def execute_filters(self, exception, invocation=None):
+        """
+        Records an exception for the parent. True on filter, False
+        otherwise.
+
+        :Parameters:
+            - `exception`: the exception that is going to be filtered.
+            - `invocation`: the arguments of the invocation that raised it.
+        """
+        exception_filter = self.filter_obj.find_filter(type(exception))
+        if exception_filter is None:
+            return False
+        try:
+            cPickle.loads(cPickle.dumps(exception, 2))
+        except Exception:
+            exception = _Unpicklable(
+                self.filter_obj.index(exception_filter),
+                type(exception).__name__, str(exception))
+        self.records.append((exception, invocation))
+        return True
+
+    def finish(self):
+        """
+        The parent finishes the real filter.
+        """
+        pass
+
+
+def _stand_in_init(self, message):
+    """
+    Creates an exception standing in for one a worker couldn't send.
+
+    :Parameters:
+        - `message`: str of the original exception.
+    """
+    self.args = (message, )
+
+
+def _stand_in_str(self):
+    """
+    Returns the message of the original exception.
+    """
+    return self.args[0]
+
+
+class _Unpicklable(object):
+    """
+    What a worker sends the parent for an exception which can't be pickled:
+    the filter handling it, the name of its class and its message.
+    """
+
+    def __init__(self, filter_index, type_name, message):
+        """
+        Creates the _Unpicklable object.
+
+        :Parameters:
+            - `filter_index`: where the ExceptionFilter handling the
+              exception is in the filter.
+            - `type_name`: the name of the class of the exception.
+            - `message`: str of the exception.
+        """
+        self.filter_index = filter_index
+        self.type_name = type_name
+        self.message = message
+
+    def stand_in(self, filter_obj):
+        """
+        Returns an exception the parent's filter handles as it would have
+        the original, with the same class name and message.
+
+        :Parameters:
+            - `filter_obj`: the filter object of the parent.
+        """
+        base = filter_obj[self.filter_index].exception
+        key = (base, self.type_name)
+        try:
+            stand_in_class = _STAND_IN_CLASSES[key]
+        except KeyError:
+            # Only the message is known, so neither the __init__ nor the
+            # __str__ of the original class can be used
+            stand_in_class = type(self.type_name, (base, ), {
+                '__init__': _stand_in_init, '__str__': _stand_in_str})
+            _STAND_IN_CLASSES[key] = stand_in_class
+        return stand_in_class(self.message)
+
+
+def _finish(filter_obj):
+    """
+    Finishes the filter of a batch, if there is one.
+
+    :Parameters:
+        - `filter_obj`: the filter object.
+    """
+    if filter_obj:
+        filter_obj.finish()
+        output.flush()
+
+
+def report(results):
+    """
+    Writes the failed lines of a batch to stderr. Returns the highest exit
+    code seen.
+
+    :Parameters:
+        - `results`: the (line number, exit code) pairs of a batch.
+    """
+    worst = codes.system.SYSTEM_OK
+    for line_no, code in results:
+        if code != codes.system.SYSTEM_OK:
+            err("line %s: exit code %s" % (line_no, code))
+            worst = max(worst, code)
+    output.flush()
+    return worst
+
+
+def main(args, plugin_package, filter_obj=None, manifest=None):
+    """
+    Runs a batch file (or stdin when it is - or missing) from the command
+    line. Returns the exit code to use.
+
+    :Parameters:
+        - `args`: all args passed from command line.
+        - `plugin_package`: the name of the package where plugins live,
+          or a search path of them.
+        - `filter_obj`: the filter object.
+        - `manifest`: optional loaded director.manifest.Manifest.
+    """
+    parser = OptionParser(
+        usage='%prog [--jobs=N] [--unordered] [--threads=N] [--format=F] '
+              '[file]')
+    parser.add_option('--jobs', dest='jobs', type='int', default=1,
+                      help='number of worker processes to use')
+    parser.add_option('--threads', dest='threads', type='int', default=1,
+                      help='number of invocations to run concurrently')
+    parser.add_option('--unordered', dest='ordered', action='store_false',
+                      default=True, help='write output as it completes')
+    parser.add_option('--format', dest='output_format', default='text',
+                      help='format for records returned by verbs')
+    options, largs = parser.parse_args(args[1:])
+
+    runner = BatchRunner(plugin_package, args[0], manifest,
+                         output_format=options.output_format)
+    if not largs or largs[0] == '-':
+        batch_file = sys.stdin
+    else:
+        batch_file = open(largs[0], 'r')
+    try:
+        if options.jobs > 1:
+            return report(runner.run_parallel(
+                batch_file, filter_obj, options.jobs, options.ordered))
+        if options.threads > 1:
+            return report(runner.run_threaded(
+                batch_file, filter_obj, options.threads))
+        return report(runner.run_batch(batch_file, filter_obj))
+    finally:
+        if batch_file is not sys.stdin:
+            batch_file.close()
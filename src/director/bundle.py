@@ -0,0 +1,107 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Zip bundles of plugin packages and director.
+
+A bundle holds the compiled bytecode of director and of the top level
+packages the plugin packages belong to. Putting it first on sys.path lets
+zipimport load everything from the one file, so starting up on a slow
+filesystem costs a single open instead of a stat or two per module::
+
+   $ python -m director.bundle /opt/myapp/myapp.zip myapp.actions
+
+::
+
+   #!/usr/bin/env python
+   import sys
+   sys.path.insert(0, '/opt/myapp/myapp.zip')
+
+   from director import ActionRunner
+   ActionRunner(sys.argv, 'myapp.actions').run()
+
+Only modules are bundled; data files next to them are left out.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import imp
+import StringIO
+import sys
+import zipfile
+
+from director.files import atomic_write
+from director.plugins import package_path
+
+
+def _package_dir(name):
+    """
+    Returns the directory of a top level package without importing it.
+
+    :Parameters:
+        - `name`: the name of the package.
+    """
+    pkg_file, pathname, description = imp.find_module(name)
+    if pkg_file is not None:
+        pkg_file.close()
+    if description[2] != imp.PKG_DIRECTORY:
+        raise ImportError("%s is not a package" % name)
+    return pathname
+
+
+def build_bundle(path, plugin_package, include_director=True):
+    """
+    Atomically writes a zip bundle of plugin packages with their bytecode.
+    Returns the names written to the bundle.
+
+    :Parameters:
+        - `path`: where to write the bundle.
+        - `plugin_package`: the name of the package where plugins live, or a
+          search path of them. The whole top level package each belongs to
+          is bundled.
+        - `include_director`: if director itself goes in the bundle.
+    """
+    top_levels = []
+    if include_director:
+        top_levels.append('director')
+    for package in package_path(plugin_package):
+        top_level = package.split('.')[0]
+        if top_level not in top_levels:
+            top_levels.append(top_level)
+    data = StringIO.StringIO()
+    bundle = zipfile.PyZipFile(data, 'w', zipfile.ZIP_DEFLATED)
+    try:
+        for top_level in top_levels:
+            # writepy compiles anything missing or stale on the way
+            bundle.writepy(_package_dir(top_level))
+        names = bundle.namelist()
+    finally:
+        bundle.close()
+    atomic_write(path, data.getvalue(), '.bundle-')
+    return names
+
+
+def main(args=sys.argv):
+    """
+    Builds a bundle from the command line.
+
+    :Parameters:
+        - `args`: all args passed from command line.
+    """
+    if len(args[1:]) != 2:
+        sys.stderr.write("Usage: %s bundle_path plugin_package"
+                         "[,plugin_package...]\n" % args[0])
+        return 1
+    build_bundle(args[1], args[2].split(','))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Thin client for director.daemon.
+
+This module only uses the standard library so it can be run directly as a
+script without paying for importing director and the plugins::
+
+   $ python /path/to/director/client.py /tmp/myapp.sock noun verb --opt=val
+
+See director.daemon for the wire format.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import json
+import os
+import socket
+import struct
+import sys
+
+
+FRAME_HEADER = struct.Struct('>I')
+
+# Same value as director.codes.system.DAEMON_UNAVAILABLE. It is repeated
+# here so the client never has to import director.
+DAEMON_UNAVAILABLE = 3
+
+
+def _to_text(data):
+    """
+    Returns a byte string as the text JSON can carry, one character per
+    byte, so arguments and environment in any encoding get through.
+
+    :Parameters:
+        - `data`: the byte string, or unicode which is sent as UTF-8.
+    """
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return data.decode('latin-1')
+
+
+def _read_frame(sock_file):
+    """
+    Reads one frame from a socket file. Returns None on end of stream.
+
+    :Parameters:
+        - `sock_file`: the file object wrapping the socket.
+    """
+    header = sock_file.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    length = FRAME_HEADER.unpack(header)[0]
+    data = sock_file.read(length)
+    if len(data) < length:
+        return None
+    return data
+
+
+def _write_frame(sock_file, data):
+    """
+    Writes one frame to a socket file.
+
+    :Parameters:
+        - `sock_file`: the file object wrapping the socket.
+        - `data`: the bytes to send.
+    """
+    sock_file.write(FRAME_HEADER.pack(len(data)))
+    sock_file.write(data)
+
+
+def call(socket_path, argv, stdin_data=''):
+    """
+    Forwards a command to the server. Returns (exit code, stdout, stderr).
+
+    :Parameters:
+        - `socket_path`: the unix domain socket the server listens on.
+        - `argv`: the command line arguments to run.
+        - `stdin_data`: what the command should see on stdin.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock_file = sock.makefile('rwb')
+        header = json.dumps({
+            'argv': [_to_text(x) for x in argv],
+            'env': dict([(_to_text(k), _to_text(v))
+                         for k, v in os.environ.items()]),
+            'cwd': _to_text(os.getcwd())})
+        _write_frame(sock_file, header)
+        _write_frame(sock_file, stdin_data)
+        sock_file.flush()
+        response = _read_frame(sock_file)
+        stdout_data = _read_frame(sock_file)
+        stderr_data = _read_frame(sock_file)
+        sock_file.close()
+    finally:
+        sock.close()
+    if response is None or stdout_data is None or stderr_data is None:
+        raise socket.error('Incomplete response from %s' % socket_path)
+    return json.loads(response)['code'], stdout_data, stderr_data
+
+
+def main(socket_path, args=sys.argv, forward_stdin=None):
+    """
+    Runs a command through the server and mirrors its output and exit code.
+
+    :Parameters:
+        - `socket_path`: the unix domain socket the server listens on.
+        - `args`: all args passed from command line.
+        - `forward_stdin`: whether to send our stdin to the command. By
+          default it is only sent when stdin is not a terminal.
+    """
+    if forward_stdin is None:
+        forward_stdin = not os.isatty(sys.stdin.fileno())
+    stdin_data = ''
+    if forward_stdin:
+        stdin_data = sys.stdin.read()
+    try:
+        code, stdout_data, stderr_data = call(socket_path, args, stdin_data)
+    except socket.error, se:
+        sys.stderr.write("Could not reach %s: %s\n" % (socket_path, se))
+        return DAEMON_UNAVAILABLE
+    sys.stdout.write(stdout_data)
+    sys.stdout.flush()
+    sys.stderr.write(stderr_data)
+    return code
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write("Usage: %s socket_path noun verb [--opt=val]...\n" %
+                         sys.argv[0])
+        raise SystemExit(DAEMON_UNAVAILABLE)
+    raise SystemExit(main(sys.argv[1], sys.argv[:1] + sys.argv[2:]))
@@ -13,6 +13,7 @@ Code symbols for system related items.
 - *SYSTEM_OK*: Exit to shell if everything was OK.
 - *NOT_ENOUGH_PARAMETERS*: Exit to shell if not enough parameters are passed.
 - *EXCEPTION_RAISED*: Exit to the shell if an exception is raised.
+- *DAEMON_UNAVAILABLE*: Exit to the shell if the daemon can not be reached.
 """
 
 __docformat__ = 'restructuredtext'
@@ -21,3 +22,4 @@ __docformat__ = 'restructuredtext'
 SYSTEM_OK = 0
 NOT_ENOUGH_PARAMETERS = 1
 EXCEPTION_RAISED = 2
+DAEMON_UNAVAILABLE = 3
@@ -0,0 +1,327 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Shell completion answered from a precomputed index.
+
+The index maps every noun to its verbs and every verb to its options and
+is built from a director.manifest.Manifest. It starts with a table of the
+nouns and where the verbs of each are stored further on, so answering a
+completion reads the table and at most one noun's verbs however many nouns
+there are. Only the standard library is used at the top level, so this
+module can be run directly as a script without importing director::
+
+   $ python -S /path/to/director/completion.py myapp.idx 2 myapp bucket a
+   add
+
+The scripts made by shell_script hook this up for bash and zsh.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import bisect
+import marshal
+import sys
+
+
+INDEX_VERSION = 2
+
+# Same as director.PIPE_SEPARATOR, which can't be imported from here
+PIPE_SEPARATOR = '--then'
+
+# The options ActionRunner takes before the noun, those ending in = take a
+# value which may also be given as the next word
+GLOBAL_OPTIONS = ('--director-profile', '--format=')
+
+BASH_SCRIPT = """_%(name)s_complete()
+{
+    COMPREPLY=( $(%(python)s -S -c %(code)s %(index)s "$COMP_CWORD" \\
+                  "${COMP_WORDS[@]}") )
+    # Options waiting for a value shouldn't get a space after them
+    if [[ ${#COMPREPLY[@]} -eq 1 && ${COMPREPLY[0]} == *= ]]; then
+        compopt -o nospace 2>/dev/null
+    fi
+}
+complete -F _%(name)s_complete %(prog)s
+"""
+
+# Importing the module instead of running it as a script uses its bytecode
+SCRIPT_CODE = ("import sys; sys.path[0] = %r; import completion; "
+               "sys.exit(completion.main(sys.argv))")
+
+# zsh understands bash completion functions once bashcompinit is loaded
+ZSH_SCRIPT = """autoload -U +X bashcompinit && bashcompinit
+""" + BASH_SCRIPT
+
+
+def build_index(manifest, path):
+    """
+    Writes a completion index for everything in a manifest.
+
+    :Parameters:
+        - `manifest`: a loaded director.manifest.Manifest.
+        - `path`: where to write the index.
+    """
+    nouns = manifest.data['nouns'].keys()
+    nouns.sort()
+    blobs = []
+    offsets = [0]
+    for noun in nouns:
+        entry = manifest.data['nouns'][noun]
+        verbs = {}
+        for verb, verb_entry in entry['verbs'].items():
+            options = []
+            if verb_entry['spec'] is not None:
+                for name, action in verb_entry['spec']['options']:
+                    if action == 'store':
+                        options.append("--%s=" % name)
+                    else:
+                        options.append("--%s" % name)
+            options.sort()
+            verbs[verb] = tuple(options)
+        blobs.append(marshal.dumps(verbs))
+        offsets.append(offsets[-1] + len(blobs[-1]))
+    # Answering a completion mustn't pay for what only building needs,
+    # without site even os is slow to import
+    from director.files import atomic_write
+
+    # The table is kept flat as it is read for every completion
+    atomic_write(path, marshal.dumps(
+        (INDEX_VERSION, "\n".join(nouns), tuple(offsets))) + ''.join(blobs),
+        '.index-')
+
+
+class CompletionIndex(object):
+    """
+    An open completion index. The verbs of a noun are read the first time
+    they are asked for.
+    """
+
+    def __init__(self, index_file, nouns, offsets, base):
+        """
+        Creates the CompletionIndex object.
+
+        :Parameters:
+            - `index_file`: the open index file.
+            - `nouns`: the sorted list of nouns.
+            - `offsets`: where the verbs of each noun start, relative to
+              base, followed by where the last one ends.
+            - `base`: where the verbs start in the file.
+        """
+        self.nouns = nouns
+        self._offsets = offsets
+        self._file = index_file
+        self._base = base
+        self._verbs = {}
+
+    def verbs(self, noun):
+        """
+        Returns a dictionary mapping the verbs of a noun to their options,
+        empty for an unknown noun.
+
+        :Parameters:
+            - `noun`: the noun to look up.
+        """
+        try:
+            return self._verbs[noun]
+        except KeyError:
+            pass
+        verbs = {}
+        position = bisect.bisect_left(self.nouns, noun)
+        if position < len(self.nouns) and self.nouns[position] == noun:
+            start, end = self._offsets[position:position + 2]
+            self._file.seek(self._base + start)
+            try:
+                verbs = marshal.loads(self._file.read(end - start))
+            except (EOFError, ValueError, TypeError):
+                pass
+        self._verbs[noun] = verbs
+        return verbs
+
+    def nouns_starting(self, prefix):
+        """
+        Returns the sorted nouns starting with a prefix.
+
+        :Parameters:
+            - `prefix`: what the nouns start with.
+        """
+        start = bisect.bisect_left(self.nouns, prefix)
+        end = start
+        while end < len(self.nouns) and self.nouns[end].startswith(prefix):
+            end += 1
+        return self.nouns[start:end]
+
+    def close(self):
+        """
+        Closes the index file.
+        """
+        self._file.close()
+
+
+def load_index(path):
+    """
+    Opens a completion index, reading only its noun table. Returns a
+    CompletionIndex or None if the index is missing or unusable.
+
+    :Parameters:
+        - `path`: where the index lives.
+    """
+    try:
+        index_file = open(path, 'rb')
+    except IOError:
+        return None
+    try:
+        # marshal.load leaves the file right after the table
+        header = marshal.load(index_file)
+    except (IOError, EOFError, ValueError, TypeError):
+        header = None
+    if type(header) != tuple or len(header) != 3 or (
+            header[0] != INDEX_VERSION):
+        index_file.close()
+        return None
+    nouns = header[1] and header[1].split("\n") or []
+    return CompletionIndex(index_file, nouns, header[2], index_file.tell())
+
+
+def _join_values(words, cword):
+    """
+    Puts options and their values back together where bash split them
+    on =, as in --format = csv. Returns the words and the new position of
+    the word being completed.
+
+    :Parameters:
+        - `words`: the command line words, program name first.
+        - `cword`: the position of the word being completed.
+    """
+    joined = []
+    joined_cword = cword
+    position = 0
+    while position < len(words):
+        word = words[position]
+        if (word == '=' and joined and joined[-1][:2] == '--' and
+            '=' not in joined[-1]):
+            joined[-1] += word
+            # The value, if there is one yet, is part of the same word
+            taken = 1
+            if position + 1 < len(words):
+                joined[-1] += words[position + 1]
+                taken = 2
+            if cword >= position + taken:
+                joined_cword -= taken
+            elif cword >= position:
+                joined_cword = len(joined) - 1
+            position += taken
+            continue
+        joined.append(word)
+        position += 1
+    return joined, joined_cword
+
+
+def complete(index, words, cword):
+    """
+    Returns the sorted candidates for the word being completed.
+
+    :Parameters:
+        - `index`: an open CompletionIndex.
+        - `words`: the command line words, program name first.
+        - `cword`: the position of the word being completed.
+    """
+    words, cword = _join_values(words, cword)
+    if cword < len(words):
+        prefix = words[cword]
+    else:
+        prefix = ''
+    if prefix[:2] == '--' and '=' in prefix:
+        # Option values are not ours to complete, and where bash split the
+        # word it would only replace the part after the =
+        return []
+    # Each stage of a pipeline completes like a command line of its own
+    for position in range(min(cword, len(words)) - 1, 0, -1):
+        if words[position] == PIPE_SEPARATOR:
+            words = words[position:]
+            cword -= position
+            break
+    else:
+        # Options for director itself come before the noun
+        position = 1
+        while position < cword and words[position][:2] == '--':
+            if words[position] + '=' in GLOBAL_OPTIONS:
+                position += 1
+            position += 1
+        if position > cword:
+            # The value of a global option
+            return []
+        words = words[:1] + words[position:]
+        cword -= position - 1
+        if cword == 1 and prefix[:1] == '-':
+            candidates = [x for x in GLOBAL_OPTIONS if x.startswith(prefix)]
+            candidates.sort()
+            return candidates
+    if cword == 1:
+        return index.nouns_starting(prefix)
+    elif cword == 2:
+        candidates = index.verbs(words[1]).keys()
+    elif prefix[:1] == '-':
+        candidates = index.verbs(words[1]).get(words[2], ())
+    else:
+        # Option values and positional arguments are not ours to complete
+        candidates = ()
+    candidates = [x for x in candidates if x.startswith(prefix)]
+    candidates.sort()
+    return candidates
+
+
+def shell_script(shell, prog, index_path):
+    """
+    Returns the script to source for completing prog in a shell.
+
+    :Parameters:
+        - `shell`: bash or zsh.
+        - `prog`: the name of the program to complete.
+        - `index_path`: where the completion index lives.
+    """
+    import os
+    import pipes
+
+    code = SCRIPT_CODE % os.path.dirname(os.path.abspath(__file__))
+    values = {'name': prog.replace('-', '_'),
+              'prog': prog,
+              'python': sys.executable,
+              'code': pipes.quote(code),
+              'index': pipes.quote(os.path.abspath(index_path))}
+    if shell == 'zsh':
+        return ZSH_SCRIPT % values
+    return BASH_SCRIPT % values
+
+
+def main(args=sys.argv):
+    """
+    Prints the candidates for a completion, one per line.
+
+    :Parameters:
+        - `args`: program name, index path, word position and the words.
+    """
+    if len(args) < 4:
+        sys.stderr.write("Usage: %s index_path cword words...\n" % args[0])
+        return 1
+    index = load_index(args[1])
+    if index is None:
+        return 1
+    try:
+        candidates = complete(index, args[3:], int(args[2]))
+    finally:
+        index.close()
+    for candidate in candidates:
+        sys.stdout.write(candidate + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Persistent server hosting ActionRunner behind a unix domain socket.
+
+The server imports director and every plugin once and then forks a child
+per request, so each command starts from a warm interpreter while still
+getting its own environment, working directory and standard streams. The
+matching client lives in director.client.
+
+Every message on the socket is a sequence of frames, each a 4 byte big
+endian length followed by that many bytes. A request is a JSON header
+(argv, env and cwd) followed by the stdin data. A response is a JSON header
+(the exit code) followed by the stdout and stderr data. The strings in the
+request header hold one character per byte, as if decoded from latin-1, as
+arguments and the environment need not be valid UTF-8.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import json
+import os
+import SocketServer
+import StringIO
+import struct
+import sys
+
+from director import ActionRunner
+from director import close_process_actions
+from director.batch import call_for_exit_code
+from director.manifest import warm_plugins
+from director.resources import close_pools
+
+
+FRAME_HEADER = struct.Struct('>I')
+
+
+def read_frame(sock_file):
+    """
+    Reads one frame from a socket file. Returns None on end of stream.
+
+    :Parameters:
+        - `sock_file`: the file object wrapping the socket.
+    """
+    header = sock_file.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    length = FRAME_HEADER.unpack(header)[0]
+    data = sock_file.read(length)
+    if len(data) < length:
+        return None
+    return data
+
+
+def write_frame(sock_file, data):
+    """
+    Writes one frame to a socket file.
+
+    :Parameters:
+        - `sock_file`: the file object wrapping the socket.
+        - `data`: the bytes to send.
+    """
+    sock_file.write(FRAME_HEADER.pack(len(data)))
+    sock_file.write(data)
+
+
+def _to_str(text):
+    """
+    Turns decoded JSON text back into the byte string the client sent.
+
+    :Parameters:
+        - `text`: the unicode text to encode.
+    """
+    return text.encode('latin-1')
+
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    """
+    Runs a single forwarded command in the forked child.
+    """
+
+    def handle(self):
+        """
+        Reads a request, runs it and writes back the response.
+        """
+        header = read_frame(self.rfile)
+        stdin_data = read_frame(self.rfile)
+        if header is None or stdin_data is None:
+            return
+        request = json.loads(header)
+        argv = [_to_str(x) for x in request['argv']]
+        env = dict([(_to_str(k), _to_str(v))
+                    for k, v in request['env'].items()])
+
+        # We are in a forked child so the process state is ours to change
+        os.environ.clear()
+        os.environ.update(env)
+        os.chdir(_to_str(request['cwd']))
+        sys.stdin = StringIO.StringIO(stdin_data)
+        sys.stdout = StringIO.StringIO()
+        sys.stderr = StringIO.StringIO()
+        exit_code = self.server.run_command(argv)
+
+        write_frame(self.wfile, json.dumps({'code': exit_code}))
+        write_frame(self.wfile, sys.stdout.getvalue())
+        write_frame(self.wfile, sys.stderr.getvalue())
+
+    def finish(self):
+        """
+        Sends the response, then closes what the command left open. The
+        child leaves through os._exit so atexit never runs in it.
+        """
+        try:
+            SocketServer.StreamRequestHandler.finish(self)
+        finally:
+            close_process_actions()
+            close_pools()
+
+
+class DirectorServer(SocketServer.ForkingMixIn,
+                     SocketServer.UnixStreamServer):
+    """
+    Keeps a warm interpreter with the plugin package imported and serves
+    commands over a unix domain socket.
+    """
+
+    def __init__(self, socket_path, plugin_package, filter_obj=None,
+                 manifest=None):
+        """
+        Creates the DirectorServer object.
+
+        :Parameters:
+            - `socket_path`: where to create the unix domain socket.
+            - `plugin_package`: the name of the package where plugins live,
+              or a search path of them.
+            - `filter_obj`: the filter object to run commands with.
+            - `manifest`: optional loaded director.manifest.Manifest.
+        """
+        self.socket_path = socket_path
+        self.plugin_package = plugin_package
+        self.filter_obj = filter_obj
+        self.manifest = manifest
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        # Only the owner may talk to the server
+        old_umask = os.umask(0177)
+        try:
+            SocketServer.UnixStreamServer.__init__(
+                self, socket_path, RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.warm()
+
+    def warm(self):
+        """
+        Imports every noun so forked children start with them loaded.
+        """
+        warm_plugins(self.plugin_package)
+
+    def run_command(self, argv):
+        """
+        Runs a command the same way the command line would. Returns the
+        exit code.
+
+        :Parameters:
+            - `argv`: the forwarded command line arguments.
+        """
+        return call_for_exit_code(self._run_command, argv)
+
+    def _run_command(self, argv):
+        """
+        Creates an ActionRunner for the command and runs it.
+
+        :Parameters:
+            - `argv`: the forwarded command line arguments.
+        """
+        ActionRunner(argv, self.plugin_package,
+                     self.manifest).run(self.filter_obj)
+
+    def server_close(self):
+        """
+        Closes the socket and removes the socket file.
+        """
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def serve(socket_path, plugin_package, filter_obj=None, manifest=None):
+    """
+    Runs a DirectorServer until interrupted.
+
+    :Parameters:
+        - `socket_path`: where to create the unix domain socket.
+        - `plugin_package`: the name of the package where plugins live,
+          or a search path of them.
+        - `filter_obj`: the filter object to run commands with.
+        - `manifest`: optional loaded director.manifest.Manifest.
+    """
+    server = DirectorServer(socket_path, plugin_package, filter_obj, manifest)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
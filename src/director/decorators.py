@@ -9,11 +9,119 @@
 # Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
 """
 All decorators for director.
+
+Besides help, verbs which only read can have their results cached with
+cached. It stacks with the help decorators in either order::
+
+   @general_help("Lists the buckets.")
+   @cached(maxsize=64, ttl=60, cache_dir='/var/cache/myapp')
+   def list(self, owner=None):
+       ...
+
+Results are kept in memory for as long as the process lives, which pays off
+in the daemon and batch runners, and with a cache_dir also on disk where
+every invocation of the command line shares them.
+
+Options which take files, given as @path on the command line, are named
+with file_options::
+
+   @general_help("Imports a roster.")
+   @file_options('input')
+   def load(self, input):
+       ...
 """
 
 __docformat__ = 'restructuredtext'
 
 
+import errno
+import functools
+import inspect
+import marshal
+import os
+import threading
+import time
+import types
+
+from collections import OrderedDict
+
+from director.files import atomic_write
+
+
+class VerbWrapper(object):
+    """
+    Wraps a class method, keeping the original method as meth along with
+    the pieces of its help. The help text itself is only put together the
+    first time the help variable is read.
+    """
+
+    def __init__(self, meth, desc=None, options=None, examples=None,
+                 help_txt=None):
+        """
+        Creates the VerbWrapper object.
+
+        :Parameters:
+            - `meth`: the actual class method.
+            - `desc`: the description.
+            - `options`: a dictionary mapping options and their descriptions.
+            - `examples`: a list of examples.
+            - `help_txt`: ready made help text to use instead of rendering.
+        """
+        functools.update_wrapper(self, meth)
+        # Attach the original method as meth for inspection
+        self.meth = meth
+        self.desc = desc
+        self.options = options or {}
+        self.examples = examples or []
+        self._help = help_txt
+
+    def __call__(self, obj, *args, **kwargs):
+        """
+        Actually executes the method.
+
+        :Parameters:
+            - `obj`: the class methods container object.
+            - `*args`: any non keyword arguments.
+            - `**kwargs`: all keyword arguments.
+        """
+        return self.meth(obj, *args, **kwargs)
+
+    def __get__(self, obj, objtype=None):
+        """
+        Binds the wrapper like a function so it acts as a method.
+
+        :Parameters:
+            - `obj`: the instance the wrapper is accessed through.
+            - `objtype`: the class the wrapper is accessed through.
+        """
+        return types.MethodType(self, obj, objtype)
+
+    def render(self):
+        """
+        Puts together the help string.
+        """
+        rendered = "\n%s\n" % self.desc
+        if self.options:
+            rendered += "OPTIONS:"
+            for key in self.options.keys():
+                rendered += "\n\t%s\t%s" % (key, self.options[key])
+        if self.examples:
+            rendered += "\nEXAMPLES:"
+            for example in self.examples:
+                rendered += "\n\t%s" % example
+        return rendered
+
+    def _get_help(self):
+        """
+        Returns the help text, rendering it on first use.
+        """
+        if self._help is None:
+            self._help = self.render()
+        return self._help
+
+    help = property(_get_help)
+
+
 def simple_help(help_txt):
     """
     Adds a help variable to a class method as well as saving the original
@@ -30,23 +138,7 @@ def simple_help(help_txt):
         :Parameters:
             - `meth`: the actual class method.
         """
-
-        def wrapper(self, *args, **kwargs):
-            """
-            Internal wrapper that actually executes the method.
-
-            :Parameters:
-                - `self`: the class methods container object.
-                - `*args`: any non keyword arguments.
-                - `**kwargs`: all keyword arguments.
-            """
-            return meth(self, *args, **kwargs)
-
-        # Add help variable and it's text
-        wrapper.help = help_txt
-        # Attach the original method as meth for inspection
-        wrapper.meth = meth
-        return wrapper
+        return VerbWrapper(meth, help_txt=help_txt)
 
     return decorator
 
@@ -55,7 +147,7 @@ def general_help(desc, options={}, examples=[]):
     """
     Adds a help variable to a class method based on keyword arguments as well
     as saving the original method as meth. This can be used in more verbose
-    help cases.
+    help cases. The help text is rendered when it is first used.
 
     :Parameters:
         - `desc`: the description.
@@ -70,33 +162,416 @@ def general_help(desc, options={}, examples=[]):
         :Parameters:
             - `meth`: the actual class method.
         """
+        return VerbWrapper(meth, desc, options, examples)
 
-        def wrapper(self, *args, **kwargs):
-            """
-            Internal wrapper that actually executes the method.
+    return decorator
 
-            :Parameters:
-                - `self`: the class methods container object.
-                - `*args`: any non keyword arguments.
-                - `**kwargs`: all keyword arguments.
-            """
-            return meth(self, *args, **kwargs)
 
-        # Put together the rendered help string
-        rendered = "\n%s\n" % desc
-        if options:
-            rendered += "OPTIONS:"
-            for key in options.keys():
-                rendered += "\n\t%s\t%s" % (key, options[key])
-        if examples:
-            rendered += "\nEXAMPLES:"
-            for example in examples:
-                rendered += "\n\t%s" % example
+def file_options(*names):
+    """
+    Marks options of a class method whose @path values are handed to it as
+    maps of the files, see director.options. Options not named here get
+    values starting with @ as they are.
 
-        # Add help variable and it's text
-        wrapper.help = rendered
-        # Attach the original method as meth for inspection
-        wrapper.meth = meth
-        return wrapper
+    :Parameters:
+        - `*names`: the names of the options taking files.
+    """
+
+    def decorator(meth):
+        """
+        Top level inner decorator which takes in a class method.
+
+        :Parameters:
+            - `meth`: the actual class method.
+        """
+        # Other decorators may be under this one, the names belong to the
+        # function they wrap
+        function = meth
+        while hasattr(function, 'meth'):
+            function = function.meth
+        function.file_options = names
+        return meth
+
+    return decorator
+
+
+def _is_stream(result):
+    """
+    Returns True if a verb result is an iterator to be consumed, the same
+    test director.is_stream does.
+
+    :Parameters:
+        - `result`: what the verb returned.
+    """
+    return hasattr(result, 'next') and iter(result) is result
+
+
+class MemoryCache(object):
+    """
+    Bounded cache of results, dropping the least recently used first.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Creates the MemoryCache object.
+
+        :Parameters:
+            - `maxsize`: most results to keep.
+        """
+        self.maxsize = maxsize
+        # key -> (expires, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns how many results are kept.
+        """
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the (expires, value) stored for a key or None.
+
+        :Parameters:
+            - `key`: the key of the result.
+        """
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.time():
+                return None
+            self._entries[key] = entry
+            return entry
+        finally:
+            self._lock.release()
+
+    def set(self, key, expires, value):
+        """
+        Stores a result.
+
+        :Parameters:
+            - `key`: the key of the result.
+            - `expires`: when the result goes stale, None for never.
+            - `value`: the result.
+        """
+        self._lock.acquire()
+        try:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """
+        Drops every result.
+        """
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+        finally:
+            self._lock.release()
+
+
+class DiskCache(object):
+    """
+    Cache of results as one pickle file each in a directory, shared by
+    every process using the directory. When the files grow past max_bytes
+    the least recently used are removed.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        Creates the DiskCache object. The directory is created when the
+        first result is stored.
+
+        :Parameters:
+            - `cache_dir`: the directory to keep results in.
+            - `max_bytes`: most bytes the results may take, None for no
+              limit.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        """
+        Returns the file a key is stored in.
+
+        :Parameters:
+            - `key`: the key of the result.
+        """
+        # Only disk caches need hashlib and cPickle, so they are imported
+        # when used rather than by every command line
+        import hashlib
+
+        return os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest())
+
+    def get(self, key):
+        """
+        Returns the (expires, value) stored for a key or None.
+
+        :Parameters:
+            - `key`: the key of the result.
+        """
+        import cPickle
+
+        path = self.path(key)
+        try:
+            entry_file = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            try:
+                stored_key, expires, value = cPickle.load(entry_file)
+            except Exception:
+                # Half written or from an incompatible version
+                stored_key = None
+        finally:
+            entry_file.close()
+        if stored_key != key or (
+                expires is not None and expires <= time.time()):
+            self._remove(path)
+            return None
+        # The modification time orders entries for eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return expires, value
+
+    def set(self, key, expires, value):
+        """
+        Stores a result unless it can't be pickled or written. The cache
+        only saves work, so failing to store a result is not an error.
+
+        :Parameters:
+            - `key`: the key of the result.
+            - `expires`: when the result goes stale, None for never.
+            - `value`: the result.
+        """
+        import cPickle
+
+        try:
+            data = cPickle.dumps((key, expires, value),
+                                 cPickle.HIGHEST_PROTOCOL)
+        except (cPickle.PicklingError, TypeError):
+            return
+        try:
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError, ose:
+                if ose.errno != errno.EEXIST:
+                    raise
+            atomic_write(self.path(key), data)
+        except EnvironmentError:
+            return
+        if self.max_bytes is not None:
+            self.evict()
+
+    def _remove(self, path):
+        """
+        Removes a file which may already be gone.
+
+        :Parameters:
+            - `path`: the file to remove.
+        """
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Removes the least recently used results until the rest fit in
+        max_bytes.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        entries = []
+        total = 0
+        for name in names:
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def clear(self):
+        """
+        Removes every result.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            self._remove(os.path.join(self.cache_dir, name))
+
+
+class CachedWrapper(object):
+    """
+    Wraps a class method, returning stored results for calls with the same
+    options instead of running it again. The original method is kept as
+    meth.
+    """
+
+    def __init__(self, meth, maxsize=128, ttl=None, cache_dir=None,
+                 max_disk_bytes=64 * 1024 * 1024):
+        """
+        Creates the CachedWrapper object.
+
+        :Parameters:
+            - `meth`: the actual class method.
+            - `maxsize`: most results to keep in memory.
+            - `ttl`: seconds a result is good for, None for as long as it is
+              kept.
+            - `cache_dir`: directory to also keep results in, None to only
+              keep them in memory.
+            - `max_disk_bytes`: most bytes the results in cache_dir may
+              take, None for no limit.
+        """
+        functools.update_wrapper(self, meth)
+        self.meth = meth
+        self.ttl = ttl
+        self.memory = MemoryCache(maxsize)
+        self.disk = None
+        if cache_dir is not None:
+            self.disk = DiskCache(cache_dir, max_disk_bytes)
+        # The function under any other decorators, for normalizing calls
+        self._function = meth
+        while hasattr(self._function, 'meth'):
+            self._function = self._function.meth
+
+    def __get__(self, obj, objtype=None):
+        """
+        Binds the wrapper like a function so it acts as a method.
+
+        :Parameters:
+            - `obj`: the instance the wrapper is accessed through.
+            - `objtype`: the class the wrapper is accessed through.
+        """
+        return types.MethodType(self, obj, objtype)
+
+    def _get_help(self):
+        """
+        Returns the help of the wrapped method. Raises AttributeError if it
+        has none, as a method without help does.
+        """
+        return self.meth.help
+
+    help = property(_get_help)
+
+    def key(self, obj, args, kwargs):
+        """
+        Returns the cache key for a call or None if the call can't be
+        cached. Calls naming the same options in any way, positionally,
+        by keyword or by leaving a default, share a key.
+
+        :Parameters:
+            - `obj`: the class methods container object.
+            - `args`: the non keyword arguments.
+            - `kwargs`: the keyword arguments.
+        """
+        try:
+            call_args = inspect.getcallargs(
+                self._function, obj, *args, **kwargs)
+        except TypeError:
+            # Leave reporting the bad call to the method itself
+            return None
+        del call_args[inspect.getargspec(self._function)[0][0]]
+        cls = obj.__class__
+        try:
+            return marshal.dumps((cls.__module__, cls.__name__,
+                                  self._function.__name__,
+                                  sorted(call_args.items())))
+        except ValueError:
+            # Options such as mapped files or records can't be keys
+            return None
+
+    def __call__(self, obj, *args, **kwargs):
+        """
+        Returns the stored result for the call or executes the method and
+        stores what it returns. Streamed records are stored as a list and
+        streamed again.
+
+        :Parameters:
+            - `obj`: the class methods container object.
+            - `*args`: any non keyword arguments.
+            - `**kwargs`: all keyword arguments.
+        """
+        key = self.key(obj, args, kwargs)
+        if key is None:
+            return self.meth(obj, *args, **kwargs)
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry[0], entry[1])
+        if entry is None:
+            result = self.meth(obj, *args, **kwargs)
+            stream = _is_stream(result)
+            if stream:
+                result = list(result)
+            expires = None
+            if self.ttl is not None:
+                expires = time.time() + self.ttl
+            entry = (expires, (stream, result))
+            self.memory.set(key, expires, entry[1])
+            if self.disk is not None:
+                self.disk.set(key, expires, entry[1])
+        stream, result = entry[1]
+        if stream:
+            return iter(result)
+        return result
+
+    def clear(self):
+        """
+        Drops every stored result, in memory and on disk.
+        """
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+def cached(maxsize=128, ttl=None, cache_dir=None,
+           max_disk_bytes=64 * 1024 * 1024):
+    """
+    Stores the results of a class method by its options, saving the
+    original method as meth. Only use it for verbs whose result depends on
+    nothing but their options.
+
+    :Parameters:
+        - `maxsize`: most results to keep in memory.
+        - `ttl`: seconds a result is good for, None for as long as it is
+          kept.
+        - `cache_dir`: directory to also keep results in so other processes
+          can use them, None to only keep them in memory.
+        - `max_disk_bytes`: most bytes the results in cache_dir may take,
+          None for no limit.
+    """
+
+    def decorator(meth):
+        """
+        Top level inner decorator which takes in a class method.
+
+        :Parameters:
+            - `meth`: the actual class method.
+        """
+        return CachedWrapper(meth, maxsize, ttl, cache_dir, max_disk_bytes)
 
     return decorator
@@ -0,0 +1,208 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Running commands from inside a long running, threaded service.
+
+A Dispatcher is created once and shared by every thread. Each call to
+dispatch runs one command line and hands back a DispatchResult instead of
+exiting or printing: the verb's result, the exit code the command would
+have had and what it wrote with director.out and director.err. Output is
+captured per thread, so nothing touches the process streams::
+
+   dispatcher = Dispatcher('myapp.actions')
+   result = dispatcher.dispatch(['bucket', 'add', '--name=x'])
+   if result.code:
+       log(result.stderr)
+
+Nouns are imported and their actions created once per Dispatcher, then
+shared between threads, so verbs must be safe to call concurrently. Actions
+with INVOCATION_SCOPE are the exception: each command gets its own. Close
+the Dispatcher to close the actions it shares.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import threading
+import traceback
+
+from director import ActionRunner
+from director import PROCESS_SCOPE
+from director import codes
+from director import err
+from director import output
+from director.batch import exit_code
+from director.options import PARSER_BACKENDS
+
+
+class DispatchResult(object):
+    """
+    What running one command through a Dispatcher produced.
+    """
+
+    __slots__ = ('code', 'result', 'stdout', 'stderr', 'exception')
+
+    def __init__(self, code, result=None, stdout='', stderr='',
+                 exception=None):
+        """
+        Creates the DispatchResult object.
+
+        :Parameters:
+            - `code`: the exit code the command would have had.
+            - `result`: what the verb returned, with the records of a
+              streaming verb collected into a list.
+            - `stdout`: what the command wrote to stdout.
+            - `stderr`: what the command wrote to stderr.
+            - `exception`: the exception the verb raised if no filter
+              handled it.
+        """
+        self.code = code
+        self.result = result
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exception = exception
+
+    def __repr__(self):
+        """
+        String representation of the object.
+        """
+        return "<DispatchResult code=%s>" % self.code
+
+
+class Dispatcher(object):
+    """
+    Runs command lines on behalf of any number of threads.
+    """
+
+    def __init__(self, plugin_package, manifest=None, filter_obj=None,
+                 parser_backend='fast', output_format='text', prog='myapp'):
+        """
+        Creates the Dispatcher object.
+
+        :Parameters:
+            - `plugin_package`: the name of the package where plugins live,
+              or a search path of them.
+            - `manifest`: optional loaded director.manifest.Manifest to
+              consult before importing plugin code.
+            - `filter_obj`: the filter object, shared by every thread.
+            - `parser_backend`: which option parser to use, 'fast' or
+              'optparse'.
+            - `output_format`: the format for records written by verbs
+              when the command line doesn't give --format.
+            - `prog`: the program name commands are run as.
+        """
+        self.plugin_package = plugin_package
+        self.manifest = manifest
+        self.filter_obj = filter_obj
+        self.parser_class = PARSER_BACKENDS[parser_backend]
+        self.output_format = output_format
+        self.prog = prog
+        # Actions and formatters shared by every command, keyed like in
+        # ActionRunner
+        self._actions = {}
+        self._formatters = {}
+        self._lock = threading.Lock()
+
+    def dispatch(self, args):
+        """
+        Runs one command line. Returns a DispatchResult.
+
+        :Parameters:
+            - `args`: the command line without the program name.
+        """
+        stdout_sink = output.MemorySink()
+        stderr_sink = output.MemorySink()
+        old_output = output.set_thread_output(
+            output.Output(stdout_sink, stderr_sink))
+        code = codes.system.SYSTEM_OK
+        result = None
+        exception = None
+        try:
+            try:
+                runner = _DispatchRunner(self)
+                runner.load_args([self.prog] + list(args))
+                result = runner.run(self.filter_obj)
+                if runner.records is not None:
+                    result = runner.records
+            except SystemExit, se:
+                code = exit_code(se)
+            except Exception, exception:
+                # Mirror what the interpreter does with an uncaught exception
+                err(traceback.format_exc(), False)
+                code = 1
+        finally:
+            output.set_thread_output(old_output)
+        return DispatchResult(code, result, stdout_sink.getvalue(),
+                              stderr_sink.getvalue(), exception)
+
+    def close(self):
+        """
+        Closes the actions shared by the commands. Actions shared by the
+        whole process stay open.
+        """
+        self._lock.acquire()
+        try:
+            actions = self._actions.values()
+            self._actions.clear()
+        finally:
+            self._lock.release()
+        for action in actions:
+            if action.instance_scope != PROCESS_SCOPE:
+                action._close()
+
+
+class _DispatchRunner(ActionRunner):
+    """
+    ActionRunner for a single dispatched command. It shares the actions of
+    its Dispatcher and collects streamed records instead of writing them.
+    """
+
+    def __init__(self, dispatcher):
+        """
+        Creates the _DispatchRunner object.
+
+        :Parameters:
+            - `dispatcher`: the Dispatcher running the command.
+        """
+        self._init_state(dispatcher.plugin_package, dispatcher.manifest,
+                         dispatcher.parser_class, dispatcher.output_format,
+                         dispatcher._actions, dispatcher._formatters)
+        self.dispatcher = dispatcher
+        self.records = None
+
+    def _create_action(self, noun):
+        """
+        Creates the action for a noun, only once if it is shared.
+
+        :Parameters:
+            - `noun`: the noun to create the action for.
+        """
+        self.dispatcher._lock.acquire()
+        try:
+            if noun in self._actions:
+                return self._actions[noun]
+            return ActionRunner._create_action(self, noun)
+        finally:
+            self.dispatcher._lock.release()
+
+    def close(self):
+        """
+        Ends the command, leaving the shared actions to the Dispatcher.
+        """
+        self.end_invocation()
+
+    def write_stream(self, records):
+        """
+        Collects the records a streaming verb produces.
+
+        :Parameters:
+            - `records`: the iterator returned by the verb.
+        """
+        self.records = list(records)
@@ -26,3 +26,17 @@ class UnsuportedHelpStyleError(DirectorError):
     Used when an unsupported help style is attempted.
     """
     pass
+
+
+class PoolError(DirectorError):
+    """
+    Used when a resource pool is closed or has nothing free in time.
+    """
+    pass
+
+
+class PluginConflictWarning(UserWarning):
+    """
+    Used when more than one plugin package provides the same noun.
+    """
+    pass
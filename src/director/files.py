@@ -0,0 +1,60 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Writing the files director keeps between runs.
+
+Manifests, bundles, completion indexes and cached results are written to a
+temporary file next to where they go and renamed into place, so a reader
+sees either the old file or the new one and never half of one. They get
+the mode the umask gives any new file, as other users run the commands
+which read them.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+
+
+def new_file_mode():
+    """
+    Returns the mode the umask gives a new file. Files written through
+    tempfile.mkstemp are only readable by their owner until given it.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0666 & ~umask
+
+
+def atomic_write(path, data, prefix='.tmp-'):
+    """
+    Atomically replaces the file at path with data.
+
+    :Parameters:
+        - `path`: where to write the file.
+        - `data`: the bytes to write.
+        - `prefix`: how the name of the temporary file starts.
+    """
+    # Only writing needs tempfile, which is slow to import
+    import tempfile
+
+    tmp_fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), prefix=prefix)
+    try:
+        tmp_file = os.fdopen(tmp_fd, 'wb')
+        try:
+            tmp_file.write(data)
+        finally:
+            tmp_file.close()
+        os.chmod(tmp_path, new_file_mode())
+        os.rename(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
@@ -15,26 +15,91 @@ __docformat__ = 'restructuredtext'
 
 
 import exceptions
+import inspect
+import re
 import sys
+import threading
 
 from director import err
 
 
+# Parts of exception messages which vary between otherwise equal errors
+TEMPLATE_RE = re.compile(r"\d+|'[^']*'|\"[^\"]*\"")
+
+
 class Filter(list):
     """
     Holds all filters to execute on exception.
+
+    Filters are indexed by the exception class they handle. An exception
+    is handled by the filter registered for the closest class in its method
+    resolution order, so a filter also covers subclasses of its exception.
+    What each exception type resolves to is cached.
     """
 
-    def execute_filters(self, exception):
+    def __init__(self, *args):
+        """
+        Creates the Filter object.
+
+        :Parameters:
+            - `*args`: optional iterable of ExceptionFilters, like list.
+        """
+        list.__init__(self, *args)
+        self._index = {}
+        self._indexed = 0
+        self._resolved = {}
+
+    def _update_index(self):
+        """
+        Rebuilds the index if filters were added without register_filter.
+        """
+        if self._indexed != len(self):
+            self._index = {}
+            for exception_filter in self:
+                self._index[exception_filter.exception] = exception_filter
+            self._indexed = len(self)
+            self._resolved = {}
+
+    def find_filter(self, exception_type):
+        """
+        Returns the ExceptionFilter handling an exception type or None.
+
+        :Parameters:
+            - `exception_type`: the class of the exception.
+        """
+        self._update_index()
+        try:
+            return self._resolved[exception_type]
+        except KeyError:
+            found = None
+            for klass in inspect.getmro(exception_type):
+                if klass in self._index:
+                    found = self._index[klass]
+                    break
+            self._resolved[exception_type] = found
+            return found
+
+    def execute_filters(self, exception, invocation=None):
         """
-        Executes all filters with an exception.
+        Executes the filter for an exception. True on filter, False
+        otherwise.
 
         :Parameters:
             - `exception`: the exception that is going to be filtered.
+            - `invocation`: the arguments of the invocation that raised it.
+
+        """
+        exception_filter = self.find_filter(type(exception))
+        if exception_filter is None:
+            return False
+        exception_filter.filter(exception)
+        return True
 
+    def finish(self):
+        """
+        Called when a run or batch of runs is over. Does nothing here.
         """
-        for filter in self:
-            filter.filter(exception)
+        pass
 
     def register_filter(self, exception_filter):
         """
@@ -43,13 +108,102 @@ class Filter(list):
         :Parameters:
             - `exception_filter`: the ExceptionFilter to add.
         """
-        for filter in self:
-            if (type(exception_filter.exception('')) ==
-                type(filter.exception(''))):
-                txt = 'You can only have one filter for one exception: %s' % (
-                       exception_filter.exception)
-                raise Exception(txt)
+        self._update_index()
+        if exception_filter.exception in self._index:
+            txt = 'You can only have one filter for one exception: %s' % (
+                   exception_filter.exception)
+            raise Exception(txt)
         self.append(exception_filter)
+        self._index[exception_filter.exception] = exception_filter
+        self._indexed = len(self)
+        self._resolved = {}
+
+
+class AggregatingFilter(Filter):
+    """
+    Filter which, instead of reporting every filtered exception, groups
+    them by exception type and message template and reports each group
+    once with a count and a few of the invocations that raised it when
+    finish is called.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Creates the AggregatingFilter object.
+
+        :Parameters:
+            - `*args`: optional iterable of ExceptionFilters, like list.
+            - `sample_size`: how many invocations to keep per group.
+        """
+        Filter.__init__(self, *args)
+        self.sample_size = kwargs.get('sample_size', 3)
+        self._groups = {}
+        self._order = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """
+        Returns the state to pickle, leaving out the lock.
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores pickled state with a new lock.
+
+        :Parameters:
+            - `state`: the pickled state.
+        """
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def execute_filters(self, exception, invocation=None):
+        """
+        Counts an exception against its group. True on filter, False
+        otherwise.
+
+        :Parameters:
+            - `exception`: the exception that is going to be filtered.
+            - `invocation`: the arguments of the invocation that raised it.
+        """
+        exception_filter = self.find_filter(type(exception))
+        if exception_filter is None:
+            return False
+        key = (type(exception), TEMPLATE_RE.sub('*', str(exception)))
+        self._lock.acquire()
+        try:
+            try:
+                group = self._groups[key]
+            except KeyError:
+                group = [exception_filter, exception, 0, []]
+                self._groups[key] = group
+                self._order.append(key)
+            group[2] += 1
+            if invocation is not None and len(group[3]) < self.sample_size:
+                group[3].append(invocation)
+        finally:
+            self._lock.release()
+        return True
+
+    def finish(self):
+        """
+        Reports every group once and starts counting afresh.
+        """
+        self._lock.acquire()
+        try:
+            groups = [self._groups[key] for key in self._order]
+            self._groups = {}
+            self._order = []
+        finally:
+            self._lock.release()
+        for exception_filter, exception, count, samples in groups:
+            exception_filter.filter(exception)
+            if count > 1:
+                err("(%s times)" % count)
+            for invocation in samples:
+                err("    e.g. %s" % " ".join(invocation))
 
 
 class ExceptionFilter(object):
@@ -62,7 +216,7 @@ class ExceptionFilter(object):
         Creates the ExceptionFilter object.
 
         :Parameters:
-            - `exception`: the exception to filter.
+            - `exception`: the exception class to filter.
             - `error_text`: the error text to show,
         """
         self.exception = exception
@@ -75,10 +229,19 @@ class ExceptionFilter(object):
         :Parameters:
             - `exception`: the exception being filtered.
         """
-        if type(exception) == type(self.exception('')):
-            if "%s" in self.error_text:
-                err(self.error_text % exception)
-            else:
-                err(self.error_text)
+        if isinstance(exception, self.exception):
+            self.report(exception)
             return True
         return False
+
+    def report(self, exception):
+        """
+        Shows the error text for an exception.
+
+        :Parameters:
+            - `exception`: the exception being reported.
+        """
+        if "%s" in self.error_text:
+            err(self.error_text % exception)
+        else:
+            err(self.error_text)
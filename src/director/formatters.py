@@ -0,0 +1,261 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Formatters for the records streaming verbs produce.
+
+A formatter turns each record into text and hands the text to an output
+channel a batch of records at a time, so the cost of the channel is paid
+once per batch rather than once per record. The one to use is picked with
+the --format option given before the noun::
+
+   $ myapp --format=jsonl host list
+
+- *text*: str of each record on its own line.
+- *jsonl*: each record as JSON on its own line.
+- *csv*: rows of sequences, of dicts with a header of the sorted keys of
+  the first one, or of single values.
+- *binary*: each record as compact JSON prefixed with its 4 byte big
+  endian length, see read_binary.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+from director import output
+
+
+def _json_encoder():
+    """
+    Returns the function formatters encode a record as compact JSON with.
+    """
+    # Formatters are created for every run but json, csv and struct are
+    # only imported by the ones which need them
+    import json
+
+    return json.JSONEncoder(separators=(',', ':'), default=str).encode
+
+
+class Formatter(object):
+    """
+    Base class for formatters. Subclasses provide encode, or override
+    write for formats which can't encode one record at a time.
+    """
+
+    name = None
+
+    def __init__(self, batch_size=output.RECORD_BATCH):
+        """
+        Creates the Formatter object.
+
+        :Parameters:
+            - `batch_size`: number of records to encode before writing.
+        """
+        self.batch_size = batch_size
+
+    def encode(self, record):
+        """
+        Returns the text for one record.
+
+        :Parameters:
+            - `record`: the record to encode.
+        """
+        raise NotImplementedError('encode must be provided by a subclass.')
+
+    def write(self, records, channel=None):
+        """
+        Writes every record. Returns the number of records written.
+
+        :Parameters:
+            - `records`: an iterable of records.
+            - `channel`: the Channel to write to, stdout of the Output in use
+              if None.
+        """
+        if channel is None:
+            channel = output.get_output().stdout
+        encode = self.encode
+        batch_size = self.batch_size
+        parts = []
+        count = 0
+        for record in records:
+            parts.append(encode(record))
+            count += 1
+            if len(parts) >= batch_size:
+                channel.write(''.join(parts))
+                parts = []
+        if parts:
+            channel.write(''.join(parts))
+        return count
+
+
+class TextFormatter(Formatter):
+    """
+    Writes str of each record on its own line.
+    """
+
+    name = 'text'
+
+    def write(self, records, channel=None):
+        """
+        Writes every record. Returns the number of records written.
+
+        :Parameters:
+            - `records`: an iterable of records.
+            - `channel`: the Channel to write to, stdout of the Output in use
+              if None.
+        """
+        return output.write_records(records, channel, self.batch_size)
+
+
+class JsonLinesFormatter(Formatter):
+    """
+    Writes each record as compact JSON on its own line. Values JSON has no
+    type for are written as their str.
+    """
+
+    name = 'jsonl'
+
+    def __init__(self, batch_size=output.RECORD_BATCH):
+        """
+        Creates the JsonLinesFormatter object.
+
+        :Parameters:
+            - `batch_size`: number of records to encode before writing.
+        """
+        Formatter.__init__(self, batch_size)
+        self._encode = _json_encoder()
+
+    def encode(self, record):
+        """
+        Returns the JSON line for one record.
+
+        :Parameters:
+            - `record`: the record to encode.
+        """
+        return self._encode(record) + '\n'
+
+
+class CsvFormatter(Formatter):
+    """
+    Writes records as CSV rows with a single csv writer. Records are
+    sequences of values, dicts or single values such as strings and
+    numbers, which make a row of one column. The sorted keys of the first
+    dict become the header and the columns of every dict.
+    """
+
+    name = 'csv'
+
+    def write(self, records, channel=None):
+        """
+        Writes every record. Returns the number of records written.
+
+        :Parameters:
+            - `records`: an iterable of records.
+            - `channel`: the Channel to write to, stdout of the Output in use
+              if None.
+        """
+        import csv
+
+        if channel is None:
+            channel = output.get_output().stdout
+        batch_size = self.batch_size
+        parts = []
+        # The writer writes each row with a single call, straight into parts
+        collector = _Collector()
+        collector.write = parts.append
+        writer = csv.writer(collector)
+        writerow = writer.writerow
+        fields = None
+        count = 0
+        for record in records:
+            if isinstance(record, dict):
+                if fields is None:
+                    fields = record.keys()
+                    fields.sort()
+                    writerow(fields)
+                record = [record.get(field, '') for field in fields]
+            elif (isinstance(record, basestring) or
+                  not hasattr(record, '__iter__')):
+                record = (record, )
+            writerow(record)
+            count += 1
+            if len(parts) >= batch_size:
+                channel.write(''.join(parts))
+                del parts[:]
+        if parts:
+            channel.write(''.join(parts))
+        return count
+
+
+class _Collector(object):
+    """
+    Stands in for a file for the csv writer.
+    """
+
+    write = None
+
+
+class BinaryFormatter(Formatter):
+    """
+    Writes each record as compact JSON prefixed with its length as a 4 byte
+    big endian unsigned integer, so readers need not look for line ends.
+    Values JSON has no type for are written as their str, as with jsonl.
+    """
+
+    name = 'binary'
+
+    def __init__(self, batch_size=output.RECORD_BATCH):
+        """
+        Creates the BinaryFormatter object.
+
+        :Parameters:
+            - `batch_size`: number of records to encode before writing.
+        """
+        import struct
+
+        Formatter.__init__(self, batch_size)
+        self._encode = _json_encoder()
+        self._pack_length = struct.Struct('>I').pack
+
+    def encode(self, record):
+        """
+        Returns the length prefixed bytes for one record.
+
+        :Parameters:
+            - `record`: the record to encode.
+        """
+        data = self._encode(record)
+        return self._pack_length(len(data)) + data
+
+
+def read_binary(stream):
+    """
+    Yields the records a BinaryFormatter wrote to a stream. Strings come
+    back as unicode, as from any JSON reader.
+
+    :Parameters:
+        - `stream`: a file like object to read from.
+    """
+    import json
+    import struct
+
+    while True:
+        header = stream.read(4)
+        if len(header) < 4:
+            return
+        length = struct.unpack('>I', header)[0]
+        yield json.loads(stream.read(length))
+
+
+# All formatters keyed by the name given to --format
+FORMATTERS = {}
+for _formatter in (TextFormatter, JsonLinesFormatter, CsvFormatter,
+                   BinaryFormatter):
+    FORMATTERS[_formatter.name] = _formatter
+del _formatter
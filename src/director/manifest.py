@@ -0,0 +1,359 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+On-disk command manifests.
+
+A manifest records, for every noun in a plugin package (or a search path of
+them, see director.plugins), the module it lives in and for every verb its
+options, defaults and help text. ActionRunner consults it so that listing
+nouns, rendering help and building the option parser do not need to import
+plugin code. Entries are invalidated when the plugin files, the modules of
+the classes they inherit from or the package directories change on disk.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import marshal
+import os
+import sys
+import types
+
+from director.decorators import VerbWrapper
+from director.files import atomic_write
+from director.options import CompiledParser
+from director.options import OptionSpec
+from director.options import PARSER_CACHE
+from director.plugins import PluginIndex
+from director.plugins import package_path
+from director.plugins import plugin_index
+from director.plugins import split_archive
+
+
+MANIFEST_VERSION = 4
+
+
+def _source_file(mod_file):
+    """
+    Returns the source file for a module file, falling back to the file
+    itself when there is no source next to it.
+
+    :Parameters:
+        - `mod_file`: the __file__ of a module.
+    """
+    if mod_file[-4:] in ('.pyc', '.pyo') and os.path.exists(mod_file[:-1]):
+        return mod_file[:-1]
+    return mod_file
+
+
+def _class_files(action_cls):
+    """
+    Returns the source files of the modules defining an Action class and
+    every class it inherits from, the module of the class itself first.
+
+    :Parameters:
+        - `action_cls`: the Action class.
+    """
+    files = []
+    for klass in action_cls.__mro__:
+        mod_file = getattr(sys.modules.get(klass.__module__), '__file__',
+                           None)
+        if mod_file is not None:
+            mod_file = _source_file(mod_file)
+            if mod_file not in files:
+                files.append(mod_file)
+    return files
+
+
+def _stamp(path):
+    """
+    Returns the (mtime, size) stamp of a path or None if it is missing.
+
+    :Parameters:
+        - `path`: the path to stamp.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        # Whatever is inside a zip bundle changes along with the bundle
+        location = split_archive(path)
+        if location is None:
+            return None
+        return _stamp(location[0])
+    return (stat.st_mtime, stat.st_size)
+
+
+def _marshalable(obj):
+    """
+    Checks that an object can be stored in a manifest.
+
+    :Parameters:
+        - `obj`: the object to check.
+    """
+    try:
+        marshal.dumps(obj)
+    except ValueError:
+        return False
+    return True
+
+
+def list_plugin_nouns(plugin_package):
+    """
+    Lists the nouns available in a plugin package along with the
+    directories they were found in.
+
+    :Parameters:
+        - `plugin_package`: the name of the package where plugins live, or
+          a search path of them.
+    """
+    index = plugin_index(plugin_package)
+    return index.nouns(), list(index.paths)
+
+
+def import_plugins(plugin_package):
+    """
+    Imports every noun in a plugin package, skipping ones that fail to
+    import. Returns the Action classes found.
+
+    :Parameters:
+        - `plugin_package`: the name of the package where plugins live, or
+          a search path of them.
+    """
+    index = plugin_index(plugin_package)
+    action_classes = []
+    for noun in index.nouns():
+        try:
+            action = __import__(index.module(noun), globals(), locals(),
+                                [noun])
+            action_classes.append(getattr(action, noun.capitalize()))
+        except (ImportError, AttributeError):
+            pass
+    return action_classes
+
+
+def warm_plugins(plugin_package, parser_class=CompiledParser):
+    """
+    Imports every noun in a plugin package and compiles the option parsers
+    of all their verbs.
+
+    :Parameters:
+        - `plugin_package`: the name of the package where plugins live, or
+          a search path of them.
+        - `parser_class`: the CompiledParser class to build.
+    """
+    for action_cls in import_plugins(plugin_package):
+        PARSER_CACHE.warm(action_cls, parser_class)
+
+
+class Manifest(object):
+    """
+    Cached description of all nouns and verbs in a plugin package.
+    """
+
+    def __init__(self, path, plugin_package):
+        """
+        Creates the Manifest object.
+
+        :Parameters:
+            - `path`: where the manifest file lives.
+            - `plugin_package`: the name of the package where plugins live,
+              or a search path of them.
+        """
+        self.path = path
+        self.plugin_package = plugin_package
+        self.data = None
+        self._index = None
+
+    def __repr__(self):
+        """
+        String representation of the object.
+        """
+        return "<Manifest %s for %s>" % (
+            self.path, ", ".join(package_path(self.plugin_package)))
+
+    def load(self):
+        """
+        Reads the manifest from disk. Returns True if a usable manifest
+        was loaded, False otherwise.
+        """
+        self.data = None
+        try:
+            manifest_file = open(self.path, 'rb')
+            try:
+                data = marshal.load(manifest_file)
+            finally:
+                manifest_file.close()
+        except (IOError, EOFError, ValueError, TypeError):
+            return False
+        if (type(data) != types.DictType or
+            data.get('version') != MANIFEST_VERSION or
+            data.get('python') != sys.version_info[:2] or
+            data.get('package') != package_path(self.plugin_package)):
+            return False
+        self.data = data
+        return True
+
+    def build(self):
+        """
+        Imports every noun in the plugin package, records its verbs and
+        writes the manifest to disk.
+        """
+        # Always list the directories afresh as they may have changed
+        self._index = PluginIndex(self.plugin_package)
+        data = {'version': MANIFEST_VERSION,
+                'python': sys.version_info[:2],
+                'package': self._index.packages,
+                'nouns': {}}
+        for noun in self._index.nouns():
+            entry = self._describe_noun(noun)
+            if entry:
+                data['nouns'][noun] = entry
+        # Stamp the directories last as importing may write bytecode files
+        data['paths'] = dict([(x, _stamp(x)) for x in self._index.paths])
+        self.data = data
+        self.save()
+
+    def save(self):
+        """
+        Atomically writes the manifest to disk.
+        """
+        atomic_write(self.path, marshal.dumps(self.data), '.manifest-')
+
+    def ensure(self):
+        """
+        Loads the manifest, building it when it is missing or stale.
+        """
+        if not self.load() or self.nouns() is None:
+            self.build()
+
+    def _describe_noun(self, noun):
+        """
+        Imports a noun and returns its manifest entry, None if the module
+        holds no action.
+
+        :Parameters:
+            - `noun`: the noun to describe.
+        """
+        if self._index is None:
+            self._index = PluginIndex(self.plugin_package)
+        mod_name = self._index.module(noun)
+        if mod_name is None:
+            return None
+        try:
+            action = __import__(mod_name, globals(), locals(), [noun])
+            action_cls = getattr(action, noun.capitalize())
+        except (ImportError, AttributeError):
+            return None
+        # Verbs may be inherited from classes in other modules
+        files = _class_files(action_cls)
+        verbs = {}
+        for item, verb in action_cls._verbs.items():
+            spec = OptionSpec.from_verb(verb.method).to_dict()
+            help_txt = getattr(verb.method, 'help', None)
+            if help_txt is not None:
+                help_txt = str(help_txt)
+            verbs[item] = {'spec': spec, 'help': help_txt, 'help_parts': None}
+            # Keep the pieces of the help around for other formatters
+            # The help may be under other decorators such as cached
+            wrapper = verb.method.im_func
+            while (not isinstance(wrapper, VerbWrapper) and
+                   hasattr(wrapper, 'meth')):
+                wrapper = wrapper.meth
+            if isinstance(wrapper, VerbWrapper):
+                help_parts = {'desc': wrapper.desc,
+                              'options': wrapper.options,
+                              'examples': wrapper.examples}
+                if _marshalable(help_parts):
+                    verbs[item]['help_parts'] = help_parts
+            # Defaults which can not be stored force the verb to be
+            # inspected at run time instead.
+            if not _marshalable(spec['defaults']):
+                verbs[item]['spec'] = None
+        return {'module': mod_name,
+                'files': files,
+                'stamp': tuple([_stamp(x) for x in files]),
+                'description': str(action_cls.description_txt),
+                'verbs': verbs}
+
+    def nouns(self):
+        """
+        Returns the sorted nouns recorded in the manifest or None if the
+        manifest is missing or the package directories changed.
+        """
+        if not self.data:
+            return None
+        for mod_path, stamp in self.data['paths'].items():
+            if _stamp(mod_path) != stamp:
+                return None
+        nouns = self.data['nouns'].keys()
+        nouns.sort()
+        return nouns
+
+    def noun(self, noun):
+        """
+        Returns the manifest entry for a noun or None if it is unknown or
+        its module, or that of a class it inherits from, changed since the
+        manifest was built.
+
+        :Parameters:
+            - `noun`: the noun to look up.
+        """
+        if not self.data:
+            return None
+        entry = self.data['nouns'].get(noun)
+        if entry is None or tuple(
+            [_stamp(x) for x in entry['files']]) != entry['stamp']:
+            return None
+        return entry
+
+    def verb(self, noun, verb):
+        """
+        Returns the manifest entry for a verb or None if it isn't usable.
+
+        :Parameters:
+            - `noun`: the noun the verb belongs to.
+            - `verb`: the verb to look up.
+        """
+        entry = self.noun(noun)
+        if entry is None:
+            return None
+        return entry['verbs'].get(verb)
+
+    def option_spec(self, noun, verb):
+        """
+        Returns the OptionSpec for a verb or None if it isn't usable.
+
+        :Parameters:
+            - `noun`: the noun the verb belongs to.
+            - `verb`: the verb to look up.
+        """
+        verb_entry = self.verb(noun, verb)
+        if verb_entry is None or verb_entry['spec'] is None:
+            return None
+        return OptionSpec.from_dict(verb_entry['spec'])
+
+
+def main(args=sys.argv):
+    """
+    Builds a manifest from the command line.
+
+    :Parameters:
+        - `args`: all args passed from command line.
+    """
+    if len(args[1:]) != 2:
+        sys.stderr.write("Usage: %s plugin_package[,plugin_package...] "
+                         "manifest_path\n" % args[0])
+        return 1
+    Manifest(args[2], args[1].split(',')).build()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,440 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Option specifications for verbs.
+
+For options a verb names with director.decorators.file_options, a value of
+@path is handed to the verb as a read-only mmap of the file rather than as
+a string, so big inputs are paged in as the verb reads them instead of
+being copied into memory first. Use @@ for a value of such an option which
+really starts with @. Values of every other option are passed as given.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import inspect
+import os
+import threading
+import types
+
+from collections import OrderedDict
+from optparse import OptionParser
+
+from director import output
+
+
+# Marks an option value as the path of a file to map
+FILE_PREFIX = '@'
+
+
+def map_file(path):
+    """
+    Returns a read-only mmap of a file, or an empty string for an empty file
+    as those can't be mapped.
+
+    :Parameters:
+        - `path`: the file to map.
+    """
+    # Only needed when a file is given, so not imported up front
+    import mmap
+
+    a_file = open(path, 'rb')
+    try:
+        if os.fstat(a_file.fileno()).st_size == 0:
+            return ''
+        return mmap.mmap(a_file.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        # The map keeps its own reference to the file
+        a_file.close()
+
+
+def resolve_files(options, defaults, mapped, names):
+    """
+    Replaces @path values given on the command line for the options taking
+    files with maps of the files and @@ with a single @. Returns options.
+
+    :Parameters:
+        - `options`: the parsed options, changed in place.
+        - `defaults`: the defaults of the verb, which are left alone.
+        - `mapped`: a list the new maps are added to so they can be closed.
+        - `names`: the names of the options taking files.
+    """
+    for name in names:
+        value = options.get(name)
+        if (type(value) is not str or value[:1] != FILE_PREFIX or
+            value is defaults.get(name)):
+            continue
+        if value[:2] == FILE_PREFIX * 2:
+            options[name] = value[1:]
+        else:
+            options[name] = map_file(value[1:])
+            if type(options[name]) is not str:
+                mapped.append(options[name])
+    return options
+
+
+def verb_function(a_verb):
+    """
+    Returns the function a verb was defined as, looking through the
+    wrappers decorators put around it, which keep what they wrap as meth.
+
+    :Parameters:
+        - `a_verb`: the verb (bound or unbound) to unwrap.
+    """
+    a_verb = getattr(a_verb, 'im_func', a_verb)
+    while hasattr(a_verb, 'meth'):
+        a_verb = a_verb.meth
+    return a_verb
+
+
+def verb_key(a_verb):
+    """
+    Returns the underlying function of a verb for use as a cache key.
+
+    :Parameters:
+        - `a_verb`: the verb (bound or unbound) to get the key of.
+    """
+    return verb_function(a_verb)
+
+
+class OptionSpec(object):
+    """
+    Describes the options a verb takes and how optparse should treat them.
+    """
+
+    __slots__ = ('options', 'defaults', 'files')
+
+    def __init__(self, options, defaults, files=()):
+        """
+        Creates the OptionSpec object.
+
+        :Parameters:
+            - `options`: a list of (name, action) pairs in parser order.
+            - `defaults`: a dictionary mapping option names to defaults.
+            - `files`: the names of the options taking files.
+        """
+        self.options = options
+        self.defaults = defaults
+        self.files = tuple(files)
+
+    def __repr__(self):
+        """
+        String representation of the object.
+        """
+        return "<OptionSpec %s>" % ", ".join(
+            [name for name, action in self.options])
+
+    @classmethod
+    def from_verb(cls, a_verb):
+        """
+        Builds an OptionSpec by inspecting a verb.
+
+        :Parameters:
+            - `a_verb`: the verb (bound or unbound) to inspect.
+        """
+        # Since decorators change what inspect sees we use the original
+        # method which decorators attach as meth, as many times over as
+        # decorators were stacked. Without decorators the method is used
+        # directly as it is either old style, using direct method variables
+        # or has no help at all.
+        function = verb_function(a_verb)
+        inspection_data = [x for x in inspect.getargspec(function)]
+
+        if inspection_data[0] == None:
+            inspection_data[0] = []
+        iargs = [x for x in reversed(inspection_data[0][1:])]
+        if inspection_data[3] == None:
+            inspection_data[3] = []
+        iargs_defaults = [x for x in reversed(inspection_data[3])]
+
+        options = []
+        defaults = {}
+        for iarg_x in range(len(iargs)):
+            # Default action is to store
+            action = 'store'
+            try:
+                # Make sure we set up defaults
+                def_item = iargs_defaults[iarg_x]
+                if type(def_item) == types.TupleType:
+                    def_item = def_item[0]
+                defaults[iargs[iarg_x]] = def_item
+
+                # Setup the action if it is a bool
+                if defaults[iargs[iarg_x]] == True:
+                    action = 'store_true'
+                elif defaults[iargs[iarg_x]] == False:
+                    action = 'store_false'
+            except IndexError, ie:
+                # Not everything has a default
+                pass
+            options.append((iargs[iarg_x], action))
+        return cls(options, defaults, getattr(function, 'file_options', ()))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds an OptionSpec from the output of to_dict.
+
+        :Parameters:
+            - `data`: the dictionary to build from.
+        """
+        return cls([tuple(x) for x in data['options']],
+                   dict(data['defaults']), data['files'])
+
+    def to_dict(self):
+        """
+        Returns a plain dictionary version of the spec for serialization.
+        """
+        return {'options': [list(x) for x in self.options],
+                'defaults': self.defaults,
+                'files': list(self.files)}
+
+
+class VerbOptionParser(OptionParser):
+    """
+    An OptionParser which writes its usage, help and errors through
+    director.output instead of straight to the process streams.
+    """
+
+    def print_usage(self, file=None):
+        """
+        Writes the usage message, to stdout unless file is given.
+
+        :Parameters:
+            - `file`: the file like object to write to.
+        """
+        OptionParser.print_usage(self, file or output.get_output().stdout)
+
+    def print_help(self, file=None):
+        """
+        Writes the help message, to stdout unless file is given.
+
+        :Parameters:
+            - `file`: the file like object to write to.
+        """
+        OptionParser.print_help(self, file or output.get_output().stdout)
+
+    def exit(self, status=0, msg=None):
+        """
+        Writes msg to stderr and raises SystemExit with status.
+
+        :Parameters:
+            - `status`: the exit code.
+            - `msg`: the message to write first, if any.
+        """
+        if msg:
+            output.get_output().stderr.write(msg)
+        raise SystemExit(status)
+
+    def error(self, msg):
+        """
+        Writes the usage and an error message to stderr and raises
+        SystemExit.
+
+        :Parameters:
+            - `msg`: what went wrong.
+        """
+        self.print_usage(output.get_output().stderr)
+        self.exit(2, "%s: error: %s\n" % (self.get_prog_name(), msg))
+
+
+class CompiledParser(object):
+    """
+    An option parser built once from an OptionSpec and reused for every
+    invocation of its verb.
+    """
+
+    __slots__ = ('spec', 'parser')
+
+    def __init__(self, spec):
+        """
+        Creates the CompiledParser object.
+
+        :Parameters:
+            - `spec`: the OptionSpec to build the parser from.
+        """
+        self.spec = spec
+        self.parser = VerbOptionParser()
+        for name, action in spec.options:
+            # Add it to optparse
+            self.parser.add_option("--%s" % name, dest=name, action=action)
+        # Bind the defaults
+        self.parser.set_defaults(**spec.defaults)
+
+    def parse(self, args):
+        """
+        Parses command line arguments into a dictionary to pass to the verb.
+
+        :Parameters:
+            - `args`: the arguments following the verb.
+        """
+        options, largs = self.parser.parse_args(args)
+        return options.__dict__
+
+
+class FastParser(CompiledParser):
+    """
+    A CompiledParser which handles the common --name=value, --name value
+    and --flag forms with a dictionary lookup. Anything else, including
+    abbreviations, --help and errors, is handed to optparse so the results
+    and messages stay the same.
+    """
+
+    __slots__ = ('actions', 'defaults')
+
+    def __init__(self, spec):
+        """
+        Creates the FastParser object.
+
+        :Parameters:
+            - `spec`: the OptionSpec to build the parser from.
+        """
+        CompiledParser.__init__(self, spec)
+        self.actions = {}
+        self.defaults = {}
+        for name, action in spec.options:
+            self.actions["--%s" % name] = (name, action)
+            self.defaults[name] = spec.defaults.get(name)
+
+    def parse(self, args):
+        """
+        Parses command line arguments into a dictionary to pass to the verb.
+
+        :Parameters:
+            - `args`: the arguments following the verb.
+        """
+        values = self.defaults.copy()
+        args_len = len(args)
+        arg_x = 0
+        while arg_x < args_len:
+            arg = args[arg_x]
+            arg_x += 1
+            if arg[:2] != '--':
+                if arg[:1] == '-' and arg != '-':
+                    # Short options are left to optparse
+                    return CompiledParser.parse(self, args)
+                # Positional arguments are ignored just like optparse does
+                continue
+            if arg == '--':
+                break
+            if '=' in arg:
+                opt, value = arg.split('=', 1)
+                try:
+                    name, action = self.actions[opt]
+                except KeyError:
+                    return CompiledParser.parse(self, args)
+                if action != 'store':
+                    return CompiledParser.parse(self, args)
+                values[name] = value
+                continue
+            try:
+                name, action = self.actions[arg]
+            except KeyError:
+                return CompiledParser.parse(self, args)
+            if action == 'store_true':
+                values[name] = True
+            elif action == 'store_false':
+                values[name] = False
+            elif arg_x < args_len:
+                values[name] = args[arg_x]
+                arg_x += 1
+            else:
+                return CompiledParser.parse(self, args)
+        return values
+
+
+# Parser implementations ActionRunner can be told to use
+PARSER_BACKENDS = {'optparse': CompiledParser, 'fast': FastParser}
+
+
+class ParserCache(object):
+    """
+    Least recently used cache of CompiledParsers.
+    """
+
+    def __init__(self, maxsize=256):
+        """
+        Creates the ParserCache object.
+
+        :Parameters:
+            - `maxsize`: how many parsers to keep at most.
+        """
+        self.maxsize = maxsize
+        self._parsers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns how many parsers are cached.
+        """
+        return len(self._parsers)
+
+    def compile(self, parser_class, key, spec_factory, *args):
+        """
+        Returns the cached parser_class parser for key, compiling it from
+        spec_factory(*args) when it is missing.
+
+        :Parameters:
+            - `parser_class`: the CompiledParser class to build.
+            - `key`: what the parser is cached under.
+            - `spec_factory`: callable returning an OptionSpec.
+            - `*args`: arguments for spec_factory.
+        """
+        key = (parser_class, key)
+        self._lock.acquire()
+        try:
+            try:
+                parser = self._parsers.pop(key)
+            except KeyError:
+                parser = parser_class(spec_factory(*args))
+                if len(self._parsers) >= self.maxsize:
+                    self._parsers.popitem(last=False)
+            # (Re)inserting marks it as the most recently used
+            self._parsers[key] = parser
+            return parser
+        finally:
+            self._lock.release()
+
+    def get(self, a_verb, parser_class=CompiledParser):
+        """
+        Returns the parser for a verb, compiling it when it is missing.
+
+        :Parameters:
+            - `a_verb`: the verb (bound or unbound) to get the parser for.
+            - `parser_class`: the CompiledParser class to build.
+        """
+        return self.compile(parser_class, verb_key(a_verb),
+                            OptionSpec.from_verb, a_verb)
+
+    def warm(self, action_cls, parser_class=CompiledParser):
+        """
+        Compiles the parsers for every verb of an Action class.
+
+        :Parameters:
+            - `action_cls`: the Action subclass to compile parsers for.
+            - `parser_class`: the CompiledParser class to build.
+        """
+        for verb in action_cls._verbs.values():
+            self.get(verb.method, parser_class)
+
+    def clear(self):
+        """
+        Drops every cached parser.
+        """
+        self._lock.acquire()
+        try:
+            self._parsers.clear()
+        finally:
+            self._lock.release()
+
+
+# The cache used by ActionRunner
+PARSER_CACHE = ParserCache()
@@ -0,0 +1,305 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Buffered output for director.
+
+Text written with director.out and director.err is collected by the
+channels of the current Output and written to their sinks in large chunks,
+when a channel fills up, when ActionRunner.run finishes and at exit. Sinks
+decide where the text ends up: the process streams, a file or memory.
+Text for a terminal is written straight away instead, so prompts and
+progress messages show up while the verb runs.
+
+A thread can be given an Output of its own with set_thread_output, which is
+how director.dispatch captures each command's output without touching the
+process streams or other threads.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import atexit
+import StringIO
+import sys
+import threading
+
+
+# Default number of bytes a channel holds before writing to its sink
+BUFFER_SIZE = 8192
+
+# Default number of records joined together before handing them to a channel
+RECORD_BATCH = 256
+
+
+class StreamSink(object):
+    """
+    Sink writing to one of the sys streams. The stream is looked up every
+    time so replacing sys.stdout or sys.stderr is honoured.
+    """
+
+    def __init__(self, name):
+        """
+        Creates the StreamSink object.
+
+        :Parameters:
+            - `name`: the name of the stream in sys, stdout or stderr.
+        """
+        self.name = name
+
+    def target(self):
+        """
+        Returns the file object to write to.
+        """
+        return getattr(sys, self.name)
+
+
+class FileSink(object):
+    """
+    Sink appending to a file which is opened on first use.
+    """
+
+    def __init__(self, path, mode='a'):
+        """
+        Creates the FileSink object.
+
+        :Parameters:
+            - `path`: the file to write to.
+            - `mode`: the mode to open the file with.
+        """
+        self.path = path
+        self.mode = mode
+        self._file = None
+
+    def target(self):
+        """
+        Returns the file object to write to.
+        """
+        if self._file is None:
+            self._file = open(self.path, self.mode)
+        return self._file
+
+    def close(self):
+        """
+        Closes the file if it was opened.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MemorySink(object):
+    """
+    Sink keeping everything written in memory.
+    """
+
+    def __init__(self):
+        """
+        Creates the MemorySink object.
+        """
+        self._buffer = StringIO.StringIO()
+
+    def target(self):
+        """
+        Returns the file object to write to.
+        """
+        return self._buffer
+
+    def getvalue(self):
+        """
+        Returns everything written so far.
+        """
+        return self._buffer.getvalue()
+
+
+class Channel(object):
+    """
+    Buffers text on its way to a sink.
+    """
+
+    __slots__ = ('sink', 'buffer_size', '_parts', '_size', '_target',
+                 '_interactive', '_lock')
+
+    def __init__(self, sink, buffer_size=BUFFER_SIZE):
+        """
+        Creates the Channel object.
+
+        :Parameters:
+            - `sink`: where the text ends up.
+            - `buffer_size`: bytes to hold before writing to the sink.
+        """
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._size = 0
+        self._target = None
+        self._interactive = False
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        """
+        Adds text to the buffer, writing it out when the buffer is full or
+        the sink is a terminal.
+
+        :Parameters:
+            - `text`: the string to write.
+        """
+        self._lock.acquire()
+        try:
+            target = self.sink.target()
+            # If the sink now points somewhere else what we hold belongs to
+            # the old target
+            if target is not self._target:
+                self._flush()
+                self._target = target
+                isatty = getattr(target, 'isatty', None)
+                self._interactive = isatty is not None and isatty()
+            self._parts.append(text)
+            self._size += len(text)
+            if self._interactive or self._size >= self.buffer_size:
+                self._flush()
+        finally:
+            self._lock.release()
+
+    def flush(self):
+        """
+        Writes everything buffered to the sink.
+        """
+        self._lock.acquire()
+        try:
+            self._flush()
+        finally:
+            self._lock.release()
+
+    def _flush(self):
+        """
+        Writes everything buffered to the sink. The lock must be held.
+        """
+        if not self._parts:
+            return
+        data = ''.join(self._parts)
+        self._parts = []
+        self._size = 0
+        self._target.write(data)
+        self._target.flush()
+
+
+class Output(object):
+    """
+    The stdout and stderr channels used by director and actions.
+    """
+
+    def __init__(self, stdout_sink=None, stderr_sink=None,
+                 buffer_size=BUFFER_SIZE):
+        """
+        Creates the Output object.
+
+        :Parameters:
+            - `stdout_sink`: where normal output goes, sys.stdout if None.
+            - `stderr_sink`: where errors go, sys.stderr if None.
+            - `buffer_size`: bytes each channel holds before writing.
+        """
+        if stdout_sink is None:
+            stdout_sink = StreamSink('stdout')
+        if stderr_sink is None:
+            stderr_sink = StreamSink('stderr')
+        self.stdout = Channel(stdout_sink, buffer_size)
+        self.stderr = Channel(stderr_sink, buffer_size)
+
+    def flush(self):
+        """
+        Writes out everything buffered on both channels.
+        """
+        self.stdout.flush()
+        self.stderr.flush()
+
+
+_OUTPUT = Output()
+
+# Outputs given to single threads
+_LOCAL = threading.local()
+
+
+def get_output():
+    """
+    Returns the Output in use by the current thread.
+    """
+    return getattr(_LOCAL, 'output', None) or _OUTPUT
+
+
+def set_output(output):
+    """
+    Flushes the Output in use and replaces it. Returns the old Output.
+
+    :Parameters:
+        - `output`: the Output to use from now on.
+    """
+    global _OUTPUT
+    old_output = _OUTPUT
+    old_output.flush()
+    _OUTPUT = output
+    return old_output
+
+
+def set_thread_output(output):
+    """
+    Flushes the Output the current thread was given and replaces it. Returns
+    the old one, None if the thread was using the process wide Output.
+
+    :Parameters:
+        - `output`: the Output for the current thread to use from now on, or
+          None to go back to the process wide one.
+    """
+    old_output = getattr(_LOCAL, 'output', None)
+    if old_output is not None:
+        old_output.flush()
+    _LOCAL.output = output
+    return old_output
+
+
+def flush():
+    """
+    Writes out everything buffered by the Output the current thread uses.
+    """
+    get_output().flush()
+
+
+def write_records(records, channel=None, batch_size=RECORD_BATCH):
+    """
+    Writes each record on its own line as it is produced. Records are joined
+    in batches of batch_size before going to the channel, so no more than a
+    batch and the channel buffer are held at once however many records the
+    iterator yields. Returns the number of records written.
+
+    :Parameters:
+        - `records`: an iterable of records, strings or anything with a str.
+        - `channel`: the Channel to write to, stdout of the Output in use if
+          None.
+        - `batch_size`: number of records to join before writing.
+    """
+    if channel is None:
+        channel = get_output().stdout
+    parts = []
+    count = 0
+    for record in records:
+        if type(record) is not str:
+            record = str(record)
+        parts.append(record)
+        count += 1
+        if len(parts) >= batch_size:
+            parts.append('')
+            channel.write('\n'.join(parts))
+            parts = []
+    if parts:
+        parts.append('')
+        channel.write('\n'.join(parts))
+    return count
+
+
+atexit.register(flush)
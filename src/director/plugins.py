@@ -0,0 +1,269 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Finding nouns across a search path of plugin packages.
+
+Wherever director takes a plugin package it also takes a list of them,
+such as core actions followed by add-ons::
+
+   ActionRunner(sys.argv, ['myapp.actions', 'myapp_extras.actions'])
+
+The directories of every package are listed once per process into a
+PluginIndex mapping each noun to the module it is imported from. When two
+packages provide the same noun the one earlier in the search path wins and
+a PluginConflictWarning is issued. Packages spread over several __path__
+entries, such as namespace packages, are searched in __path__ order.
+
+Packages imported from a zip bundle (see director.bundle) are listed from
+the archive's directory, which is read once, instead of the filesystem.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import threading
+import warnings
+import zipimport
+
+from director.error import PluginConflictWarning
+
+
+def package_path(plugin_package):
+    """
+    Returns a plugin package or search path of them as a tuple of names.
+
+    :Parameters:
+        - `plugin_package`: a package name or a sequence of them.
+    """
+    if isinstance(plugin_package, basestring):
+        return (plugin_package,)
+    return tuple(plugin_package)
+
+
+def module_nouns(file_names, compiled=False):
+    """
+    Returns the nouns for the entries of a plugin directory in order.
+
+    :Parameters:
+        - `file_names`: the names in the directory.
+        - `compiled`: if bytecode files count as modules, for archives
+          holding no source.
+    """
+    nouns = []
+    for name in file_names:
+        if "__" in name:
+            continue
+        base, ext = os.path.splitext(name)
+        if ext in ('.pyc', '.pyo'):
+            if not compiled:
+                continue
+            name = base
+        elif ext == '.py':
+            name = base
+        if name not in nouns:
+            nouns.append(name)
+    return nouns
+
+
+# Names in each zip archive listed so far, keyed by archive path
+_ARCHIVES = {}
+
+
+def archive_names(archive):
+    """
+    Returns the names in a zip archive, reading its directory only once.
+
+    :Parameters:
+        - `archive`: the path of the archive.
+    """
+    try:
+        return _ARCHIVES[archive]
+    except KeyError:
+        # Most runs never look inside an archive
+        import zipfile
+
+        zip_file = zipfile.ZipFile(archive)
+        try:
+            names = zip_file.namelist()
+        finally:
+            zip_file.close()
+        _ARCHIVES[archive] = names
+        return names
+
+
+def split_archive(path):
+    """
+    Returns the (archive, prefix) a path inside a zip archive is made of, or
+    None if the path isn't inside one.
+
+    :Parameters:
+        - `path`: a path such as /opt/myapp.zip/myapp/actions.
+    """
+    try:
+        importer = zipimport.zipimporter(path)
+    except zipimport.ZipImportError:
+        return None
+    return importer.archive, importer.prefix
+
+
+def list_directory(path):
+    """
+    Returns the names in a package directory and if they come from an
+    archive.
+
+    :Parameters:
+        - `path`: a __path__ entry of a package.
+    """
+    try:
+        return os.listdir(path), False
+    except OSError:
+        location = split_archive(path)
+        if location is None:
+            raise
+    archive, prefix = location
+    prefix = prefix.replace(os.sep, '/')
+    if prefix and not prefix.endswith('/'):
+        prefix += '/'
+    names = []
+    for name in archive_names(archive):
+        if name.startswith(prefix) and len(name) > len(prefix):
+            name = name[len(prefix):].split('/')[0]
+            if name not in names:
+                names.append(name)
+    return names, True
+
+
+class PluginIndex(object):
+    """
+    Merged lookup of nouns over a search path of plugin packages.
+    """
+
+    def __init__(self, plugin_package):
+        """
+        Creates the PluginIndex object. Nothing is listed until the index
+        is first used.
+
+        :Parameters:
+            - `plugin_package`: a package name or a sequence of them, in
+              order of precedence.
+        """
+        self.packages = package_path(plugin_package)
+        self.paths = None
+        self.conflicts = None
+        self._modules = None
+        self._nouns = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """
+        String representation of the object.
+        """
+        return "<PluginIndex %s>" % ", ".join(self.packages)
+
+    def _list_package(self, package):
+        """
+        Returns the nouns of one package and its directories.
+
+        :Parameters:
+            - `package`: the name of the package to list.
+        """
+        action_mod = __import__(package, globals(), locals(), ['__name__'])
+        mod_paths = list(action_mod.__path__)
+        nouns = []
+        for mod_path in mod_paths:
+            file_names, compiled = list_directory(mod_path)
+            for noun in module_nouns(file_names, compiled):
+                if noun not in nouns:
+                    nouns.append(noun)
+        return nouns, mod_paths
+
+    def build(self):
+        """
+        Lists every package and merges their nouns.
+        """
+        modules = {}
+        nouns = []
+        paths = []
+        conflicts = {}
+        for package in self.packages:
+            package_nouns, mod_paths = self._list_package(package)
+            paths.extend(mod_paths)
+            for noun in package_nouns:
+                module = "%s.%s" % (package, noun)
+                if noun in modules:
+                    conflicts.setdefault(noun, [modules[noun]]).append(
+                        module)
+                    continue
+                modules[noun] = module
+                nouns.append(noun)
+        for noun, found in conflicts.items():
+            warnings.warn("Noun %s is provided by %s, using %s" % (
+                noun, ", ".join(found), found[0]), PluginConflictWarning)
+        self.paths = paths
+        self.conflicts = conflicts
+        self._nouns = nouns
+        self._modules = modules
+
+    def _ensure(self):
+        """
+        Builds the index the first time it is needed.
+        """
+        if self._modules is None:
+            self._lock.acquire()
+            try:
+                if self._modules is None:
+                    self.build()
+            finally:
+                self._lock.release()
+
+    def nouns(self):
+        """
+        Returns every noun in search path order.
+        """
+        self._ensure()
+        return list(self._nouns)
+
+    def module(self, noun):
+        """
+        Returns the name of the module a noun is imported from or None if
+        no package provides it.
+
+        :Parameters:
+            - `noun`: the noun to look up.
+        """
+        self._ensure()
+        return self._modules.get(noun)
+
+
+# Indexes built so far, keyed by search path
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def plugin_index(plugin_package):
+    """
+    Returns the PluginIndex shared by everything using the same plugin
+    package or search path of them.
+
+    :Parameters:
+        - `plugin_package`: a package name or a sequence of them.
+    """
+    packages = package_path(plugin_package)
+    _INDEXES_LOCK.acquire()
+    try:
+        try:
+            return _INDEXES[packages]
+        except KeyError:
+            index = PluginIndex(packages)
+            _INDEXES[packages] = index
+            return index
+    finally:
+        _INDEXES_LOCK.release()
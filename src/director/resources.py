@@ -0,0 +1,302 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Pooled resources for actions.
+
+Expensive things an action needs, such as database connections or HTTP
+sessions, can be declared as a Pool on the Action subclass. The pool is
+shared by every instance of the class, every invocation and every thread
+of a process. Resources are created the first time they are needed, reused
+afterwards, closed when they sit idle for too long and closed at exit::
+
+   class Bucket(director.Action):
+
+       db = Pool(lambda: connect('db.example.com'), max_size=4)
+
+       def add(self, name):
+           connection = self.db.get()
+           try:
+               connection.insert(name)
+           finally:
+               self.db.put(connection)
+
+       def delete(self, name):
+           with self.db.lease() as connection:
+               connection.delete(name)
+
+A pool inherited over a fork, such as by the daemon's children, leaves the
+parent's resources alone and starts afresh. Each daemon request runs in
+its own child, so resources don't carry over from one request to the next;
+the child closes what it created once the request is answered. Batch
+worker processes close theirs when the pool of workers shuts down.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import atexit
+import contextlib
+import os
+import threading
+import time
+
+from director.error import PoolError
+
+
+# Every pool created, so they can be closed at exit
+_POOLS = []
+_POOLS_LOCK = threading.Lock()
+
+
+def _close_resource(resource):
+    """
+    Closes a resource with its close method if it has one.
+
+    :Parameters:
+        - `resource`: the resource to close.
+    """
+    close = getattr(resource, 'close', None)
+    if close is not None:
+        close()
+
+
+class Pool(object):
+    """
+    A bounded pool of resources, used as a class attribute of an Action.
+    """
+
+    def __init__(self, factory, close=_close_resource, max_size=8,
+                 idle_timeout=300, name=None):
+        """
+        Creates the Pool object. No resource is created until one is asked
+        for.
+
+        :Parameters:
+            - `factory`: callable taking no arguments which creates a
+              resource.
+            - `close`: callable closing a resource, its close method by
+              default.
+            - `max_size`: most resources in use and idle at once.
+            - `idle_timeout`: seconds a resource may sit unused before it
+              is closed, None to keep resources forever.
+            - `name`: what to call the pool in errors.
+        """
+        self.factory = factory
+        self.close_resource = close
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.name = name or getattr(factory, '__name__', 'pool')
+        # Idle resources as (resource, last used), most recently used last
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._pid = os.getpid()
+        self._condition = threading.Condition(threading.Lock())
+        _POOLS_LOCK.acquire()
+        try:
+            _POOLS.append(self)
+        finally:
+            _POOLS_LOCK.release()
+
+    def __repr__(self):
+        """
+        String representation of the object.
+        """
+        return "<Pool %s %d/%d>" % (self.name, self._size, self.max_size)
+
+    def __get__(self, obj, objtype=None):
+        """
+        Returns the pool itself whether accessed through the class or an
+        instance.
+
+        :Parameters:
+            - `obj`: the instance the pool is accessed through.
+            - `objtype`: the class the pool is accessed through.
+        """
+        return self
+
+    def __len__(self):
+        """
+        Returns how many resources exist, in use or idle.
+        """
+        return self._size
+
+    def _check_pid(self):
+        """
+        Forgets the resources of the parent after a fork. The condition must
+        be held.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._size = 0
+
+    def _evict(self):
+        """
+        Takes the resources idle for too long out of the pool and returns
+        them. The condition must be held.
+        """
+        if self.idle_timeout is None or not self._idle:
+            return []
+        oldest = time.time() - self.idle_timeout
+        stale = 0
+        while stale < len(self._idle) and self._idle[stale][1] <= oldest:
+            stale += 1
+        evicted = [x[0] for x in self._idle[:stale]]
+        del self._idle[:stale]
+        self._size -= stale
+        return evicted
+
+    def get(self, timeout=None):
+        """
+        Returns a resource, creating one if none is idle and the pool isn't
+        full. Waits for one to be put back when it is full.
+
+        :Parameters:
+            - `timeout`: most seconds to wait, None to wait forever.
+        """
+        self._condition.acquire()
+        try:
+            if self._closed:
+                raise PoolError("Pool %s is closed." % self.name)
+            self._check_pid()
+            evicted = self._evict()
+            if timeout is not None:
+                deadline = time.time() + timeout
+            while not self._idle and self._size >= self.max_size:
+                if timeout is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolError(
+                            "No resource free in pool %s after %s "
+                            "seconds." % (self.name, timeout))
+                    self._condition.wait(remaining)
+                # Closing the pool wakes every waiter
+                if self._closed:
+                    raise PoolError("Pool %s is closed." % self.name)
+            resource = None
+            if self._idle:
+                resource = self._idle.pop()[0]
+            else:
+                self._size += 1
+        finally:
+            self._condition.release()
+        for stale in evicted:
+            self.close_resource(stale)
+        if resource is None:
+            try:
+                resource = self.factory()
+            except:
+                self._release_slot()
+                raise
+        return resource
+
+    def put(self, resource, discard=False):
+        """
+        Gives a resource back to the pool.
+
+        :Parameters:
+            - `resource`: a resource from get.
+            - `discard`: close the resource instead of reusing it, such as
+              when it is broken.
+        """
+        self._condition.acquire()
+        try:
+            self._check_pid()
+            if not (discard or self._closed):
+                self._idle.append((resource, time.time()))
+                self._condition.notify()
+                return
+        finally:
+            self._condition.release()
+        self._release_slot()
+        self.close_resource(resource)
+
+    def _release_slot(self):
+        """
+        Frees the place of a resource which is gone.
+        """
+        self._condition.acquire()
+        try:
+            if self._size > 0:
+                self._size -= 1
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """
+        Gets a resource for the body of a with statement and puts it back
+        afterwards, discarding it if the body raised.
+
+        :Parameters:
+            - `timeout`: most seconds to wait, None to wait forever.
+        """
+        resource = self.get(timeout)
+        try:
+            yield resource
+        except:
+            self.put(resource, discard=True)
+            raise
+        self.put(resource)
+
+    def evict_idle(self):
+        """
+        Closes the resources idle for longer than idle_timeout.
+        """
+        self._condition.acquire()
+        try:
+            self._check_pid()
+            evicted = self._evict()
+        finally:
+            self._condition.release()
+        for stale in evicted:
+            self.close_resource(stale)
+
+    def close(self):
+        """
+        Closes the idle resources and those put back later. The pool can't
+        be used afterwards.
+        """
+        self._condition.acquire()
+        try:
+            self._check_pid()
+            self._closed = True
+            idle = [x[0] for x in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+        for resource in idle:
+            self.close_resource(resource)
+
+
+def close_pools():
+    """
+    Closes every pool. Runs at exit.
+    """
+    _POOLS_LOCK.acquire()
+    try:
+        pools = list(_POOLS)
+    finally:
+        _POOLS_LOCK.release()
+    for pool in pools:
+        # One pool failing to close shouldn't keep the others open
+        try:
+            pool.close()
+        except Exception:
+            pass
+
+
+atexit.register(close_pools)
@@ -0,0 +1,183 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Where the time of a single run goes.
+
+Giving --director-profile before the noun, or setting DIRECTOR_PROFILE in
+the environment, makes ActionRunner time each phase of the run and write a
+breakdown to stderr when it is done::
+
+   $ myapp --director-profile bucket list
+   $ DIRECTOR_PROFILE=1 myapp bucket list
+
+Naming a file, as in --director-profile=list.pstats or
+DIRECTOR_PROFILE=/tmp/list, also runs the verbs under cProfile and saves
+the statistics there for pstats to read. A value is only taken as a file
+when it ends in .pstats or has a directory in it; 1, true, yes and the
+like only ask for the breakdown.
+
+Each phase only counts its own time: importing a plugin while parsing
+options counts as plugin import, not parse_options. Records a streaming
+verb yields are produced as they are written, so that time shows as
+output. Startup, from the start of the process until director is first
+imported, is read from /proc and only as precise as the kernel's clock
+ticks; it is left out where there is no /proc.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import time
+
+
+# When director started being imported; director imports this module first
+IMPORT_STARTED = time.time()
+# When importing director was done, see imported
+IMPORT_FINISHED = None
+
+PROFILE_OPTION = '--director-profile'
+PROFILE_ENV = 'DIRECTOR_PROFILE'
+PSTATS_SUFFIX = '.pstats'
+
+# Profile values which turn profiling off
+FALSE_WORDS = ('', '0', 'false', 'no', 'off')
+
+# The phases of a run in the order they are reported
+PHASES = ('startup', 'import director', 'plugin import', 'parse_options',
+          '_startup_hook', 'verb', 'output', 'filters')
+
+# Set once the process wide phases have been reported
+_REPORTED_STARTUP = False
+
+
+def imported():
+    """
+    Notes that importing director is done. Called by director itself.
+    """
+    global IMPORT_FINISHED
+    if IMPORT_FINISHED is None:
+        IMPORT_FINISHED = time.time()
+
+
+def process_started():
+    """
+    Returns the seconds between the start of the process and the import of
+    director, or None if /proc can't tell.
+    """
+    try:
+        stat_file = open('/proc/self/stat')
+        try:
+            stat = stat_file.read()
+        finally:
+            stat_file.close()
+        uptime_file = open('/proc/uptime')
+        try:
+            uptime = float(uptime_file.read().split()[0])
+        finally:
+            uptime_file.close()
+        # The command name may hold spaces, the fields after it don't
+        start_ticks = int(stat[stat.rindex(')') + 2:].split()[19])
+        ticks = os.sysconf('SC_CLK_TCK')
+    except (EnvironmentError, ValueError, IndexError):
+        return None
+    imported_at = uptime - (time.time() - IMPORT_STARTED)
+    return max(imported_at - float(start_ticks) / ticks, 0.0)
+
+
+def profile_setting(value):
+    """
+    Returns what a --director-profile or DIRECTOR_PROFILE value asks for:
+    None for no profiling, True for the breakdown only or the path to
+    save cProfile statistics to. Only values which look like a path, with
+    a directory or ending in .pstats, are taken as one; any other value
+    turns on the breakdown unless it is a usual false word.
+
+    :Parameters:
+        - `value`: the value given, None if none was.
+    """
+    if value is None or value.lower() in FALSE_WORDS:
+        return None
+    if '/' in value or os.sep in value or value.endswith(PSTATS_SUFFIX):
+        return value
+    return True
+
+
+class Timings(object):
+    """
+    The time spent in each phase of a run.
+    """
+
+    def __init__(self, startup=True):
+        """
+        Creates the Timings object.
+
+        :Parameters:
+            - `startup`: if the startup and import of director are to be
+              reported, which is done only once per process.
+        """
+        global _REPORTED_STARTUP
+        self.seconds = {}
+        # Time taken by phases running inside each phase being timed
+        self._nested = []
+        if startup and not _REPORTED_STARTUP:
+            _REPORTED_STARTUP = True
+            started = process_started()
+            if started is not None:
+                self.add('startup', started)
+            if IMPORT_FINISHED is not None:
+                self.add('import director', IMPORT_FINISHED - IMPORT_STARTED)
+
+    def add(self, phase, seconds):
+        """
+        Adds time to a phase.
+
+        :Parameters:
+            - `phase`: the name of the phase.
+            - `seconds`: the time spent.
+        """
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+
+    def call(self, phase, func, *args, **kwargs):
+        """
+        Calls a function, adding the time it takes to a phase. Returns what
+        the function returns.
+
+        :Parameters:
+            - `phase`: the name of the phase.
+            - `func`: the function to call.
+            - `*args`: any non keyword arguments.
+            - `**kwargs`: all keyword arguments.
+        """
+        self._nested.append(0.0)
+        started = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.time() - started
+            self.add(phase, elapsed - self._nested.pop())
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def report(self):
+        """
+        Returns the breakdown of the phases as text.
+        """
+        phases = [x for x in PHASES if x in self.seconds]
+        phases.extend([x for x in sorted(self.seconds) if x not in PHASES])
+        total = sum(self.seconds.values())
+        lines = ["director profile:"]
+        for phase in phases:
+            seconds = self.seconds[phase]
+            share = total and seconds / total * 100 or 0.0
+            lines.append("  %-16s %10.2f ms %5.1f%%" % (
+                phase, seconds * 1000, share))
+        lines.append("  %-16s %10.2f ms" % ('total', total * 1000))
+        return "\n".join(lines)
@@ -25,8 +25,32 @@ class Simpleaction(director.Action):
     """
 
     @decorators.simple_help("\nOptions:\topt:\tsome kind of options")
+    @decorators.file_options('opt')
     def verb(self, opt, another=False, last="last"):
         """
         An example verb.
         """
         pass
+
+    @decorators.simple_help("\nOptions:\tmessage:\twhat to fail with")
+    def fail(self, message="failed 1 time"):
+        """
+        A verb which always raises an IOError.
+        """
+        raise IOError(message)
+
+    @decorators.simple_help("\nOptions:\tto:\thow many numbers to yield")
+    def count(self, to="3"):
+        """
+        A verb which streams the numbers up to to.
+        """
+        for number in xrange(int(to)):
+            yield number
+
+    @decorators.simple_help("\nOptions:\trecords:\tthe numbers to double")
+    def double(self, records=None):
+        """
+        A verb which doubles the numbers piped into it.
+        """
+        for number in records:
+            yield number * 2
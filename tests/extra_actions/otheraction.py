@@ -0,0 +1,32 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Add-on action only found in tests.extra_actions.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import director
+
+from director import decorators
+
+
+class Otheraction(director.Action):
+    """
+    Action from an add-on package.
+    """
+
+    @decorators.simple_help("\nOptions:\tname:\twho to greet")
+    def greet(self, name="world"):
+        """
+        Greets someone.
+        """
+        director.out("hello %s" % name)
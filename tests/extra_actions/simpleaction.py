@@ -0,0 +1,29 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Add-on action clashing with tests.actions.simpleaction.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import director
+
+
+class Simpleaction(director.Action):
+    """
+    Action which loses to tests.actions.simpleaction.
+    """
+
+    def shadowed(self):
+        """
+        A verb which should never be found.
+        """
+        pass
@@ -0,0 +1,50 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for audit.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import unittest
+
+from director import audit
+
+
+class AuditTests(unittest.TestCase):
+    """
+    Tests auditing plugin imports.
+    """
+
+    def test_audit_plugins(self):
+        """
+        Make sure each noun is measured and reported.
+        """
+        results = audit.audit_plugins('tests.extra_actions')
+        self.assertEqual(len(results), 2)
+        result = [x for x in results if x['noun'] == 'otheraction'][0]
+        self.assertEqual(result['error'], None)
+        self.assertTrue(result['seconds'] >= 0)
+        # The packages the noun lives in, and what tests/__init__.py
+        # imports with them, aren't charged to it
+        self.assertEqual(result['modules'],
+                         ['tests.extra_actions.otheraction'])
+        report = audit.format_report(results)
+        self.assertEqual(report.split('\n')[1].split()[:2],
+                         ['1', results[0]['noun']])
+
+    def test_audit_failure(self):
+        """
+        Make sure modules which fail to import are reported.
+        """
+        result = audit.audit_module('tests.actions.nosuchnoun')
+        self.assertTrue(result['error'].startswith('ImportError'))
+        self.assertFalse('tests.actions.nosuchnoun' in result['modules'])
@@ -0,0 +1,207 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for batch.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from director import codes
+from director import batch
+from director.batch import BatchRunner
+from director.batch import read_invocations
+
+
+STDERR = sys.stderr
+TMP = tempfile.mkstemp()[1]
+
+BATCH = """# A comment
+simpleaction verb --opt='a value'
+
+simpleaction
+simpleaction verb --opt=other --another
+simpleaction nosuchverb
+simpleaction verb --opt="unclosed
+simpleaction verb --opt=after
+"""
+
+# Plugin whose resources leave a marker file named for the process which
+# closed them
+CLOSING_PLUGIN = """
+import os
+
+import director
+
+from director.resources import Pool
+
+
+def mark(kind):
+    open(os.path.join(os.path.dirname(__file__), '%s-%d' % (
+        kind, os.getpid())), 'w').close()
+
+
+class Closing(director.Action):
+
+    instance_scope = director.PROCESS_SCOPE
+
+    pool = Pool(object, close=lambda resource: mark('pool'))
+
+    def _shutdown_hook(self):
+        mark('action')
+
+    def use(self):
+        self.pool.put(self.pool.get())
+"""
+
+
+class BatchRunnerTests(unittest.TestCase):
+    """
+    Tests the BatchRunner object.
+    """
+
+    def setUp(self):
+        """
+        Sets up stuff for the test.
+        """
+        self.runner = BatchRunner('tests.actions')
+        sys.stderr = open(TMP, 'w')
+
+    def tearDown(self):
+        """
+        Maps stderr back.
+        """
+        sys.stderr.close()
+        sys.stderr = STDERR
+
+    def test_read_invocations(self):
+        """
+        Make sure comments and blank lines are skipped.
+        """
+        self.assertEqual(list(read_invocations(BATCH.splitlines()))[0],
+                         (2, ['simpleaction', 'verb', '--opt=a value']))
+
+    def test_run_batch(self):
+        """
+        Make sure every line gets its own exit code.
+        """
+        results = self.runner.run_batch(BATCH.splitlines())
+        self.assertEqual(results, [(2, codes.system.SYSTEM_OK),
+                                   (4, codes.system.NOT_ENOUGH_PARAMETERS),
+                                   (5, codes.system.SYSTEM_OK),
+                                   (6, 1),
+                                   (7, codes.system.NOT_ENOUGH_PARAMETERS),
+                                   (8, codes.system.SYSTEM_OK)])
+        sys.stderr.flush()
+        self.assertTrue('line 7: No closing quotation' in open(TMP).read())
+
+    def test_actions_reused(self):
+        """
+        Make sure the same action serves every line.
+        """
+        self.runner.run_args(['simpleaction', 'verb', '--opt=1'])
+        action = self.runner.action_to_run
+        self.runner.run_args(['simpleaction', 'verb', '--opt=2'])
+        self.assertTrue(self.runner.action_to_run is action)
+
+    def test_run_parallel(self):
+        """
+        Make sure a parallel batch gives the same exit codes as a serial one.
+        """
+        self.assertEqual(
+            self.runner.run_parallel(BATCH.splitlines(), jobs=2),
+            self.runner.run_batch(BATCH.splitlines()))
+        self.assertEqual(
+            self.runner.run_parallel(BATCH.splitlines(), jobs=2,
+                                     ordered=False),
+            self.runner.run_batch(BATCH.splitlines()))
+
+    def test_main_parallel(self):
+        """
+        Make sure a malformed line doesn't stop a parallel batch.
+        """
+        batch_path = tempfile.mkstemp()[1]
+        try:
+            batch_file = open(batch_path, 'w')
+            batch_file.write(BATCH)
+            batch_file.close()
+            self.assertEqual(
+                batch.main(['myapp', '--jobs=2', batch_path], 'tests.actions'),
+                codes.system.NOT_ENOUGH_PARAMETERS)
+            sys.stderr.flush()
+            errors = open(TMP).read()
+            self.assertTrue('line 7: No closing quotation' in errors)
+            self.assertTrue('line 6: exit code 1' in errors)
+            self.assertFalse('line 8:' in errors)
+        finally:
+            os.unlink(batch_path)
+
+    def test_run_threaded(self):
+        """
+        Make sure a threaded batch gives the same exit codes as a serial one.
+        """
+        self.assertEqual(
+            self.runner.run_threaded(BATCH.splitlines(), threads=3),
+            self.runner.run_batch(BATCH.splitlines()))
+
+
+class WorkerShutdownTests(unittest.TestCase):
+    """
+    Tests that worker processes close what they opened.
+    """
+
+    def setUp(self):
+        """
+        Writes a plugin package recording what gets closed.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.plugin_dir = os.path.join(self.tmp_dir, 'closing_plugins')
+        os.mkdir(self.plugin_dir)
+        open(os.path.join(self.plugin_dir, '__init__.py'), 'w').close()
+        plugin_file = open(os.path.join(self.plugin_dir, 'closing.py'), 'w')
+        plugin_file.write(CLOSING_PLUGIN)
+        plugin_file.close()
+        sys.path.insert(0, self.tmp_dir)
+        sys.stderr = open(TMP, 'w')
+
+    def tearDown(self):
+        """
+        Removes the plugin package.
+        """
+        sys.stderr.close()
+        sys.stderr = STDERR
+        sys.path.remove(self.tmp_dir)
+        shutil.rmtree(self.tmp_dir)
+
+    def markers(self, kind):
+        """
+        Returns the processes which left a marker of a kind.
+        """
+        return [x for x in os.listdir(self.plugin_dir)
+                if x.startswith(kind + '-')]
+
+    def test_run_parallel(self):
+        """
+        Make sure every worker closes its pools and the actions shared by
+        the process as it shuts down.
+        """
+        runner = BatchRunner('closing_plugins')
+        lines = ['closing use'] * 8
+        self.assertEqual([x[1] for x in runner.run_parallel(lines, jobs=2)],
+                         [codes.system.SYSTEM_OK] * 8)
+        self.assertTrue(self.markers('pool'))
+        self.assertEqual(len(self.markers('action')),
+                         len(self.markers('pool')))
@@ -0,0 +1,109 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for bundle.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from director import ActionRunner
+from director import output
+from director.bundle import build_bundle
+from director.manifest import Manifest
+from director.files import new_file_mode
+from director.manifest import list_plugin_nouns
+
+
+ACTION = '''
+import director
+
+
+class Zipnoun(director.Action):
+
+    def hello(self, name="zip"):
+        director.out("hello from %s" % name)
+'''
+
+
+class BundleTests(unittest.TestCase):
+    """
+    Tests building and running from a bundle.
+    """
+
+    def setUp(self):
+        """
+        Creates a plugin package on disk and bundles it.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        actions_dir = os.path.join(self.tmp_dir, 'zipped', 'actions')
+        os.makedirs(actions_dir)
+        for name, text in (('zipped/__init__.py', ''),
+                           ('zipped/actions/__init__.py', ''),
+                           ('zipped/actions/zipnoun.py', ACTION)):
+            a_file = open(os.path.join(self.tmp_dir, name), 'w')
+            a_file.write(text)
+            a_file.close()
+        self.bundle_path = os.path.join(self.tmp_dir, 'bundle.zip')
+        sys.path.insert(0, self.tmp_dir)
+        try:
+            self.names = build_bundle(self.bundle_path, 'zipped.actions')
+        finally:
+            sys.path.remove(self.tmp_dir)
+        # Only the bundle is left to import from
+        shutil.rmtree(os.path.join(self.tmp_dir, 'zipped'))
+        sys.path.insert(0, self.bundle_path)
+
+    def tearDown(self):
+        """
+        Forgets the bundled package and removes the files.
+        """
+        sys.path.remove(self.bundle_path)
+        for name in sys.modules.keys():
+            if name.split('.')[0] == 'zipped':
+                del sys.modules[name]
+        shutil.rmtree(self.tmp_dir)
+
+    def test_bundle(self):
+        """
+        Make sure nouns are listed and run from the bundle.
+        """
+        self.assertTrue('zipped/actions/zipnoun.pyc' in self.names)
+        self.assertTrue('director/__init__.pyc' in self.names)
+        self.assertEqual(os.stat(self.bundle_path).st_mode & 0777,
+                         new_file_mode())
+        self.assertEqual(list_plugin_nouns(['zipped.actions'])[0],
+                         ['zipnoun'])
+        sink = output.MemorySink()
+        old_output = output.set_output(
+            output.Output(sink, output.MemorySink()))
+        try:
+            ActionRunner(['self', 'zipnoun', 'hello'],
+                         'zipped.actions').run()
+        finally:
+            output.set_output(old_output)
+        self.assertEqual(sink.getvalue(), 'hello from zip\n')
+
+    def test_manifest(self):
+        """
+        Make sure manifest entries for bundled nouns are stamped.
+        """
+        manifest = Manifest(os.path.join(self.tmp_dir, 'manifest'),
+                            'zipped.actions')
+        manifest.build()
+        entry = manifest.noun('zipnoun')
+        self.assertEqual(entry['module'], 'zipped.actions.zipnoun')
+        self.assertNotEqual(entry['stamp'], None)
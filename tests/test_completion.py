@@ -0,0 +1,136 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for completion.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from director import completion
+from director.manifest import Manifest
+from director.files import new_file_mode
+
+
+class CompletionTests(unittest.TestCase):
+    """
+    Tests completing from an index.
+    """
+
+    def setUp(self):
+        """
+        Builds a manifest and an index for the test actions.
+        """
+        self.manifest_path = tempfile.mkstemp()[1]
+        self.index_path = tempfile.mkstemp()[1]
+        manifest = Manifest(self.manifest_path, 'tests.actions')
+        manifest.build()
+        completion.build_index(manifest, self.index_path)
+        self.index = completion.load_index(self.index_path)
+
+    def tearDown(self):
+        """
+        Removes the manifest and the index.
+        """
+        self.index.close()
+        os.unlink(self.manifest_path)
+        os.unlink(self.index_path)
+
+    def test_complete(self):
+        """
+        Make sure nouns, verbs and options are completed.
+        """
+        complete = lambda words: completion.complete(
+            self.index, words, len(words) - 1)
+        self.assertEqual(complete(['myapp', 'simple']), ['simpleaction'])
+        self.assertEqual(complete(['myapp', 'simpleaction', '']),
+                         ['count', 'description', 'double', 'fail', 'help',
+                          'verb'])
+        self.assertEqual(complete(['myapp', 'simpleaction', 'verb', '--']),
+                         ['--another', '--last=', '--opt='])
+        self.assertEqual(complete(['myapp', 'simpleaction', 'verb', 'x']), [])
+        self.assertEqual(complete(['myapp', 'nosuchnoun', '']), [])
+        self.assertEqual(complete(['myapp', 'simpleaction', 'count',
+                                   '--then', 'simpleaction', 'd']),
+                         ['description', 'double'])
+        self.assertEqual(complete(['myapp', '--format=csv', 'simple']),
+                         ['simpleaction'])
+        self.assertEqual(complete(['myapp', '--format', 'csv',
+                                   'simpleaction', 'c']), ['count'])
+        self.assertEqual(complete(['myapp', '--format', '']), [])
+        self.assertEqual(complete(['myapp', '--f']), ['--format='])
+        self.assertEqual(complete(['myapp', '--']),
+                         ['--director-profile', '--format='])
+        self.assertEqual(complete(['myapp', '--director-profile',
+                                   '--format=csv', 'simple']),
+                         ['simpleaction'])
+        self.assertEqual(complete(['myapp', '--format=csv', 'simpleaction',
+                                   'count', '--']), ['--to='])
+
+    def test_bash_split(self):
+        """
+        Make sure options bash split on = complete like whole words.
+        """
+        complete = lambda words: completion.complete(
+            self.index, words, len(words) - 1)
+        self.assertEqual(complete(['myapp', '--format', '=', 'csv',
+                                   'simple']), ['simpleaction'])
+        self.assertEqual(complete(['myapp', '--director-profile', '=',
+                                   'x.pstats', 'simpleaction', 'c']),
+                         ['count'])
+        self.assertEqual(complete(['myapp', '--format', '=']), [])
+        self.assertEqual(complete(['myapp', '--format', '=', 'c']), [])
+        self.assertEqual(complete(['myapp', 'simpleaction', 'verb', '--opt',
+                                   '=', 'x', '--a']), ['--another'])
+        self.assertEqual(completion.complete(
+            self.index, ['myapp', 'simple', '--format', '=', 'csv'], 1),
+            ['simpleaction'])
+
+    def test_script(self):
+        """
+        Make sure the module answers when run as a script.
+        """
+        script = completion.shell_script('bash', 'myapp', self.index_path)
+        self.assertTrue('complete -F _myapp_complete myapp' in script)
+        proc = subprocess.Popen(
+            [sys.executable, '-S', completion.__file__.replace('.pyc', '.py'),
+             self.index_path, '2', 'myapp', 'simpleaction', 'h'],
+            stdout=subprocess.PIPE)
+        self.assertEqual(proc.communicate()[0], 'help\n')
+        code = completion.SCRIPT_CODE % os.path.dirname(
+            os.path.abspath(completion.__file__))
+        proc = subprocess.Popen(
+            [sys.executable, '-S', '-c', code, self.index_path, '3', 'myapp',
+             'simpleaction', 'count', '--'], stdout=subprocess.PIPE)
+        self.assertEqual(proc.communicate()[0], '--to=\n')
+
+    def test_index(self):
+        """
+        Make sure the index is written atomically, readable by others and
+        read a noun at a time.
+        """
+        self.assertEqual(os.stat(self.index_path).st_mode & 0777,
+                         new_file_mode())
+        self.assertEqual(self.index.nouns, ['simpleaction'])
+        self.assertEqual(self.index.nouns_starting('s'), ['simpleaction'])
+        self.assertEqual(self.index.nouns_starting('t'), [])
+        self.assertEqual(self.index.verbs('simpleaction')['count'],
+                         ('--to=',))
+        self.assertEqual(self.index.verbs('nosuchnoun'), {})
+        self.assertEqual([x for x in os.listdir(os.path.dirname(
+            self.index_path)) if x.startswith('.index-')], [])
+        open(self.index_path, 'wb').write('garbage')
+        self.assertEqual(completion.load_index(self.index_path), None)
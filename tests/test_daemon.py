@@ -0,0 +1,120 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for the daemon and its client.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from director import client
+from director import codes
+from director.daemon import DirectorServer
+from tests.test_batch import CLOSING_PLUGIN
+
+
+class DaemonTests(unittest.TestCase):
+    """
+    Tests commands forwarded through DirectorServer.
+    """
+
+    def setUp(self):
+        """
+        Starts a server for the test actions.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'director.sock')
+        self.server = DirectorServer(self.socket_path, 'tests.actions')
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_call(self):
+        """
+        Make sure a command runs and reports success.
+        """
+        res = client.call(self.socket_path,
+                          ['self', 'simpleaction', 'verb', '--opt=value'])
+        self.assertEqual(res, (codes.system.SYSTEM_OK, '', ''))
+
+    def test_call_not_enough_parameters(self):
+        """
+        Make sure errors and exit codes come back to the client.
+        """
+        code, stdout_data, stderr_data = client.call(
+            self.socket_path, ['self', 'simpleaction'])
+        self.assertEqual(code, codes.system.NOT_ENOUGH_PARAMETERS)
+        self.assertTrue('simpleaction' in stderr_data)
+
+    def test_call_bytes(self):
+        """
+        Make sure arguments and environment which aren't UTF-8 get through.
+        """
+        os.environ['DIRECTOR_TEST_BYTES'] = '\xff'
+        try:
+            code, stdout_data, stderr_data = client.call(
+                self.socket_path,
+                ['self', 'simpleaction', 'fail', '--message=caf\xe9'])
+        finally:
+            del os.environ['DIRECTOR_TEST_BYTES']
+        self.assertEqual(code, 1)
+        self.assertTrue('IOError: caf\xe9' in stderr_data)
+
+    def test_unavailable(self):
+        """
+        Make sure a missing server gives the right exit code.
+        """
+        self.assertEqual(
+            client.main(self.socket_path + '.missing', ['self'], False),
+            codes.system.DAEMON_UNAVAILABLE)
+
+    def test_child_closes(self):
+        """
+        Make sure the child of each request closes what it opened.
+        """
+        plugin_dir = os.path.join(self.tmp_dir, 'daemon_closing_plugins')
+        os.mkdir(plugin_dir)
+        open(os.path.join(plugin_dir, '__init__.py'), 'w').close()
+        plugin_file = open(os.path.join(plugin_dir, 'closing.py'), 'w')
+        plugin_file.write(CLOSING_PLUGIN)
+        plugin_file.close()
+        sys.path.insert(0, self.tmp_dir)
+        try:
+            self.server.plugin_package = 'daemon_closing_plugins'
+            for x in range(2):
+                self.assertEqual(client.call(
+                    self.socket_path, ['self', 'closing', 'use'])[0],
+                    codes.system.SYSTEM_OK)
+        finally:
+            sys.path.remove(self.tmp_dir)
+        # Children close after answering so give them a moment
+        for x in range(100):
+            markers = [x for x in os.listdir(plugin_dir)
+                       if x.startswith('pool-') or x.startswith('action-')]
+            if len(markers) == 4:
+                break
+            time.sleep(0.02)
+        self.assertEqual(len(markers), 4)
@@ -16,10 +16,14 @@ __docformat__ = 'restructuredtext'
 
 import exceptions
 import inspect
+import os
+import shutil
+import tempfile
 import types
 import unittest
 
 from director import decorators
+from director.options import OptionSpec
 
 
 class Fake(object):
@@ -65,3 +69,173 @@ class ActionTests(unittest.TestCase):
         self.assertEqual(type(self.fake_obj.method.meth), types.FunctionType)
         self.assertEqual(inspect.getargspec(self.fake_obj.method.meth)[0],
                          ['self', 'input'])
+
+    def test_wrapper_metadata(self):
+        """
+        Make sure the wrappers look like the methods they wrap.
+        """
+        self.assertEqual(Fake.method.__name__, 'method')
+        self.assertEqual(Fake.method2.__name__, 'method2')
+        self.assertEqual(Fake.method2.__doc__, Fake.method2.meth.__doc__)
+
+    def test_lazy_help(self):
+        """
+        Make sure help is rendered on first use and keeps its parts.
+        """
+        wrapper = decorators.general_help('Lazy', {'input': 'the input'},
+                                          ['app fake lazy'])(Fake.method2.meth)
+        self.assertEqual(wrapper._help, None)
+        self.assertEqual(wrapper.desc, 'Lazy')
+        self.assertEqual(wrapper.options, {'input': 'the input'})
+        self.assertEqual(wrapper.examples, ['app fake lazy'])
+        self.assertTrue(wrapper.help is wrapper._help)
+        self.assertEqual(wrapper(self.fake_obj, 'in'), 'in')
+
+
+class Counted(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    @decorators.general_help("Lists things.")
+    @decorators.cached(maxsize=2)
+    def list(self, owner='me', limit=10):
+        self.calls += 1
+        return [owner, limit, self.calls]
+
+    @decorators.cached()
+    def stream(self, count=2):
+        self.calls += 1
+        return iter(range(count))
+
+
+class CachedTests(unittest.TestCase):
+    """
+    Tests for caching verb results.
+    """
+
+    def setUp(self):
+        """
+        Sets up stuff for the test.
+        """
+        self.obj = Counted()
+        self.tmp_dir = tempfile.mkdtemp()
+        Counted.list.im_func.meth.clear()
+        Counted.stream.im_func.clear()
+
+    def tearDown(self):
+        """
+        Cleans up after the test.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_normalized_options(self):
+        """
+        Make sure the same options given differently share a result.
+        """
+        self.assertEqual(self.obj.list(), ['me', 10, 1])
+        self.assertEqual(self.obj.list('me'), ['me', 10, 1])
+        self.assertEqual(self.obj.list(limit=10, owner='me'), ['me', 10, 1])
+        self.assertEqual(self.obj.list('you'), ['you', 10, 2])
+        self.assertEqual(self.obj.calls, 2)
+
+    def test_lru(self):
+        """
+        Make sure the least recently used result is dropped first.
+        """
+        self.obj.list('a')
+        self.obj.list('b')
+        self.obj.list('a')
+        self.obj.list('c')
+        self.assertEqual(self.obj.calls, 3)
+        self.obj.list('a')
+        self.assertEqual(self.obj.calls, 3)
+        self.obj.list('b')
+        self.assertEqual(self.obj.calls, 4)
+
+    def test_stream(self):
+        """
+        Make sure streamed records are cached and streamed again.
+        """
+        self.assertEqual(list(self.obj.stream()), [0, 1])
+        result = self.obj.stream()
+        self.assertTrue(iter(result) is result)
+        self.assertEqual(list(result), [0, 1])
+        self.assertEqual(self.obj.calls, 1)
+
+    def test_uncacheable(self):
+        """
+        Make sure options which can't be keys skip the cache.
+        """
+        owner = object()
+        self.obj.list(owner)
+        self.obj.list(owner)
+        self.assertEqual(self.obj.calls, 2)
+
+    def test_help_and_spec(self):
+        """
+        Make sure help and options see through the cache.
+        """
+        self.assertEqual(self.obj.list.help, "\nLists things.\n")
+        self.assertFalse(hasattr(self.obj.stream, 'help'))
+        spec = OptionSpec.from_verb(self.obj.list)
+        self.assertEqual(spec.defaults, {'owner': 'me', 'limit': 10})
+
+    def test_ttl(self):
+        """
+        Make sure stale results are computed again.
+        """
+        wrapper = decorators.cached(ttl=-1)(Counted.list.im_func.meth.meth)
+        wrapper(self.obj)
+        wrapper(self.obj)
+        self.assertEqual(self.obj.calls, 2)
+
+    def test_disk(self):
+        """
+        Make sure results on disk are shared and evicted by size.
+        """
+        function = Counted.list.im_func.meth.meth
+        first = decorators.cached(cache_dir=self.tmp_dir)(function)
+        self.assertEqual(first(self.obj, 'a'), ['a', 10, 1])
+        second = decorators.cached(cache_dir=self.tmp_dir)(function)
+        self.assertEqual(second(self.obj, 'a'), ['a', 10, 1])
+        self.assertEqual(self.obj.calls, 1)
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 1)
+
+        size = os.path.getsize(
+            os.path.join(self.tmp_dir, os.listdir(self.tmp_dir)[0]))
+        small = decorators.cached(cache_dir=self.tmp_dir,
+                                  max_disk_bytes=size)(function)
+        small(self.obj, 'b')
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 1)
+        self.obj.calls = 0
+        second.memory.clear()
+        second(self.obj, 'a')
+        self.assertEqual(self.obj.calls, 1)
+
+    def test_disk_unwritable(self):
+        """
+        Make sure a cache directory which can't be written is skipped.
+        """
+        function = Counted.list.im_func.meth.meth
+        not_dir = os.path.join(self.tmp_dir, 'file')
+        open(not_dir, 'w').close()
+        wrapper = decorators.cached(
+            cache_dir=os.path.join(not_dir, 'cache'))(function)
+        self.assertEqual(wrapper(self.obj, 'a'), ['a', 10, 1])
+        wrapper.memory.clear()
+        self.assertEqual(wrapper(self.obj, 'a'), ['a', 10, 2])
+
+    def test_disk_mode(self):
+        """
+        Make sure cached results get the mode the umask gives new files.
+        """
+        function = Counted.list.im_func.meth.meth
+        wrapper = decorators.cached(cache_dir=self.tmp_dir)(function)
+        old_umask = os.umask(0022)
+        try:
+            wrapper(self.obj, 'a')
+        finally:
+            os.umask(old_umask)
+        path = os.path.join(self.tmp_dir, os.listdir(self.tmp_dir)[0])
+        self.assertEqual(os.stat(path).st_mode & 0777, 0644)
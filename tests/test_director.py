@@ -143,6 +143,29 @@ class ActionTests(unittest.TestCase):
         """
         self.assertEqual(self.action._list_verbs(), ['description', 'help'])
 
+    def test_verb_registry(self):
+        """
+        Make sure verbs are registered on the class when it is created.
+        """
+        from director import Action
+
+        class Registered(Action):
+
+            def added(self):
+                pass
+
+            def _private(self):
+                pass
+
+            not_a_verb = 'text'
+
+        self.assertEqual(Registered._verb_names,
+                         ('added', 'description', 'help'))
+        Registered.later = lambda self: None
+        self.assertEqual(Registered()._list_verbs(),
+                         ['added', 'description', 'help', 'later'])
+        self.assertRaises(AttributeError, Registered()._get_verb, '_private')
+
     def test_description(self):
         """
         Tests the description works.
@@ -216,3 +239,219 @@ class ActionRunnerTests(unittest.TestCase):
         """
         self.arunner.verb = "asdasd"
         self.assertRaises(AttributeError, self.arunner.run)
+
+    def test_run_stream(self):
+        """
+        Make sure records yielded by a verb are written out.
+        """
+        from director import output
+
+        sink = output.MemorySink()
+        old_output = output.set_output(
+            output.Output(sink, output.MemorySink()))
+        try:
+            self.arunner.load_args(['self', 'simpleaction', 'count',
+                                    '--to=4'])
+            self.arunner.run()
+        finally:
+            output.set_output(old_output)
+        self.assertEqual(sink.getvalue(), '0\n1\n2\n3\n')
+
+    def test_run_formatted(self):
+        """
+        Make sure returned lists and dictionaries are only written when a
+        format is given.
+        """
+        from director import output
+        from tests.actions.simpleaction import Simpleaction
+
+        sink = output.MemorySink()
+        old_output = output.set_output(
+            output.Output(sink, output.MemorySink()))
+        Simpleaction.listing = lambda self, one='': (
+            one and {'n': 1} or [{'n': 1}, {'n': 2}])
+        try:
+            self.arunner.load_args(['self', 'simpleaction', 'listing'])
+            self.assertEqual(self.arunner.run(), [{'n': 1}, {'n': 2}])
+            self.assertEqual(sink.getvalue(), '')
+            self.arunner.load_args(['self', '--format=jsonl',
+                                    'simpleaction', 'listing'])
+            self.assertEqual(self.arunner.run(), None)
+            self.arunner.load_args(['self', '--format', 'jsonl',
+                                    'simpleaction', 'listing', '--one=y'])
+            self.arunner.run()
+        finally:
+            del Simpleaction.listing
+            output.set_output(old_output)
+        self.assertEqual(sink.getvalue(),
+                         '{"n":1}\n{"n":2}\n{"n":1}\n')
+
+    def test_run_pipeline(self):
+        """
+        Make sure records flow from one stage of a pipeline to the next.
+        """
+        from director import output
+
+        sink = output.MemorySink()
+        old_output = output.set_output(
+            output.Output(sink, output.MemorySink()))
+        try:
+            self.arunner.load_args(['self', 'simpleaction', 'count',
+                                    '--to=3', '--then', 'simpleaction',
+                                    'double', '--then', 'simpleaction',
+                                    'double'])
+            self.assertEqual(self.arunner.options, {'to': '3'})
+            self.assertEqual(len(self.arunner.pipeline), 2)
+            self.arunner.run()
+            self.assertRaises(SystemExit, self.arunner.load_args,
+                              ['self', 'simpleaction', 'count', '--then'])
+            # Checked before the first stage runs
+            self.assertRaises(SystemExit, self.arunner.load_args,
+                              ['self', 'simpleaction', 'count', '--then',
+                               'simpleaction', 'verb', '--opt=x'])
+            self.assertRaises(SystemExit, self.arunner.load_args,
+                              ['self', 'simpleaction', 'count', '--then',
+                               'simpleaction', 'double', '--records=x'])
+        finally:
+            output.set_output(old_output)
+        self.assertEqual(sink.getvalue(), '0\n4\n8\n')
+
+    def test_run_profiled(self):
+        """
+        Make sure --director-profile reports the phases of the run and
+        saves cProfile statistics when given a path.
+        """
+        import pstats
+        from director import output
+
+        sink = output.MemorySink()
+        err_sink = output.MemorySink()
+        old_output = output.set_output(output.Output(sink, err_sink))
+        try:
+            self.arunner.load_args(['self', '--director-profile=%s' % TMP,
+                                    'simpleaction', 'count', '--to=2'])
+            self.assertEqual(self.arunner.profile, TMP)
+            self.arunner.run()
+        finally:
+            output.set_output(old_output)
+        self.assertEqual(sink.getvalue(), '0\n1\n')
+        report = err_sink.getvalue()
+        self.assertTrue(report.startswith('director profile:'))
+        for phase in ('parse_options', 'verb', 'output', 'total'):
+            self.assertTrue(phase in report)
+        self.assertTrue(pstats.Stats(TMP).total_calls > 0)
+
+        self.arunner.load_args(['self', 'simpleaction', 'verb'])
+        self.assertEqual(self.arunner.timings, None)
+
+
+class LifecycleTests(unittest.TestCase):
+    """
+    Tests opening and closing actions and their scopes.
+    """
+
+    def setUp(self):
+        """
+        Records the hooks Simpleaction runs.
+        """
+        from tests.actions.simpleaction import Simpleaction
+
+        self.events = []
+        Simpleaction._startup_hook = lambda x: self.events.append(
+            ('open', x))
+        Simpleaction._shutdown_hook = lambda x: self.events.append(
+            ('close', x))
+        self.action_cls = Simpleaction
+
+    def tearDown(self):
+        """
+        Puts Simpleaction back the way it was.
+        """
+        del self.action_cls._startup_hook
+        del self.action_cls._shutdown_hook
+        if 'instance_scope' in self.action_cls.__dict__:
+            del self.action_cls.instance_scope
+
+    def run_twice(self, runner):
+        """
+        Runs a verb twice with a runner, returning the actions used.
+
+        :Parameters:
+            - `runner`: the ActionRunner to run with.
+        """
+        actions = []
+        for x in range(2):
+            runner.load_args(['self', 'simpleaction', 'verb', '--opt=x'])
+            actions.append(runner.action_to_run)
+            runner.run()
+        return actions
+
+    def test_context_manager(self):
+        """
+        Make sure hooks run once per open and close.
+        """
+        with self.action_cls() as action:
+            action._open()
+        action._close()
+        with action:
+            pass
+        self.assertEqual(self.events, [('open', action), ('close', action),
+                                       ('open', action), ('close', action)])
+
+    def test_read_after_run(self):
+        """
+        Make sure reading action_to_run doesn't open the action again.
+        """
+        from director import ActionRunner
+
+        runner = ActionRunner(['self', 'simpleaction', 'verb', '--opt=x'],
+                              'tests.actions')
+        runner.run()
+        action = runner.action_to_run
+        self.assertEqual(self.events, [('open', action), ('close', action)])
+
+    def test_batch_scope(self):
+        """
+        Make sure batch scoped actions last until the runner is closed.
+        """
+        from director.batch import BatchRunner
+
+        runner = BatchRunner('tests.actions')
+        first, second = self.run_twice(runner)
+        self.assertTrue(first is second)
+        self.assertEqual(self.events, [('open', first)])
+        runner.close()
+        self.assertEqual(self.events, [('open', first), ('close', first)])
+
+    def test_invocation_scope(self):
+        """
+        Make sure invocation scoped actions are closed after each run.
+        """
+        from director import INVOCATION_SCOPE
+        from director.batch import BatchRunner
+
+        self.action_cls.instance_scope = INVOCATION_SCOPE
+        first, second = self.run_twice(BatchRunner('tests.actions'))
+        self.assertFalse(first is second)
+        self.assertEqual(self.events, [('open', first), ('close', first),
+                                       ('open', second), ('close', second)])
+
+    def test_process_scope(self):
+        """
+        Make sure process scoped actions are shared until exit.
+        """
+        from director import ActionRunner
+        from director import PROCESS_SCOPE
+        from director import close_process_actions
+
+        self.action_cls.instance_scope = PROCESS_SCOPE
+        runner = ActionRunner(['self', 'simpleaction', 'verb', '--opt=x'],
+                              'tests.actions')
+        first, second = self.run_twice(runner)
+        self.assertTrue(first is second)
+        self.assertTrue(ActionRunner(['self', 'simpleaction', 'verb',
+                                      '--opt=x'],
+                                     'tests.actions').action_to_run is first)
+        self.assertEqual(self.events, [('open', first)])
+        close_process_actions()
+        self.assertEqual(self.events, [('open', first), ('close', first)])
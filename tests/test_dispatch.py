@@ -0,0 +1,115 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for dispatch.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import exceptions
+import StringIO
+import sys
+import threading
+import unittest
+import warnings
+
+from director import codes
+from director.dispatch import Dispatcher
+from director.filter import ExceptionFilter
+from director.filter import Filter
+from director.plugins import plugin_index
+
+
+class DispatcherTests(unittest.TestCase):
+    """
+    Tests the Dispatcher object.
+    """
+
+    def setUp(self):
+        """
+        Creates a dispatcher and watches the process streams.
+        """
+        self.dispatcher = Dispatcher('tests.actions')
+        self.old_streams = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO.StringIO(), StringIO.StringIO()
+
+    def tearDown(self):
+        """
+        Makes sure nothing was written to the process streams.
+        """
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = self.old_streams
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '')
+
+    def test_dispatch(self):
+        """
+        Make sure results, output and exit codes come back.
+        """
+        result = self.dispatcher.dispatch(['simpleaction', 'count',
+                                           '--to=3'])
+        self.assertEqual(result.code, codes.system.SYSTEM_OK)
+        self.assertEqual(result.result, [0, 1, 2])
+        result = self.dispatcher.dispatch(['simpleaction', 'help'])
+        self.assertTrue('Available verbs' in result.stderr)
+        result = self.dispatcher.dispatch(['simpleaction'])
+        self.assertEqual(result.code, codes.system.NOT_ENOUGH_PARAMETERS)
+        result = self.dispatcher.dispatch(['simpleaction', 'verb',
+                                           '--nope'])
+        self.assertEqual(result.code, 2)
+        self.assertTrue('no such option: --nope' in result.stderr)
+
+    def test_exceptions(self):
+        """
+        Make sure exceptions are returned or filtered.
+        """
+        result = self.dispatcher.dispatch(['simpleaction', 'fail'])
+        self.assertEqual(result.code, 1)
+        self.assertTrue(isinstance(result.exception, IOError))
+        self.assertTrue(result.stderr.startswith('Traceback'))
+        filter_obj = Filter()
+        filter_obj.register_filter(
+            ExceptionFilter(exceptions.IOError, "IO: %s"))
+        self.dispatcher.filter_obj = filter_obj
+        result = self.dispatcher.dispatch(['simpleaction', 'fail'])
+        self.assertEqual(result.code, codes.system.EXCEPTION_RAISED)
+        self.assertEqual(result.stderr, 'IO: failed 1 time\n')
+
+    def test_threads(self):
+        """
+        Make sure concurrent commands keep their results apart.
+        """
+        packages = ['tests.actions', 'tests.extra_actions']
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            plugin_index(packages).nouns()
+        dispatcher = Dispatcher(packages)
+        results = {}
+        greetings = {}
+
+        def run(number):
+            for x in range(20):
+                results[(number, x)] = dispatcher.dispatch(
+                    ['--format=jsonl', 'simpleaction', 'count',
+                     '--to=%d' % number]).result
+                greetings[(number, x)] = dispatcher.dispatch(
+                    ['otheraction', 'greet', '--name=%d' % number]).stdout
+
+        threads = [threading.Thread(target=run, args=(x, ))
+                   for x in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for (number, x), result in results.items():
+            self.assertEqual(result, range(number))
+            self.assertEqual(greetings[(number, x)], 'hello %d\n' % number)
+        self.assertEqual(len(dispatcher._actions), 2)
@@ -0,0 +1,63 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for files.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from director.files import atomic_write
+
+
+class AtomicWriteTests(unittest.TestCase):
+    """
+    Tests atomic_write.
+    """
+
+    def setUp(self):
+        """
+        Makes a directory to write in.
+        """
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'written')
+
+    def tearDown(self):
+        """
+        Removes the directory.
+        """
+        shutil.rmtree(self.dir)
+
+    def test_write(self):
+        """
+        Make sure the file is replaced with the mode the umask gives.
+        """
+        old_umask = os.umask(0022)
+        try:
+            atomic_write(self.path, 'first')
+            atomic_write(self.path, 'second')
+        finally:
+            os.umask(old_umask)
+        self.assertEqual(open(self.path, 'rb').read(), 'second')
+        self.assertEqual(os.stat(self.path).st_mode & 0777, 0644)
+        self.assertEqual(os.listdir(self.dir), ['written'])
+
+    def test_failed_write(self):
+        """
+        Make sure nothing is left behind when the rename fails.
+        """
+        os.mkdir(self.path)
+        self.assertRaises(OSError, atomic_write, self.path, 'data')
+        self.assertEqual(os.listdir(self.dir), ['written'])
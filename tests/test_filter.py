@@ -15,10 +15,30 @@ __docformat__ = 'restructuredtext'
 
 
 import exceptions
+import StringIO
+import sys
 import unittest
 
+from director import output
+from director.batch import BatchRunner
+from director.filter import AggregatingFilter
 from director.filter import Filter
 from director.filter import ExceptionFilter
+from tests.actions.simpleaction import Simpleaction
+
+
+class LoggingFilter(ExceptionFilter):
+    """
+    Filter overriding filter as subclasses of ExceptionFilter may.
+    """
+
+    def __init__(self, exception):
+        ExceptionFilter.__init__(self, exception)
+        self.logged = []
+
+    def filter(self, exception):
+        self.logged.append(exception)
+        return True
 
 
 class FilterTests(unittest.TestCase):
@@ -51,6 +71,153 @@ class FilterTests(unittest.TestCase):
         """
         self.filter.execute_filters(exceptions.Exception(''))
 
+    def test_filter_override(self):
+        """
+        Make sure filters overriding filter are called, by both kinds of
+        Filter.
+        """
+        for container in (Filter(), AggregatingFilter()):
+            exception_filter = LoggingFilter(exceptions.EnvironmentError)
+            container.register_filter(exception_filter)
+            exception = exceptions.IOError('x')
+            self.assertTrue(container.execute_filters(exception))
+            container.finish()
+            self.assertEqual(exception_filter.logged, [exception])
+
+    def test_register_duplicate(self):
+        """
+        Make sure one exception can only have one filter.
+        """
+        self.filter.register_filter(ExceptionFilter(exceptions.IOError))
+        self.assertRaises(Exception, self.filter.register_filter,
+                          ExceptionFilter(exceptions.IOError))
+
+    def test_find_filter(self):
+        """
+        Make sure the closest filter in the MRO is used.
+        """
+        io_filter = ExceptionFilter(exceptions.IOError)
+        env_filter = ExceptionFilter(exceptions.EnvironmentError)
+        self.filter.register_filter(env_filter)
+        self.filter.register_filter(io_filter)
+        self.assertTrue(self.filter.find_filter(exceptions.IOError) is
+                        io_filter)
+        self.assertTrue(self.filter.find_filter(exceptions.OSError) is
+                        env_filter)
+        self.assertEqual(self.filter.find_filter(exceptions.TypeError), None)
+
+    def test_exception_with_arguments(self):
+        """
+        Make sure exceptions needing constructor arguments can be filtered.
+        """
+
+        class NeedsArguments(exceptions.Exception):
+
+            def __init__(self, first, second):
+                exceptions.Exception.__init__(self, first, second)
+
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            self.filter.register_filter(ExceptionFilter(NeedsArguments))
+            self.assertTrue(
+                self.filter.execute_filters(NeedsArguments(1, 2)))
+            output.flush()
+            self.assertEqual(sys.stderr.getvalue(), '(1, 2)\n')
+        finally:
+            sys.stderr = stderr
+
+
+class AggregatingFilterTests(unittest.TestCase):
+    """
+    Tests the AggregatingFilter object.
+    """
+
+    def setUp(self):
+        """
+        Sets up stuff for the test.
+        """
+        self.filter = AggregatingFilter(sample_size=2)
+        self.filter.register_filter(
+            ExceptionFilter(exceptions.IOError, 'IO: %s'))
+        self.stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+
+    def tearDown(self):
+        """
+        Maps stderr back.
+        """
+        sys.stderr = self.stderr
+
+    def test_finish(self):
+        """
+        Make sure equal errors are reported once with a count.
+        """
+        for x in range(5):
+            self.assertTrue(self.filter.execute_filters(
+                exceptions.IOError('failed %s' % x), ['noun', str(x)]))
+        self.assertFalse(self.filter.execute_filters(
+            exceptions.TypeError('')))
+        self.filter.execute_filters(exceptions.IOError('other'))
+        self.filter.finish()
+        output.flush()
+        self.assertEqual(sys.stderr.getvalue(),
+                         'IO: failed 0\n(5 times)\n    e.g. noun 0\n'
+                         '    e.g. noun 1\nIO: other\n')
+
+    def test_batch(self):
+        """
+        Make sure serial and parallel batches report the same summary.
+        """
+        lines = ['simpleaction fail'] * 4 + ['simpleaction fail --message=x']
+        BatchRunner('tests.actions').run_batch(lines, self.filter)
+        output.flush()
+        serial = sys.stderr.getvalue()
+        sys.stderr = StringIO.StringIO()
+        BatchRunner('tests.actions').run_parallel(lines, self.filter, 2)
+        output.flush()
+        self.assertEqual(sys.stderr.getvalue(), serial)
+        self.assertTrue(serial.startswith('IO: failed 1 time\n(4 times)\n'))
+
+    def test_batch_unpicklable(self):
+        """
+        Make sure exceptions workers can't send are still summarized.
+        """
+
+        def failhost(self, host='web1'):
+            raise HostError(host, 3)
+
+        Simpleaction.failhost = failhost
+        try:
+            lines = ['simpleaction failhost'] * 3
+            BatchRunner('tests.actions').run_batch(lines, self.filter)
+            output.flush()
+            serial = sys.stderr.getvalue()
+            sys.stderr = StringIO.StringIO()
+            BatchRunner('tests.actions').run_parallel(lines, self.filter, 2)
+            output.flush()
+        finally:
+            del Simpleaction.failhost
+        self.assertEqual(sys.stderr.getvalue(), serial)
+        self.assertTrue(
+            serial.startswith('IO: web1 failed with 3\n(3 times)\n'))
+
+
+class HostError(exceptions.IOError):
+    """
+    An exception which can't be unpickled as it formats its message.
+    """
+
+    def __init__(self, host, code):
+        """
+        Creates the HostError object.
+
+        :Parameters:
+            - `host`: the host which failed.
+            - `code`: what it failed with.
+        """
+        exceptions.IOError.__init__(self, "%s failed with %s" % (host, code))
+
 
 class ExceptionFilterTests(unittest.TestCase):
     """
@@ -0,0 +1,121 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for formatters.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import datetime
+import StringIO
+import unittest
+
+from director import ActionRunner
+from director import formatters
+from director import output
+
+
+class FormatterTests(unittest.TestCase):
+    """
+    Tests each formatter.
+    """
+
+    def format(self, formatter, records):
+        """
+        Returns what a formatter writes for some records.
+
+        :Parameters:
+            - `formatter`: the Formatter to use.
+            - `records`: the records to write.
+        """
+        sink = output.MemorySink()
+        channel = output.Channel(sink)
+        self.assertEqual(formatter.write(iter(records), channel),
+                         len(records))
+        channel.flush()
+        return sink.getvalue()
+
+    def test_text(self):
+        """
+        Make sure text writes a record per line.
+        """
+        self.assertEqual(self.format(formatters.TextFormatter(), [1, 'a']),
+                         '1\na\n')
+
+    def test_jsonl(self):
+        """
+        Make sure jsonl writes a JSON document per line.
+        """
+        records = [{'a': 1}, [1, 'b'], None]
+        self.assertEqual(
+            self.format(formatters.JsonLinesFormatter(2), records),
+            '{"a":1}\n[1,"b"]\nnull\n')
+
+    def test_csv(self):
+        """
+        Make sure csv writes rows, with a header for dicts.
+        """
+        self.assertEqual(
+            self.format(formatters.CsvFormatter(1), [(1, 'a,b'), [2, 'c']]),
+            '1,"a,b"\r\n2,c\r\n')
+        self.assertEqual(
+            self.format(formatters.CsvFormatter(),
+                        [{'b': 1, 'a': 2}, {'a': 3}]),
+            'a,b\r\n2,1\r\n3,\r\n')
+
+    def test_csv_mixed(self):
+        """
+        Make sure single values make one column and every record is
+        written for its own kind.
+        """
+        self.assertEqual(
+            self.format(formatters.CsvFormatter(), ['host1', 2, None]),
+            'host1\r\n2\r\n""\r\n')
+        self.assertEqual(
+            self.format(formatters.CsvFormatter(),
+                        [{'a': 1}, [2, 3], 'x', {'a': 4}]),
+            'a\r\n1\r\n2,3\r\nx\r\n4\r\n')
+
+    def test_binary(self):
+        """
+        Make sure binary records can be read back.
+        """
+        records = [{'a': [1, 2]}, 'text', 3.5]
+        data = self.format(formatters.BinaryFormatter(), records)
+        self.assertEqual(data[:4], '\x00\x00\x00\x0b')
+        self.assertEqual(data[4:15], '{"a":[1,2]}')
+        self.assertEqual(
+            list(formatters.read_binary(StringIO.StringIO(data))), records)
+        when = datetime.datetime(2008, 1, 2)
+        data = self.format(formatters.BinaryFormatter(), [when])
+        self.assertEqual(
+            list(formatters.read_binary(StringIO.StringIO(data))),
+            [str(when)])
+
+    def test_runner_format(self):
+        """
+        Make sure --format picks the formatter for a run.
+        """
+        sink = output.MemorySink()
+        old_output = output.set_output(
+            output.Output(sink, output.MemorySink()))
+        try:
+            runner = ActionRunner(['self', '--format=jsonl', 'simpleaction',
+                                   'count', '--to=2'], 'tests.actions')
+            self.assertEqual(runner.stages, [['simpleaction', 'count',
+                                              '--to=2']])
+            runner.run()
+            self.assertRaises(SystemExit, ActionRunner,
+                              ['self', '--format', 'nope', 'simpleaction',
+                               'count'], 'tests.actions')
+        finally:
+            output.set_output(old_output)
+        self.assertEqual(sink.getvalue(), '0\n1\n')
@@ -0,0 +1,189 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for manifest.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from director import ActionRunner
+from director.manifest import Manifest
+
+
+STDERR = sys.stderr
+TMP = tempfile.mkstemp()[1]
+
+
+class ManifestTests(unittest.TestCase):
+    """
+    Tests the Manifest object.
+    """
+
+    def setUp(self):
+        """
+        Builds a manifest for the test actions.
+        """
+        self.path = tempfile.mkstemp()[1]
+        self.manifest = Manifest(self.path, 'tests.actions')
+        self.manifest.build()
+
+    def tearDown(self):
+        """
+        Removes the manifest file.
+        """
+        os.unlink(self.path)
+
+    def test_load(self):
+        """
+        Make sure a built manifest can be loaded back.
+        """
+        manifest = Manifest(self.path, 'tests.actions')
+        self.assertTrue(manifest.load())
+        self.assertEqual(manifest.nouns(), ['simpleaction'])
+        self.assertFalse(Manifest(self.path, 'other.package').load())
+
+    def test_mode(self):
+        """
+        Make sure the manifest gets the mode the umask gives new files.
+        """
+        old_umask = os.umask(0022)
+        try:
+            self.manifest.save()
+        finally:
+            os.umask(old_umask)
+        self.assertEqual(os.stat(self.path).st_mode & 0777, 0644)
+
+    def test_option_spec(self):
+        """
+        Make sure verb option specs are recorded.
+        """
+        spec = self.manifest.option_spec('simpleaction', 'verb')
+        self.assertEqual(spec.options, [('last', 'store'),
+                                        ('another', 'store_false'),
+                                        ('opt', 'store')])
+        self.assertEqual(spec.defaults, {'last': 'last', 'another': False})
+        self.assertEqual(self.manifest.option_spec('simpleaction', 'no'),
+                         None)
+
+    def test_help(self):
+        """
+        Make sure help text and its parts are recorded.
+        """
+        entry = self.manifest.verb('simpleaction', 'help')
+        self.assertEqual(entry['help_parts']['options'],
+                         {'verb': 'verb to get help on'})
+        self.assertTrue(entry['help'].startswith('\nDetailed help'))
+
+    def test_stale_noun(self):
+        """
+        Make sure entries for changed modules are not used.
+        """
+        self.manifest.data['nouns']['simpleaction']['stamp'] = (0, 0)
+        self.assertEqual(self.manifest.noun('simpleaction'), None)
+
+
+class InheritedVerbTests(unittest.TestCase):
+    """
+    Tests the manifest with verbs inherited from another module.
+    """
+
+    def setUp(self):
+        """
+        Writes a plugin package whose action inherits its verb.
+        """
+        self.dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dir, 'mfplug'))
+        open(os.path.join(self.dir, 'mfplug', '__init__.py'), 'w').close()
+        self.base_path = os.path.join(self.dir, 'mfbase.py')
+        base_file = open(self.base_path, 'w')
+        base_file.write("import director\n\n"
+                        "class Base(director.Action):\n"
+                        "    def show(self, size='1'):\n"
+                        "        pass\n")
+        base_file.close()
+        thing_file = open(os.path.join(self.dir, 'mfplug', 'thing.py'), 'w')
+        thing_file.write("import mfbase\n\n"
+                         "class Thing(mfbase.Base):\n"
+                         "    pass\n")
+        thing_file.close()
+        sys.path.insert(0, self.dir)
+        self.manifest = Manifest(os.path.join(self.dir, 'manifest'),
+                                 'mfplug')
+        self.manifest.build()
+
+    def tearDown(self):
+        """
+        Removes the plugin package.
+        """
+        sys.path.remove(self.dir)
+        for name in ('mfbase', 'mfplug', 'mfplug.thing'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.dir)
+
+    def test_stale_base(self):
+        """
+        Make sure entries go stale when a base class module changes.
+        """
+        self.assertTrue(self.base_path in
+                        self.manifest.noun('thing')['files'])
+        base_file = open(self.base_path, 'a')
+        base_file.write("    color = 'red'\n")
+        base_file.close()
+        self.assertEqual(self.manifest.noun('thing'), None)
+
+
+class ManifestActionRunnerTests(unittest.TestCase):
+    """
+    Tests ActionRunner when it has a manifest.
+    """
+
+    def setUp(self):
+        """
+        Builds a manifest for the test actions.
+        """
+        self.path = tempfile.mkstemp()[1]
+        self.manifest = Manifest(self.path, 'tests.actions')
+        self.manifest.build()
+        sys.stderr = open(TMP, 'w')
+
+    def tearDown(self):
+        """
+        Removes the manifest file and maps stderr back.
+        """
+        sys.stderr.close()
+        sys.stderr = STDERR
+        os.unlink(self.path)
+
+    def test_parse_options(self):
+        """
+        Make sure options are parsed without creating the action.
+        """
+        arunner = ActionRunner(['self', 'simpleaction', 'verb',
+                                '--opt=value'], 'tests.actions', self.manifest)
+        self.assertEqual(arunner.options, {'opt': 'value',
+                                           'another': False,
+                                           'last': 'last'})
+        self.assertFalse('simpleaction' in arunner._actions)
+
+    def test_help(self):
+        """
+        Make sure help is rendered without creating the action.
+        """
+        arunner = ActionRunner(['self', 'simpleaction', 'help',
+                                '--verb=verb'], 'tests.actions', self.manifest)
+        arunner.run()
+        self.assertFalse('simpleaction' in arunner._actions)
@@ -0,0 +1,189 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for options.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import mmap
+import os
+import tempfile
+import unittest
+
+from director import ActionRunner
+from director.options import CompiledParser
+from director.options import FastParser
+from director.options import OptionSpec
+from director.options import ParserCache
+from director.options import resolve_files
+
+from tests.actions.simpleaction import Simpleaction
+
+
+class OptionSpecTests(unittest.TestCase):
+    """
+    Tests the OptionSpec object.
+    """
+
+    def test_from_verb(self):
+        """
+        Make sure specs are built the way parse_options always did.
+        """
+        spec = OptionSpec.from_verb(Simpleaction.verb)
+        self.assertEqual(spec.options, [('last', 'store'),
+                                        ('another', 'store_false'),
+                                        ('opt', 'store')])
+        self.assertEqual(spec.defaults, {'last': 'last', 'another': False})
+        self.assertEqual(spec.files, ('opt',))
+        copy = OptionSpec.from_dict(spec.to_dict())
+        self.assertEqual(copy.options, spec.options)
+        self.assertEqual(copy.files, spec.files)
+
+
+class FastParserTests(unittest.TestCase):
+    """
+    Tests the FastParser object.
+    """
+
+    def setUp(self):
+        """
+        Sets up stuff for the test.
+        """
+        spec = OptionSpec.from_verb(Simpleaction.verb)
+        self.fast = FastParser(spec)
+        self.optparse = CompiledParser(spec)
+
+    def test_parse(self):
+        """
+        Make sure results match optparse.
+        """
+        for args in ([], ['--opt=1'], ['--opt', '1', 'extra'],
+                     ['--another', '--last=', '--opt=a=b'],
+                     ['--opt=1', '--', '--opt=2'], ['--op=abbreviated'],
+                     ['--opt', '-'], ['--opt=1', '--opt=2']):
+            self.assertEqual(self.fast.parse(args), self.optparse.parse(args))
+
+
+class ParserCacheTests(unittest.TestCase):
+    """
+    Tests the ParserCache object.
+    """
+
+    def setUp(self):
+        """
+        Sets up stuff for the test.
+        """
+        self.cache = ParserCache(2)
+
+    def test_get(self):
+        """
+        Make sure parsers are compiled once and parse like optparse.
+        """
+        parser = self.cache.get(Simpleaction.verb)
+        self.assertTrue(self.cache.get(Simpleaction.verb) is parser)
+        self.assertEqual(parser.parse(['--opt=1', '--another']),
+                         {'opt': '1', 'another': False, 'last': 'last'})
+
+    def test_lru(self):
+        """
+        Make sure the least recently used parser is dropped first.
+        """
+        spec = OptionSpec([], {})
+        compile = lambda key: self.cache.compile(CompiledParser, key,
+                                                 lambda: spec)
+        first = compile('first')
+        compile('second')
+        compile('first')
+        compile('third')
+        self.assertEqual(len(self.cache), 2)
+        self.assertTrue(compile('first') is first)
+
+    def test_warm(self):
+        """
+        Make sure warming compiles every verb.
+        """
+        self.cache.maxsize = 10
+        self.cache.warm(Simpleaction)
+        self.assertEqual(len(self.cache), 6)
+
+
+class ResolveFilesTests(unittest.TestCase):
+    """
+    Tests mapping files given as @path.
+    """
+
+    def setUp(self):
+        """
+        Creates a file and an empty file to map.
+        """
+        self.path = tempfile.mkstemp()[1]
+        self.empty_path = tempfile.mkstemp()[1]
+        a_file = open(self.path, 'w')
+        a_file.write('line one\nline two\n')
+        a_file.close()
+
+    def tearDown(self):
+        """
+        Removes the files.
+        """
+        os.unlink(self.path)
+        os.unlink(self.empty_path)
+
+    def test_resolve_files(self):
+        """
+        Make sure only @path values given on the command line are mapped.
+        """
+        default = '@default'
+        mapped = []
+        options = resolve_files({'input': '@' + self.path,
+                                 'empty': '@' + self.empty_path,
+                                 'literal': '@@home',
+                                 'default': default,
+                                 'plain': 'value',
+                                 'other': '@alice'},
+                                {'default': default}, mapped,
+                                ('input', 'empty', 'literal', 'default',
+                                 'plain'))
+        self.assertEqual(type(options['input']), mmap.mmap)
+        self.assertEqual(options['input'].readline(), 'line one\n')
+        self.assertEqual(mapped, [options['input']])
+        self.assertEqual(options['empty'], '')
+        self.assertEqual(options['literal'], '@home')
+        self.assertEqual(options['default'], '@default')
+        self.assertEqual(options['plain'], 'value')
+        self.assertEqual(options['other'], '@alice')
+        mapped[0].close()
+
+    def test_runner_closes_files(self):
+        """
+        Make sure the runner closes the maps once the run is over.
+        """
+        runner = ActionRunner(['self', 'simpleaction', 'verb',
+                               '--opt=@' + self.path], 'tests.actions')
+        mapped = runner.options['opt']
+        self.assertEqual(mapped[:4], 'line')
+        runner.run()
+        self.assertRaises(ValueError, mapped.readline)
+        self.assertRaises(SystemExit, runner.load_args,
+                          ['self', 'simpleaction', 'verb',
+                           '--opt=@' + self.path + '.missing'])
+
+    def test_other_options(self):
+        """
+        Make sure options not taking files get @ values as given.
+        """
+        runner = ActionRunner(['self', 'simpleaction', 'fail',
+                               '--message=@alice'], 'tests.actions')
+        self.assertEqual(runner.options['message'], '@alice')
+        runner = ActionRunner(['self', 'simpleaction', 'fail',
+                               '--message=@@alice'], 'tests.actions')
+        self.assertEqual(runner.options['message'], '@@alice')
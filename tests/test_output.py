@@ -0,0 +1,135 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for output.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import StringIO
+import sys
+import unittest
+
+from director import err
+from director import out
+from director import output
+
+
+class ChannelTests(unittest.TestCase):
+    """
+    Tests the Channel object.
+    """
+
+    def test_buffering(self):
+        """
+        Make sure text waits for a flush or a full buffer.
+        """
+        sink = output.MemorySink()
+        channel = output.Channel(sink, 10)
+        channel.write('12345')
+        self.assertEqual(sink.getvalue(), '')
+        channel.flush()
+        self.assertEqual(sink.getvalue(), '12345')
+        channel.write('1234567890')
+        self.assertEqual(sink.getvalue(), '123451234567890')
+
+    def test_write_records(self):
+        """
+        Make sure records are written a batch at a time.
+        """
+        sink = output.MemorySink()
+        channel = output.Channel(sink, 4)
+        records = iter(['a', 1, 'b'])
+        self.assertEqual(output.write_records(records, channel, 2), 3)
+        self.assertEqual(sink.getvalue(), 'a\n1\n')
+        channel.flush()
+        self.assertEqual(sink.getvalue(), 'a\n1\nb\n')
+
+    def test_stream_switch(self):
+        """
+        Make sure buffered text goes to the stream it was written for.
+        """
+        old_stderr = sys.stderr
+        first, second = StringIO.StringIO(), StringIO.StringIO()
+        channel = output.Channel(output.StreamSink('stderr'))
+        try:
+            sys.stderr = first
+            channel.write('first')
+            sys.stderr = second
+            channel.write('second')
+            channel.flush()
+        finally:
+            sys.stderr = old_stderr
+        self.assertEqual(first.getvalue(), 'first')
+        self.assertEqual(second.getvalue(), 'second')
+
+
+class FakeTerminal(StringIO.StringIO):
+    """
+    In memory file which claims to be a terminal.
+    """
+
+    def isatty(self):
+        return True
+
+
+class TerminalTests(unittest.TestCase):
+    """
+    Tests writing to terminals.
+    """
+
+    def test_unbuffered(self):
+        """
+        Make sure text for a terminal isn't held back.
+        """
+        old_stderr = sys.stderr
+        terminal = FakeTerminal()
+        channel = output.Channel(output.StreamSink('stderr'))
+        try:
+            sys.stderr = terminal
+            channel.write('Password: ')
+            self.assertEqual(terminal.getvalue(), 'Password: ')
+            sys.stderr = StringIO.StringIO()
+            channel.write('held')
+            self.assertEqual(sys.stderr.getvalue(), '')
+        finally:
+            sys.stderr = old_stderr
+
+
+class OutputTests(unittest.TestCase):
+    """
+    Tests swapping the Output used by err and out.
+    """
+
+    def setUp(self):
+        """
+        Uses memory sinks for the test.
+        """
+        self.stdout_sink = output.MemorySink()
+        self.stderr_sink = output.MemorySink()
+        self.old_output = output.set_output(
+            output.Output(self.stdout_sink, self.stderr_sink))
+
+    def tearDown(self):
+        """
+        Puts the old Output back.
+        """
+        output.set_output(self.old_output)
+
+    def test_err_and_out(self):
+        """
+        Make sure err and out write to their own channels.
+        """
+        err('problem')
+        out(1, False)
+        output.flush()
+        self.assertEqual(self.stderr_sink.getvalue(), 'problem\n')
+        self.assertEqual(self.stdout_sink.getvalue(), '1')
@@ -0,0 +1,121 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for plugins.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import os
+import tempfile
+import unittest
+import warnings
+
+from director import ActionRunner
+from director import output
+from director import plugins
+from director.error import PluginConflictWarning
+from director.manifest import Manifest
+from director.plugins import PluginIndex
+from director.plugins import module_nouns
+from director.plugins import package_path
+from director.plugins import plugin_index
+
+
+PACKAGES = ['tests.actions', 'tests.extra_actions']
+
+
+class PluginIndexTests(unittest.TestCase):
+    """
+    Tests the PluginIndex object.
+    """
+
+    def test_module_nouns(self):
+        """
+        Make sure only modules and packages are nouns.
+        """
+        self.assertEqual(module_nouns(['__init__.py', 'one.py', 'one.pyc',
+                                       'two.pyo', 'three', 'four.py']),
+                         ['one', 'three', 'four'])
+
+    def test_package_path(self):
+        """
+        Make sure a single package and a search path are both accepted.
+        """
+        self.assertEqual(package_path('tests.actions'), ('tests.actions',))
+        self.assertEqual(package_path(PACKAGES), tuple(PACKAGES))
+
+    def test_merge(self):
+        """
+        Make sure earlier packages win and conflicts are reported.
+        """
+        index = PluginIndex(PACKAGES)
+        # Forget the warning if another test triggered it already
+        getattr(plugins, '__warningregistry__', {}).clear()
+        with warnings.catch_warnings(record=True) as found:
+            warnings.simplefilter('always')
+            self.assertEqual(index.nouns(), ['simpleaction', 'otheraction'])
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].category, PluginConflictWarning)
+        self.assertEqual(index.conflicts, {'simpleaction': [
+            'tests.actions.simpleaction', 'tests.extra_actions.simpleaction']})
+        self.assertEqual(index.module('otheraction'),
+                         'tests.extra_actions.otheraction')
+        self.assertEqual(index.module('missing'), None)
+        self.assertTrue(plugin_index(PACKAGES) is plugin_index(PACKAGES))
+
+
+class SearchPathTests(unittest.TestCase):
+    """
+    Tests running nouns from a search path of packages.
+    """
+
+    def setUp(self):
+        """
+        Collects output in memory and hides conflict warnings.
+        """
+        self.sink = output.MemorySink()
+        self.old_output = output.set_output(
+            output.Output(self.sink, output.MemorySink()))
+        self.manifest_path = tempfile.mkstemp()[1]
+        self.old_filters = warnings.filters[:]
+        warnings.simplefilter('ignore', PluginConflictWarning)
+
+    def tearDown(self):
+        """
+        Puts the old Output and warning filters back.
+        """
+        output.set_output(self.old_output)
+        os.unlink(self.manifest_path)
+        warnings.filters[:] = self.old_filters
+
+    def test_run(self):
+        """
+        Make sure nouns are found in every package.
+        """
+        runner = ActionRunner(['self', 'otheraction', 'greet', '--name=x'],
+                              PACKAGES)
+        runner.run()
+        self.assertEqual(self.sink.getvalue(), 'hello x\n')
+        runner.load_args(['self', 'simpleaction', 'verb', '--opt=x'])
+        self.assertEqual(runner.action_to_run.__module__,
+                         'tests.actions.simpleaction')
+
+    def test_manifest(self):
+        """
+        Make sure manifests cover every package.
+        """
+        manifest = Manifest(self.manifest_path, PACKAGES)
+        manifest.build()
+        self.assertTrue(manifest.load())
+        self.assertEqual(manifest.nouns(), ['otheraction', 'simpleaction'])
+        self.assertEqual(manifest.noun('simpleaction')['module'],
+                         'tests.actions.simpleaction')
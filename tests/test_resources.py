@@ -0,0 +1,180 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for resources.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import threading
+import time
+import unittest
+
+import director
+
+from director.error import PoolError
+from director.resources import Pool
+
+
+class Connection(object):
+    """
+    Stands in for an expensive resource.
+    """
+
+    def __init__(self):
+        """
+        Creates the Connection object.
+        """
+        self.closed = False
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        self.closed = True
+
+
+class PoolTests(unittest.TestCase):
+    """
+    Tests the Pool object.
+    """
+
+    def test_reuse(self):
+        """
+        Make sure resources are created lazily and reused.
+        """
+        pool = Pool(Connection, max_size=2)
+        self.assertEqual(len(pool), 0)
+        first = pool.get()
+        pool.put(first)
+        self.assertTrue(pool.get() is first)
+        second = pool.get()
+        self.assertFalse(second is first)
+        self.assertEqual(len(pool), 2)
+        self.assertRaises(PoolError, pool.get, 0.01)
+        pool.put(second, discard=True)
+        self.assertTrue(second.closed)
+        self.assertEqual(len(pool), 1)
+
+    def test_lease(self):
+        """
+        Make sure leased resources go back, unless the body raised.
+        """
+        pool = Pool(Connection)
+        with pool.lease() as connection:
+            pass
+        self.assertTrue(pool.get() is connection)
+        pool.put(connection)
+        try:
+            with pool.lease() as connection:
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertTrue(connection.closed)
+        self.assertEqual(len(pool), 0)
+
+    def test_idle_eviction(self):
+        """
+        Make sure resources idle for too long are closed.
+        """
+        pool = Pool(Connection, idle_timeout=0)
+        first = pool.get()
+        pool.put(first)
+        time.sleep(0.01)
+        self.assertFalse(pool.get() is first)
+        self.assertTrue(first.closed)
+
+    def test_close(self):
+        """
+        Make sure closing a pool closes idle and returned resources.
+        """
+        pool = Pool(Connection)
+        idle, busy = pool.get(), pool.get()
+        pool.put(idle)
+        pool.close()
+        self.assertTrue(idle.closed)
+        pool.put(busy)
+        self.assertTrue(busy.closed)
+        self.assertRaises(PoolError, pool.get)
+
+    def test_close_wakes_waiters(self):
+        """
+        Make sure threads waiting for a resource fail when the pool closes.
+        """
+        pool = Pool(Connection, max_size=1)
+        busy = pool.get()
+        errors = []
+
+        def wait():
+            try:
+                errors.append(pool.get())
+            except PoolError, pe:
+                errors.append(pe)
+
+        waiter = threading.Thread(target=wait)
+        waiter.setDaemon(True)
+        waiter.start()
+        # Give the thread time to start waiting
+        time.sleep(0.1)
+        pool.close()
+        waiter.join(5)
+        self.assertFalse(waiter.isAlive())
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(isinstance(errors[0], PoolError))
+        pool.put(busy)
+        self.assertTrue(busy.closed)
+        self.assertEqual(len(pool), 0)
+
+    def test_fork(self):
+        """
+        Make sure a pool inherited over a fork starts afresh.
+        """
+        pool = Pool(Connection)
+        inherited = pool.get()
+        pool.put(inherited)
+        pool._pid = -1
+        self.assertFalse(pool.get() is inherited)
+        self.assertFalse(inherited.closed)
+
+    def test_threads(self):
+        """
+        Make sure threads never hold more resources than max_size.
+        """
+        pool = Pool(Connection, max_size=3)
+        in_use = []
+        peak = []
+
+        def work():
+            for x in range(50):
+                with pool.lease() as connection:
+                    in_use.append(connection)
+                    peak.append(len(in_use))
+                    in_use.remove(connection)
+
+        threads = [threading.Thread(target=work) for x in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(max(peak) <= 3)
+        self.assertTrue(len(pool) <= 3)
+
+    def test_action_attribute(self):
+        """
+        Make sure a pool on an action is shared and isn't a verb.
+        """
+
+        class Pooled(director.Action):
+
+            db = Pool(Connection)
+
+        self.assertTrue(Pooled().db is Pooled().db)
+        self.assertFalse('db' in Pooled._verb_names)
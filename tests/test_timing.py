@@ -0,0 +1,81 @@
+# Copyright 2008, Red Hat, Inc
+# Steve 'Ashcrow' Milner <smilner@redhat.com>
+#
+# This software may be freely redistributed under the terms of the GNU
+# general public license.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.
+"""
+Tests for timing runs.
+"""
+
+__docformat__ = 'restructuredtext'
+
+
+import time
+import unittest
+
+from director import timing
+
+
+class TimingTests(unittest.TestCase):
+    """
+    Tests for Timings and the profile settings.
+    """
+
+    def test_profile_setting(self):
+        """
+        Make sure profile values turn into what they ask for.
+        """
+        self.assertEqual(timing.profile_setting(None), None)
+        self.assertEqual(timing.profile_setting(''), None)
+        self.assertEqual(timing.profile_setting('0'), None)
+        self.assertEqual(timing.profile_setting('Off'), None)
+        self.assertEqual(timing.profile_setting('1'), True)
+        self.assertEqual(timing.profile_setting('true'), True)
+        self.assertEqual(timing.profile_setting('yes'), True)
+        self.assertEqual(timing.profile_setting('run.pstats'), 'run.pstats')
+        self.assertEqual(timing.profile_setting('/tmp/run'), '/tmp/run')
+
+    def test_import_times(self):
+        """
+        Make sure importing director was timed.
+        """
+        self.assertTrue(timing.IMPORT_FINISHED >= timing.IMPORT_STARTED)
+        started = timing.process_started()
+        self.assertTrue(started is None or started >= 0)
+
+    def test_nested(self):
+        """
+        Make sure a phase doesn't count the phases run inside it.
+        """
+        timings = timing.Timings(startup=False)
+
+        def inner():
+            time.sleep(0.02)
+            return 'inner'
+
+        def outer():
+            return timings.call('plugin import', inner)
+
+        self.assertEqual(timings.call('parse_options', outer), 'inner')
+        self.assertTrue(timings.seconds['plugin import'] >= 0.02)
+        self.assertTrue(timings.seconds['parse_options'] < 0.02)
+        self.assertRaises(ZeroDivisionError, timings.call, 'verb',
+                          lambda: 1 / 0)
+        self.assertTrue('verb' in timings.seconds)
+
+    def test_report(self):
+        """
+        Make sure the report lists phases in order with a total.
+        """
+        timings = timing.Timings(startup=False)
+        timings.add('verb', 0.003)
+        timings.add('parse_options', 0.001)
+        lines = timings.report().split('\n')
+        self.assertEqual(lines[0], 'director profile:')
+        self.assertEqual(lines[1].split()[0], 'parse_options')
+        self.assertEqual(lines[2].split()[0], 'verb')
+        self.assertEqual(lines[3].split()[:2], ['total', '4.00'])